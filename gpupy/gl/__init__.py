@@ -17,7 +17,7 @@ __path__ = extend_path(__path__, __name__)
 from gpupy.gl.gpupygl import GPUPY_GL
 from gpupy.gl.buffer import BufferObject 
 from gpupy.gl.texture import Texture2D, Texture1D, Texture3D 
-from gpupy.gl.shader import Shader, Program, create_program
+from gpupy.gl.shader import Shader, Program, ProgramVariants, create_program
 from gpupy.gl.framebuffer import Framebuffer 
 from gpupy.gl.viewport import Viewport
 
@@ -25,5 +25,5 @@ from OpenGL import GL as _GL
 GL = _GL
 
 __all__ = ['BufferObject', 'Texture2D', 'Texture1D', 
-           'Texture3D', 'Shader', 'Program', 'Framebuffer', 'Viewport', 'GPUPY_GL', 'GL', 'create_program']
+           'Texture3D', 'Shader', 'Program', 'ProgramVariants', 'Framebuffer', 'Viewport', 'GPUPY_GL', 'GL', 'create_program']
 
@@ -32,7 +32,9 @@ except:
 import numpy as np
 
 from operator import mul
+from itertools import count
 from ctypes import c_void_p
+from collections import namedtuple
 
 # some link to docs to improve exceptions.
 DOCS = {
@@ -40,6 +42,9 @@ DOCS = {
     'glBindBufferBase': 'https://www.opengl.org/sdk/docs/man/docbook4/xhtml/glBindBufferBase.xml',
 }
 
+# versions of the buffer contents, unique among all buffers
+_versions = count(1)
+
 def assert_cl(f):
     """
     for methods which require pyopencl
@@ -66,8 +71,8 @@ class BufferObject():
          shape, dtype, factory methods (empty_like ...),
     To push and pull data from host memory to gpu memory the
     methods set() and get() provide a wrapper for glBufferData
-    and glGetBufferSubData. TODO: what if one wants to read/update
-    only a part of the buffer.
+    and glGetBufferSubData. set_subdata() updates a range of rows
+    by glBufferSubData.
     This class requires an OpenGL context to be active.
     """
     TARGET_TO_STR = {
@@ -201,6 +206,9 @@ class BufferObject():
 
         self._has_updates = False
 
+        # changes with each upload, see set(), set_subdata()
+        self.version = next(_versions)
+
     def __len__(self):
         """
         returns first shape component
@@ -214,8 +222,9 @@ class BufferObject():
           - USAGE
         """
         glBindBuffer(self._target, self.gl_vbo_id)
-        nbytes = glGetBufferParameteriv(self._target, GL_BUFFER_SIZE)
-        usage = glGetBufferParameteriv(self._target, GL_BUFFER_USAGE)
+        # newer PyOpenGL versions return a 1-element array
+        nbytes = int(np.asarray(glGetBufferParameteriv(self._target, GL_BUFFER_SIZE)).ravel()[0])
+        usage = int(np.asarray(glGetBufferParameteriv(self._target, GL_BUFFER_USAGE)).ravel()[0])
 
         # check if host and gpu size are equal
         if check and nbytes != self.nbytes:
@@ -254,6 +263,32 @@ class BufferObject():
         glBindBuffer(self._target, 0)
 
         self._has_updates = True
+        self.version = next(_versions)
+
+    def set_subdata(self, ndarray, offset=0):
+        """
+        upload data from host memory into the gpu buffer
+        starting at row **offset**. the buffer is not resized. 
+        """
+        if ndarray.dtype != self.dtype:
+            raise GlError('dtype {} does not match buffer dtype {}'.format(ndarray.dtype, self.dtype))
+
+        # the buffer might be empty
+        row_nbytes = self.itemsize * int(np.prod(self.shape[1:]))
+        if offset < 0 or offset*row_nbytes + ndarray.nbytes > self.nbytes:
+            raise GlError('cannot write {}b at row {} into buffer of size {}b'.format(
+                ndarray.nbytes, offset, self.nbytes))
+
+        ndarray = np.ascontiguousarray(ndarray)
+        glBindBuffer(self._target, self.gl_vbo_id)
+        glBufferSubData(self._target, offset*row_nbytes, ndarray.nbytes, ndarray)
+        glBindBuffer(self._target, 0)
+
+        if self.host is not None:
+            self.host[offset:offset+len(ndarray)] = ndarray
+
+        self._has_updates = True
+        self.version = next(_versions)
 
     def sync_gpu(self):
         if self.host is None:
@@ -262,6 +297,7 @@ class BufferObject():
         glBindBuffer(self._target, self.gl_vbo_id)
         glBufferData(self._target, self.host.nbytes, self.host, self._usage)
         glBindBuffer(self._target, 0)
+        self.version = next(_versions)
 
     def get(self, sync_host=True):
         """
@@ -295,6 +331,14 @@ class BufferObject():
 
         return self._cl_array
 
+    def delete(self):
+        """
+        deletes the gl buffer if exists
+        """
+        if self.gl_vbo_id is not None:
+            glDeleteBuffers(1, [self.gl_vbo_id])
+            self.gl_vbo_id = None
+
     def bind(self):
         glBindBuffer(self._target, self.gl_vbo_id)
 
@@ -354,6 +398,125 @@ def _create_new_vbo_allocator(data=None):
         return vbo
     return _alloc
 
+# -- vertex attribute formats
+#
+# the format of a vertex attribute is derived from the numpy 
+# dtype of the buffer field:
+#
+#   float32, float16, float64    float attribute (float64 via glVertexAttribLPointer)
+#   int8, uint8, int16, uint16   normalized float attribute
+#   int32, uint32                integer attribute (glVertexAttribIPointer)
+#
+# dtype metadata may override the defaults:
+#
+#   np.dtype(np.uint8, metadata={'normalized': False})
+#   np.dtype(np.uint16, metadata={'integer': True})
+#   np.dtype(np.int32, metadata={'gl_type': GL_INT_2_10_10_10_REV})
+#
+# the packed types GL_INT_2_10_10_10_REV and GL_UNSIGNED_INT_2_10_10_10_REV
+# are normalized 4 component attributes stored within one 32bit field.
+
+VERTEX_ATTRIBUTE_GL_TYPES = {
+    'f2': GL_HALF_FLOAT,
+    'f4': GL_FLOAT,
+    'f8': GL_DOUBLE,
+    'i1': GL_BYTE,
+    'u1': GL_UNSIGNED_BYTE,
+    'i2': GL_SHORT,
+    'u2': GL_UNSIGNED_SHORT,
+    'i4': GL_INT,
+    'u4': GL_UNSIGNED_INT,
+}
+
+PACKED_VERTEX_ATTRIBUTE_GL_TYPES = {GL_INT_2_10_10_10_REV, GL_UNSIGNED_INT_2_10_10_10_REV}
+
+# packed signed normalized normal vectors, see pack_normals()
+PACKED_NORMAL_DTYPE = np.dtype(np.int32, metadata={'gl_type': GL_INT_2_10_10_10_REV})
+
+# normalized unsigned byte colors
+NORMALIZED_UBYTE_DTYPE = np.dtype(np.uint8, metadata={'normalized': True})
+
+VertexAttributeFormat = namedtuple('VertexAttributeFormat', 
+    ['gl_type', 'components', 'columns', 'normalized', 'integer'])
+
+def vertex_attribute_format(dtype):
+    """
+    returns the VertexAttributeFormat of a buffer field dtype. 
+    """
+    base = dtype.base
+    meta = base.metadata or {}
+    key = base.str[1:]
+    if not key in VERTEX_ATTRIBUTE_GL_TYPES:
+        raise GlError('dtype {} is not supported as vertex attribute. Supported: {}'.format(
+            base, ', '.join(VERTEX_ATTRIBUTE_GL_TYPES)))
+
+    gl_type = meta.get('gl_type', VERTEX_ATTRIBUTE_GL_TYPES[key])
+    shape = dtype.shape
+    columns, components = shape if len(shape) == 2 else (1, shape[0] if len(shape) else 1)
+
+    if gl_type in PACKED_VERTEX_ATTRIBUTE_GL_TYPES:
+        if base.itemsize != 4 or len(shape):
+            raise GlError('packed vertex attributes must be scalar 32bit fields.')
+        return VertexAttributeFormat(gl_type, 4, 1, meta.get('normalized', True), False)
+
+    integer = meta.get('integer', key in ('i4', 'u4'))
+    normalized = meta.get('normalized', key in ('i1', 'u1', 'i2', 'u2'))
+    return VertexAttributeFormat(gl_type, components, columns, normalized and not integer, integer)
+
+def vertex_attribute_glsl_type(dtype):
+    """
+    returns the glsl type of a vertex attribute which is
+    read from a buffer field of given dtype. 
+    """
+    fmt = vertex_attribute_format(dtype)
+    if fmt.integer:
+        scalar, vector = ('uint', 'uvec') if dtype.base.kind == 'u' else ('int', 'ivec')
+    elif fmt.gl_type == GL_DOUBLE:
+        scalar, vector = 'double', 'dvec'
+    else:
+        scalar, vector = 'float', 'vec'
+
+    if fmt.columns > 1:
+        matrix = 'dmat' if fmt.gl_type == GL_DOUBLE else 'mat'
+        if fmt.columns == fmt.components:
+            return '{}{}'.format(matrix, fmt.columns)
+        return '{}{}x{}'.format(matrix, fmt.columns, fmt.components)
+    if fmt.components == 1:
+        return scalar
+    return '{}{}'.format(vector, fmt.components)
+
+def vertex_attrib_pointer(location, dtype, stride=0, offset=0, divisor=0):
+    """
+    sets the vertex attribute pointer of a buffer field of 
+    given dtype for the currently bound GL_ARRAY_BUFFER and
+    enables the attribute. fields with a (n, m) shape occupy
+    n consecutive locations.
+    """
+    fmt = vertex_attribute_format(dtype)
+    column_size = dtype.itemsize // fmt.columns
+    for column in range(fmt.columns):
+        pointer = c_void_p(offset + column * column_size)
+        if fmt.integer:
+            glVertexAttribIPointer(location + column, fmt.components, fmt.gl_type, stride, pointer)
+        elif fmt.gl_type == GL_DOUBLE:
+            glVertexAttribLPointer(location + column, fmt.components, fmt.gl_type, stride, pointer)
+        else:
+            glVertexAttribPointer(location + column, fmt.components, fmt.gl_type, 
+                                  GL_TRUE if fmt.normalized else GL_FALSE, stride, pointer)
+        glEnableVertexAttribArray(location + column)
+        if divisor:
+            glVertexAttribDivisor(location + column, divisor)
+
+def pack_normals(normals):
+    """
+    packs (n, 3) normal vectors into GL_INT_2_10_10_10_REV 
+    integers of PACKED_NORMAL_DTYPE. 
+    """
+    normals = np.asarray(normals, dtype=np.float32)
+    packed = np.clip(np.round(normals * 511), -512, 511).astype(np.int32) & 0x3ff
+    packed = packed[..., 0] | (packed[..., 1] << 10) | (packed[..., 2] << 20)
+    return packed.astype(PACKED_NORMAL_DTYPE)
+
 def create_vao_from_program_buffer_object(program, buffer_object):
     """
     creates a vao by reading the attributes of a shader program and links
@@ -366,17 +529,10 @@ def create_vao_from_program_buffer_object(program, buffer_object):
     vao = glGenVertexArrays(1)
     glBindVertexArray(vao)
     for (attribute, pointer) in program.attributes.items():
-        if buffer_object.dtype[attribute].subdtype is None:
-            components = 1
-        else:
-            components = buffer_object.dtype[attribute].subdtype[1][0]
-        glVertexAttribPointer(pointer, 
-                              components, 
-                              GL_FLOAT, 
-                              GL_FALSE, 
+        vertex_attrib_pointer(pointer, 
+                              buffer_object.dtype[attribute], 
                               buffer_object.dtype.itemsize, 
-                              c_void_p(buffer_object.dtype.fields[attribute][1]))
-        glEnableVertexAttribArray(pointer)
+                              buffer_object.dtype.fields[attribute][1])
 
     glBindVertexArray(0)
     buffer_object.unbind()
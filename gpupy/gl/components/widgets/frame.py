@@ -13,6 +13,7 @@ from gpupy.gl.lib import attributes
 from gpupy.gl.components.widgets import Widget
 from gpupy.gl import *
 from gpupy.gl import GPUPY_GL as _G
+from gpupy.gl.framebuffer import default_framebuffer
 from gpupy.gl.glx import camera
 from OpenGL.GL import *
 import numpy as np 
@@ -302,7 +303,7 @@ class FramestackWidget(Widget):
                 self._rs_prg_layer.unuse()
                 last_idx = si[FramestackWidget.IDX]
 
-            glBindFramebuffer(GL_DRAW_FRAMEBUFFER, 0)
+            glBindFramebuffer(GL_DRAW_FRAMEBUFFER, default_framebuffer())
 
         # render all items to the top layer directly
         # (this is the fastest rendering method)
@@ -317,7 +318,7 @@ class FramestackWidget(Widget):
             stack = (self._s[i] for i in layers) if layers is not None else self._s
             for si in stack:
                 si[self.RENDERER]()
-            glBindFramebuffer(GL_DRAW_FRAMEBUFFER, 0)
+            glBindFramebuffer(GL_DRAW_FRAMEBUFFER, default_framebuffer())
             self._hrl = 0
 
         glViewport(*vp)
@@ -360,13 +361,13 @@ class FramestackWidget(Widget):
         si.init_gl(self.resolution.xy)
 
         self._s.append((subject, idx, self._caller(subject), clickmap))
-        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, 0)
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, default_framebuffer())
 
     def insert(self, i, renderer, clickmap=(0,0,0,0)):
         idx = self._free_idx()
         self._init_layer(idx)
         self._s.insert(i, (renderer, idx, self._caller(renderer), clickmap))
-        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, 0)
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, default_framebuffer())
 
     def _init_layer(self, idx):
         # we perform at least one clear operation on each texture on init.
@@ -401,7 +402,7 @@ class FramestackWidget(Widget):
 
 
 
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        glBindFramebuffer(GL_FRAMEBUFFER, default_framebuffer())
 
 def _StackItem():
     R0 = 0x0001
@@ -10,6 +10,8 @@ const float M_SQRT2 = 1.41421356237309504880;
 uniform float u_antialias;
 uniform vec4 u_limits1;
 uniform vec4 u_limits2;
+// whether the left, right, bottom and top limits are drawn
+uniform vec4 u_edges;
 uniform vec2 u_major_grid_step;
 uniform vec2  u_minor_grid_step;
 uniform float u_major_grid_width;
@@ -67,19 +69,24 @@ float stroke_alpha(float distance, float linewidth, float antialias)
         return alpha;
 }
 
-// Compute the nearest tick from a (normalized) t value
-float get_tick(float t, float vmin, float vmax, float step)
+// Compute the nearest tick from a (normalized) t value.
+// the limits are ticks if the edges are drawn.
+float get_tick(float t, float vmin, float vmax, float step, vec2 edges)
 {
     float first_tick = floor((vmin + step/2.0)/step) * step;
     float last_tick = floor((vmax + step/2.0)/step) * step;
     float tick = vmin + t*(vmax-vmin);
-    if (tick < (vmin + (first_tick-vmin)/2.0))
+    if (edges[0] > 0.5 && tick < (vmin + (first_tick-vmin)/2.0))
         return vmin;
-    if (tick > (last_tick + (vmax-last_tick)/2.0))
+    if (edges[1] > 0.5 && tick > (last_tick + (vmax-last_tick)/2.0))
         return vmax;
     tick += step/2.0;
     tick = floor(tick/step)*step;
-    return min(max(vmin,tick),vmax);
+    if (edges[0] > 0.5)
+        tick = max(vmin, tick);
+    if (edges[1] > 0.5)
+        tick = min(tick, vmax);
+    return tick;
 }
 
 // Screen distance (pixels) between A and B
@@ -131,22 +138,22 @@ void main()
     pNP1 /= pNP1.w;
     pNP1.xy = pNP1.xy * u_resolution/2.0;
 
-    tick = get_tick(NP2.x+0.5, u_limits2[0], u_limits2[1], u_major_grid_step[0]);
+    tick = get_tick(NP2.x+0.5, u_limits2[0], u_limits2[1], u_major_grid_step[0], u_edges.xy);
     P = transform_forward(vec2(tick,P2.y));
     P = scale_inverse(P, u_limits1);
     float Mx = screen_distance(pNP1.xy, vec4(P,0,1));
 
-    tick = get_tick(NP2.x+0.5, u_limits2[0], u_limits2[1], u_minor_grid_step[0]);
+    tick = get_tick(NP2.x+0.5, u_limits2[0], u_limits2[1], u_minor_grid_step[0], u_edges.xy);
     P = transform_forward(vec2(tick,P2.y));
     P = scale_inverse(P, u_limits1);
     float mx = screen_distance(pNP1.xy, vec4(P,0,1));
 
-    tick = get_tick(NP2.y+0.5, u_limits2[2], u_limits2[3], u_major_grid_step[1]);
+    tick = get_tick(NP2.y+0.5, u_limits2[2], u_limits2[3], u_major_grid_step[1], u_edges.zw);
     P = transform_forward(vec2(P2.x,tick));
     P = scale_inverse(P, u_limits1);
     float My = screen_distance(pNP1.xy, vec4(P,0,1));
 
-    tick = get_tick(NP2.y+0.5, u_limits2[2], u_limits2[3], u_minor_grid_step[1]);
+    tick = get_tick(NP2.y+0.5, u_limits2[2], u_limits2[3], u_minor_grid_step[1], u_edges.zw);
     P = transform_forward(vec2(P2.x,tick));
     P = scale_inverse(P, u_limits1);
     float my = screen_distance(pNP1.xy, vec4(P,0,1));
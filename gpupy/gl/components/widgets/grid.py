@@ -49,6 +49,10 @@ class AbstractGrid(Widget):
 
     antialiasing   = attributes.CastedAttribute(float,  .5)
 
+    # whether lines are drawn at the left, right, bottom 
+    # and top limit of the cs.
+    edges = attributes.VectorAttribute(4, (1, 1, 1, 1))
+
     # style
     background_color  = attributes.VectorAttribute(4, (1, 1, 1, 1))
 
@@ -99,6 +103,7 @@ class AbstractGrid(Widget):
     @major_grid_width.on_change
     @resolution.on_change
     @position.on_change
+    @edges.on_change
     def req_uniforms(self, *e):
         self._req_uniforms = True
 
@@ -128,6 +133,7 @@ class AbstractGrid(Widget):
 
         self.program.uniform('u_limits1',          l1)
         self.program.uniform('u_limits2',          cs)
+        self.program.uniform('u_edges',            self.edges)
         self.program.uniform('u_major_grid_step',  mg)
         self.program.uniform('u_minor_grid_step',  self.major_grid.values / self.minor_grid_n)
         self.program.uniform('u_major_grid_width', Mw)
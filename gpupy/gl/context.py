@@ -27,6 +27,12 @@ class Context():
                     to perform the tick and rendering logic
                     like on_cycle to provide fluid window resizing.
 
+    damage tracking:
+    ----------------
+    components which changed the content of the context call
+    damage(). damage driven contexts only swap their buffers
+    if the context was damaged within the cycle.
+
     """
     size       = attributes.VectorAttribute(2)
     resolution = attributes.VectorAttribute(2)
@@ -45,6 +51,16 @@ class Context():
 
         self.active_keys = set()
 
+        self.damaged = True
+
+        # framebuffer which is bound if no offscreen framebuffer
+        # is in use. headless contexts render into a framebuffer
+        # object.
+        self.default_framebuffer = 0
+
+    def damage(self):
+        """ marks the context to require a buffer swap """
+        self.damaged = True
 
     def buffer_base(self, name, index=None):
         """ 
@@ -0,0 +1,59 @@
+#-*- coding: utf-8 -*-
+"""
+benchmarks the mesh3d_* builders.
+
+the per vertex loop implementation of the sphere builder is
+kept as a reference. it is only measured for small precisions
+since it scales badly, prec=1000 takes about half a minute.
+
+    python -m gpupy.gl.examples.bench_mesh
+
+:author: keksnicoh
+"""
+
+from gpupy.gl.mesh import mesh3d_sphere, mesh3d_cylinder, mesh3d_cube, mesh3d_rectangle, MESH_DTYPE
+import numpy as np
+from timeit import repeat
+
+def loop_sphere(prec=50, r=1, color=(.5, .5, .5, 1)):
+    """ per vertex reference implementation of mesh3d_sphere """
+    theta_range = [np.pi / prec * theta for theta in range(prec+1)]
+    theta_range[-1] = np.pi
+
+    phi_range = [2 * np.pi / prec * phi for phi in range(prec+1)]
+    phi_range[-1] = 0
+
+    mesh = np.zeros((prec-1) * prec * 6, dtype=MESH_DTYPE)
+    sphere_vec = lambda theta, phi: (r * np.sin(theta) * np.cos(phi), r * np.sin(theta) * np.sin(phi), r * np.cos(theta))
+    index = 0
+    for i in range(prec-1):
+        for j in range(prec):
+            for di, dj in ((0, 0), (1, 0), (1, 1), (1, 0), (1, 1), (2, 1)):
+                v = sphere_vec(theta_range[i+di], phi_range[j+dj])
+                mesh['vertex'][index] = v
+                mesh['color'][index] = color
+                mesh['normal'][index] = v
+                index += 1
+    return mesh
+
+def bench(name, f, number=3):
+    t = min(repeat(f, number=1, repeat=number))
+    print('{:<40} {:>10.2f} ms'.format(name, t*1000))
+    return t
+
+def main():
+    assert np.array_equal(loop_sphere(30), mesh3d_sphere(30))
+
+    for prec in (50, 200):
+        bench('loop_sphere(prec={})'.format(prec), lambda: loop_sphere(prec), number=1)
+    for prec in (50, 200, 1000):
+        bench('mesh3d_sphere(prec={})'.format(prec), lambda: mesh3d_sphere(prec))
+
+    bench('mesh3d_sphere(prec=1000, color=f)', lambda: mesh3d_sphere(1000,
+        color=lambda theta, phi: (np.cos(theta), np.sin(phi), 0.5, 1)))
+    bench('mesh3d_cylinder(prec=1000)', lambda: mesh3d_cylinder(prec=1000))
+    bench('mesh3d_cube', lambda: mesh3d_cube((1, 1, 1)))
+    bench('mesh3d_rectangle', lambda: mesh3d_rectangle())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#-*- coding: utf-8 -*-
+"""
+renders 10000 rotating cubes by a single instanced draw call.
+the model matrix and the color of each cube are per instance
+attributes.
+
+:author: keksnicoh
+"""
+from gpupy.gl.glfw import bootstrap_gl, create_runner, GLFW_Window
+from gpupy.gl.glx.camera import Perspective3D
+from gpupy.gl.mesh import mesh3d_cube, IndexedMesh, InstancedMesh
+from gpupy.gl import GPUPY_GL, create_program
+from OpenGL.GL import *
+
+import numpy as np
+from time import time
+
+INSTANCE_DTYPE = np.dtype([
+    ('model', np.float32, (4, 4)),
+    ('instance_color', np.float32, 4),
+])
+
+class InstancedCubes():
+    def __init__(self, n=100):
+        self.program = create_program(vertex="""
+            {% version %}
+            {% uniform_block camera %}
+            in vec3 vertex;
+            in vec3 normal;
+            in mat4 model;
+            in vec4 instance_color;
+            out vec4 v_color;
+            void main() {
+                vec3 n = normalize(mat3(model) * normal);
+                v_color = vec4(instance_color.rgb * (0.3 + 0.7 * abs(n.z)), 1);
+                gl_Position = camera.mat_projection * camera.mat_view * model * vec4(vertex, 1);
+            }
+        """, fragment="""
+            {% version %}
+            in vec4 v_color;
+            out vec4 frag_color;
+            void main() {
+                frag_color = v_color;
+            }
+        """, link=False)
+        self.program.declare_uniform('camera', Perspective3D.DTYPE, variable='camera')
+        self.program.link()
+        self.program.uniform_block_binding('camera', GPUPY_GL.CONTEXT.buffer_base('gpupy.gl.camera'))
+
+        # n x n grid of cubes
+        x, y = np.meshgrid(np.arange(n) - n / 2, np.arange(n) - n / 2)
+        self.instances = np.zeros(n * n, dtype=INSTANCE_DTYPE)
+        self.instances['model'] = np.eye(4)
+        self.instances['model'][:, 3, 0] = 2 * x.reshape(-1)
+        self.instances['model'][:, 3, 1] = 2 * y.reshape(-1)
+        self.instances['instance_color'] = np.random.random((n * n, 4))
+
+        cube = IndexedMesh(*mesh3d_cube((1, 1, 1), center=True, indexed=True),
+                           attribute_locations=self.program.attributes)
+        self.cubes = InstancedMesh(cube, self.instances,
+                                   attribute_locations=self.program.attributes)
+
+    def __call__(self):
+        # rotate each cube around its z axis. numpy rows are
+        # the columns of the glsl mat4.
+        phi = time() + np.arange(len(self.instances)) * 0.01
+        self.instances['model'][:, 0, 0] = np.cos(phi)
+        self.instances['model'][:, 0, 1] = np.sin(phi)
+        self.instances['model'][:, 1, 0] = -np.sin(phi)
+        self.instances['model'][:, 1, 1] = np.cos(phi)
+        self.cubes.set_instances(self.instances)
+
+        glEnable(GL_DEPTH_TEST)
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        self.program.use()
+        self.cubes.draw()
+        self.program.unuse()
+        return True
+
+def main():
+    bootstrap_gl()
+    window = GLFW_Window()
+    window.make_context()
+    camera = Perspective3D(screensize=window.size, position=(0, 0, -250))
+    window.widget = InstancedCubes()
+
+    windows = [window]
+    for window in create_runner(windows):
+        if not window():
+            windows.remove(window)
+
+if __name__ == '__main__':
+    main()
+else:
+    raise Exception('please run as __main__.')
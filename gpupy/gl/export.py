@@ -0,0 +1,231 @@
+#-*- coding: utf-8 -*-
+"""
+batch export of rendered frames.
+
+the Exporter renders into an offscreen framebuffer of arbitrary
+size. the pixels are read into a ring of pixel pack buffers, a
+fence tells when a readback is complete. the pixels are fetched
+only when the ring slot is reused (or the export is flushed), so
+the gpu renders the next frames meanwhile. the images are encoded
+by a process pool. at most max_pending encodings are queued,
+the exporter waits for the oldest one if the limit is reached.
+
+    def render():
+        plotter.tick()
+        camera.enable()
+        plotter.draw()
+
+    exporter = Exporter((1920, 1080), render)
+    exporter.export_frames(datasets, update=set_data, path='report/{:05}.png')
+    exporter.close()
+
+the current context stays the active context. while a frame is
+rendered, the framebuffer of the exporter is the default
+framebuffer of the context, see gpupy.gl.framebuffer.default_framebuffer.
+
+:author: keksnicoh
+"""
+
+from gpupy.gl import GPUPY_GL
+from gpupy.gl.buffer import BufferObject
+from gpupy.gl.texture import Texture2D
+from gpupy.gl.framebuffer import Framebuffer
+from gpupy.gl.errors import GlError
+
+from OpenGL.GL import *
+from concurrent.futures import ProcessPoolExecutor, wait
+from ctypes import c_void_p
+import numpy as np
+import os
+
+__all__ = ['Exporter', 'encode_png', 'encode_npy', 'ENCODERS']
+
+# -- encoders
+#
+# encoders are executed within the worker processes, they must
+# be picklable top level functions. the pixels are passed as
+# bytes of the bottom up rgba rows like glReadPixels returns them.
+
+def _image(data, size):
+    width, height = size
+    return np.frombuffer(data, dtype=np.uint8).reshape((height, width, 4))[::-1]
+
+def encode_png(path, data, size):
+    from PIL import Image
+    Image.fromarray(_image(data, size), 'RGBA').save(path)
+    return path
+
+def encode_npy(path, data, size):
+    np.save(path, _image(data, size))
+    return path
+
+ENCODERS = {
+    'png': encode_png,
+    'npy': encode_npy,
+}
+
+class _Slot():
+    """ pixel pack buffer of the readback ring """
+    def __init__(self, nbytes):
+        self.pbo = BufferObject((nbytes, ), np.uint8, target=GL_PIXEL_PACK_BUFFER, usage=GL_STREAM_READ)
+        self.fence = None
+        self.path = None
+        self.encoder = None
+
+class Exporter():
+    """
+    renders frames by the **render** callable into an offscreen
+    framebuffer of **size** and encodes them asynchronously.
+    **ring_size** readbacks and **max_pending** encodings are in 
+    flight at most. if **executor** is None, a ProcessPoolExecutor 
+    with **workers** processes is used.
+    """
+    def __init__(self, size, render, ring_size=3, workers=None, executor=None, clear_color=(0, 0, 0, 0), max_pending=8):
+        if ring_size < 1:
+            raise ValueError('ring_size must be positive')
+        if max_pending < 1:
+            raise ValueError('max_pending must be positive')
+        self.size = tuple(int(v) for v in size)
+        self.render = render
+        self.clear_color = clear_color
+        self.max_pending = max_pending
+        self.futures = []
+        self._paths = []
+
+        self._own_executor = executor is None
+        self._executor = executor or ProcessPoolExecutor(max_workers=workers)
+
+        self._init_framebuffer()
+        nbytes = self.size[0] * self.size[1] * 4
+        self._ring = [_Slot(nbytes) for i in range(ring_size)]
+        self._next = 0
+
+    def _init_framebuffer(self):
+        self._color = Texture2D.empty((*self.size, 4), np.uint8)
+        self._color.interpolation_nearest()
+        self._framebuffer = Framebuffer()
+        self._framebuffer.color_attachment(self._color)
+
+        self._depth = glGenRenderbuffers(1)
+        glBindRenderbuffer(GL_RENDERBUFFER, self._depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH24_STENCIL8, *self.size)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+
+        draw_fbo = glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING)
+        glBindFramebuffer(GL_FRAMEBUFFER, self._framebuffer.gl_framebuffer_id)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_STENCIL_ATTACHMENT, GL_RENDERBUFFER, self._depth)
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise GlError('export framebuffer is incomplete')
+        glBindFramebuffer(GL_FRAMEBUFFER, draw_fbo)
+
+    # -- api
+
+    def export(self, path, format=None):
+        """
+        renders a frame and queues its readback. the image is
+        encoded by **format** ('png', 'npy') or the extension
+        of **path**.
+        """
+        format = format or os.path.splitext(path)[1][1:].lower()
+        if not format in ENCODERS:
+            raise ValueError('unknown format "{}". Available: {}'.format(format, ', '.join(ENCODERS)))
+
+        slot = self._ring[self._next]
+        self._next = (self._next + 1) % len(self._ring)
+        if slot.fence is not None:
+            self._collect(slot)
+
+        self._render()
+        self._readback(slot)
+        slot.path = path
+        slot.encoder = ENCODERS[format]
+
+        # hand over finished readbacks early
+        for other in self._ring:
+            if other.fence is not None and other is not slot and _signaled(other.fence):
+                self._collect(other)
+
+    def export_frames(self, frames, update, path):
+        """
+        exports a frame for each item of **frames**. **update**
+        is called with the item before it is rendered. **path**
+        is formatted with the index of the frame.
+        """
+        for i, frame in enumerate(frames):
+            update(frame)
+            self.export(path.format(i))
+
+    def flush(self):
+        """ waits for all readbacks and encodings. returns the
+            paths of the encoded images. """
+        for slot in self._ring:
+            if slot.fence is not None:
+                self._collect(slot)
+        futures, self.futures = self.futures, []
+        paths, self._paths = self._paths, []
+        wait(futures)
+        return paths + [future.result() for future in futures]
+
+    def close(self):
+        """ flushes and releases the gl resources """
+        paths = self.flush()
+        for slot in self._ring:
+            slot.pbo.delete()
+        self._ring = []
+        glDeleteRenderbuffers(1, [self._depth])
+        self._framebuffer.delete()
+        self._color.delete()
+        if self._own_executor:
+            self._executor.shutdown()
+        return paths
+
+    # -- rendering
+
+    def _render(self):
+        context = GPUPY_GL.CONTEXT
+        default_framebuffer = context.default_framebuffer
+        draw_fbo = glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING)
+        viewport = glGetIntegerv(GL_VIEWPORT)
+
+        # offscreen passes of the widgets return to the
+        # export framebuffer.
+        context.default_framebuffer = self._framebuffer.gl_framebuffer_id
+        try:
+            self._framebuffer.use()
+            glViewport(0, 0, *self.size)
+            glClearColor(*self.clear_color)
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            self.render()
+        finally:
+            context.default_framebuffer = default_framebuffer
+            glBindFramebuffer(GL_DRAW_FRAMEBUFFER, draw_fbo)
+            glViewport(*viewport)
+
+    def _readback(self, slot):
+        read_fbo = glGetIntegerv(GL_READ_FRAMEBUFFER_BINDING)
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self._framebuffer.gl_framebuffer_id)
+        glReadBuffer(GL_COLOR_ATTACHMENT0)
+        pack_alignment = glGetIntegerv(GL_PACK_ALIGNMENT)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        slot.pbo.bind()
+        glReadPixels(0, 0, self.size[0], self.size[1], GL_RGBA, GL_UNSIGNED_BYTE, c_void_p(0))
+        slot.pbo.unbind()
+        glPixelStorei(GL_PACK_ALIGNMENT, pack_alignment)
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, read_fbo)
+        slot.fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+
+    def _collect(self, slot):
+        """ fetches the pixels of a slot and submits the encoding """
+        glClientWaitSync(slot.fence, GL_SYNC_FLUSH_COMMANDS_BIT, GL_TIMEOUT_IGNORED)
+        glDeleteSync(slot.fence)
+        slot.fence = None
+        data = slot.pbo.get().tobytes()
+
+        # the encoded frames might pile up if the pool is slower
+        # than the gpu, each of them holds a copy of the pixels.
+        if len(self.futures) >= self.max_pending:
+            self._paths.append(self.futures.pop(0).result())
+        self.futures.append(self._executor.submit(slot.encoder, slot.path, data, self.size))
+
+def _signaled(fence):
+    return glClientWaitSync(fence, 0, 0) in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED)
@@ -0,0 +1,368 @@
+#-*- coding: utf-8 -*-
+"""
+numeric labels.
+
+tick labels, cursor readouts or fps counters change their
+text every frame. a TextObject would need a relayout and an
+upload of all characters for each change. NumericLabels only
+stores the value and a format per label, the geometry shader
+expands sign, digits, decimal point and exponent using the
+digit glyphs of the font. changing a value is a single record
+upload.
+
+    labels = NumericLabels(font_renderer)
+    labels.init()
+    fps = labels.add(0, position=(10, 10), size=12, precision=1)
+
+    # within the render loop
+    labels.set_value(fps, 59.7)
+    labels.render()
+
+a label is expanded into at most MAX_GLYPHS glyphs, add() and
+set_value() raise a ValueError for longer labels. large values
+must be rendered in NOTATION_EXPONENT, which never exceeds
+MAX_GLYPHS, or by a TextObject.
+
+XXX
+- right aligned labels
+- values >= 2^31 in fixed notation
+
+:author: keksnicoh
+"""
+from gpupy.gl import *
+from gpupy.gl.shader import Shader, Program
+from gpupy.gl.components.camera import Camera2D
+from gpupy.gl.buffer import BufferObject, create_vao_from_program_buffer_object
+from gpupy.gl.font.renderer import GLYPH_DTYPE, FRAGMENT_SHADER
+
+from OpenGL.GL import *
+import numpy as np
+
+__all__ = ['NumericLabels', 'NUMERIC_DTYPE', 'NOTATION_FIXED', 'NOTATION_EXPONENT', 'label_glyphs']
+
+NOTATION_FIXED    = 0
+NOTATION_EXPONENT = 1
+
+# maximum number of glyphs of a single label. the geometry shader
+# emits 4 vertices per glyph, the gl limit of output components
+# per geometry shader invocation is at least 1024.
+MAX_GLYPHS = 16
+
+# the characters which are required by the geometry shader
+# in the order of the digit_glyph array.
+DIGIT_CHARS = '0123456789-.e+'
+
+NUMERIC_DTYPE = np.dtype([
+    ('position',  np.float32, (2,)),
+    ('color',     np.float32, (4,)),
+    ('size',      np.float32),
+    ('rot',       np.float32),
+    ('value',     np.float32),
+
+    # digits after the decimal point. precision is
+    # a reserved word in glsl.
+    ('decimals',  np.int32),
+
+    # NOTATION_FIXED or NOTATION_EXPONENT
+    ('notation',  np.int32),
+])
+
+def label_glyphs(values, precision, notation):
+    """ number of glyphs the geometry shader emits for labels
+        of **values** with **precision** and **notation** """
+    values = np.asarray(values, dtype=np.float64)
+    precision = np.clip(precision, 0, 8)
+    fraction = np.where(precision > 0, precision + 1, 0)
+
+    scale = 10.0**precision
+    integer = np.minimum(np.floor(np.floor(np.abs(values)*scale + 0.5) / scale), 2**31 - 1)
+    fixed = np.floor(np.log10(np.maximum(integer, 1))).astype(np.int32) + 1 + fraction
+
+    # mantissa, e, sign and the exponent of a float32 has 2 digits
+    exponent = 1 + fraction + 4
+    return (values < 0) + np.where(np.equal(notation, NOTATION_EXPONENT), exponent, fixed)
+
+class NumericLabels():
+    """
+    a set of numeric labels which are rendered by a single
+    draw call. the font atlas of **renderer** is used, it
+    must be initialized before init() is called.
+    """
+    def __init__(self, renderer, capacity=16):
+        self.renderer = renderer
+        self._data = np.zeros(capacity, dtype=NUMERIC_DTYPE)
+        self._length = 0
+        self._buffer = None
+        self._vao = None
+        self._has_changes = True
+        self.program = None
+
+    def __len__(self):
+        return self._length
+
+    def init(self):
+        font = self.renderer.font
+        atlas = self.renderer.font_atlas
+
+        digit_glyph = font.glyph_ids([ord(c) for c in DIGIT_CHARS])
+        atlas.require(digit_glyph[digit_glyph >= 0])
+
+        self.program = Program()
+        self.program.shaders.append(Shader(GL_VERTEX_SHADER, VERTEX_SHADER))
+        self.program.shaders.append(Shader(GL_GEOMETRY_SHADER, GEOMETRY_SHADER, {
+            'MAX_VERTICES': 4 * MAX_GLYPHS,
+            'MAX_GLYPHS': MAX_GLYPHS,
+            'DIGIT_GLYPHS': ', '.join(str(i) for i in digit_glyph),
+            'N_DIGIT_GLYPHS': len(digit_glyph),
+            'NOTATION_EXPONENT': NOTATION_EXPONENT,
+        }))
+        self.program.shaders.append(Shader(GL_FRAGMENT_SHADER, FRAGMENT_SHADER))
+        camera = self.renderer.camera
+        self.program.declare_uniform('camera', Camera2D.DTYPE if camera is None else camera, variable='camera')
+        self.program.declare_struct('t_glyph', GLYPH_DTYPE)
+        self.program.declare_uniform('glyph_data', atlas.glyph_buffer)
+        self.program.link()
+
+        self.program.uniform_block_binding('glyph_data', atlas.glyph_buffer)
+        self.program.uniform_block_binding('camera', GPUPY_GL.CONTEXT.buffer_base('gpupy.gl.camera') if camera is None else camera)
+        self.program.uniform('tex_scale', (1.0/atlas.texture.size[1], 1.0/atlas.texture.size[2]))
+        self.program.uniform('fontsize_real', 60)
+        self.program.uniform('tex', 1)
+        self.program.uniform(self.renderer.render_parameters)
+
+        self._buffer = BufferObject.to_device(self._data, usage=GL_DYNAMIC_DRAW)
+        self._vao = create_vao_from_program_buffer_object(self.program, self._buffer)
+        self._has_changes = False
+
+    def add(self, value, position=(0, 0), size=10, color=(0, 0, 0, 1), rotation=0, precision=2, notation=NOTATION_FIXED):
+        """ adds a label and returns its index """
+        if self._length == len(self._data):
+            data = np.zeros(2*len(self._data), dtype=NUMERIC_DTYPE)
+            data[:self._length] = self._data[:self._length]
+            self._data = data
+
+        self._check_glyphs(value, precision, notation)
+        index = self._length
+        self._data[index] = (position, color, size, rotation, value, precision, notation)
+        self._length += 1
+        self._has_changes = True
+        return index
+
+    def set_value(self, index, value):
+        """ changes the value of a label by uploading
+            its record only. """
+        if index < 0 or index >= self._length:
+            raise IndexError('label {} does not exist'.format(index))
+        self._check_glyphs(value, self._data['decimals'][index], self._data['notation'][index])
+        self._data['value'][index] = value
+        if self._buffer is not None and not self._has_changes:
+            self._buffer.set_subdata(self._data[index:index+1], index)
+
+    def set_values(self, values):
+        """ changes the values of all labels """
+        data = self._data[:self._length]
+        self._check_glyphs(values, data['decimals'], data['notation'])
+        data['value'] = values
+        if self._buffer is not None and not self._has_changes:
+            self._buffer.set_subdata(self._data[:self._length])
+
+    def _check_glyphs(self, values, precision, notation):
+        glyphs = label_glyphs(values, precision, notation)
+        if np.any(glyphs > MAX_GLYPHS):
+            raise ValueError(('a label has {} glyphs but at most {} glyphs are rendered, '
+                             +'use NOTATION_EXPONENT or a lower precision').format(np.max(glyphs), MAX_GLYPHS))
+
+    @property
+    def values(self):
+        return self._data['value'][:self._length]
+
+    def render(self):
+        if not self._length:
+            return
+
+        # labels were added or the buffer grew
+        if self._has_changes:
+            self._buffer.set(self._data)
+            self._has_changes = False
+
+        glActiveTexture(GL_TEXTURE1)
+        with self.renderer.font_atlas.texture:
+            glEnable(GL_BLEND)
+            glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+            self.program.use()
+            glBindVertexArray(self._vao)
+            glDrawArrays(GL_POINTS, 0, self._length)
+            glBindVertexArray(0)
+            self.program.unuse()
+
+VERTEX_SHADER = """
+#version /*{$VERSION$}*/
+
+in vec2  position;
+in vec4  color;
+in float size;
+in float rot;
+in float value;
+in int   decimals;
+in int   notation;
+
+out vec4  geom_color;
+out float geom_size;
+out float geom_rot;
+out float geom_value;
+flat out int geom_decimals;
+flat out int geom_notation;
+
+void main()
+{
+    geom_color = color;
+    geom_size = size;
+    geom_rot = rot;
+    geom_value = value;
+    geom_decimals = decimals;
+    geom_notation = notation;
+    gl_Position = vec4(position, 0, 1);
+}
+"""
+
+GEOMETRY_SHADER = """
+#version /*{$VERSION$}*/
+
+layout (points)                        in;
+layout (triangle_strip)                out;
+layout (max_vertices = ${MAX_VERTICES}) out;
+
+in      vec4  geom_color[1];
+in      float geom_size[1];
+in      float geom_rot[1];
+in      float geom_value[1];
+flat in int   geom_decimals[1];
+flat in int   geom_notation[1];
+
+out       float frag_glyph_size;
+out       vec2  tex_coord;
+out       vec4  color;
+flat out  float page_id;
+
+{% struct t_glyph %}
+{% uniform_block glyph_data %}
+{% uniform_block camera %}
+
+uniform float fontsize_real;
+uniform vec2  tex_scale;
+
+// glyph indices of 0123456789-.e+
+const int digit_glyph[${N_DIGIT_GLYPHS}] = int[${N_DIGIT_GLYPHS}](${DIGIT_GLYPHS});
+const int GLYPH_MINUS = 10;
+const int GLYPH_POINT = 11;
+const int GLYPH_E     = 12;
+const int GLYPH_PLUS  = 13;
+
+// state of the label, assigned by main()
+mat4  glyph_rotation = mat4(1);
+mat4  mat_camera = mat4(1);
+float sizefactor = 0;
+float advance = 0;
+int   emitted = 0;
+
+void emit_vertex(vec2 offset, vec2 tex) {
+    gl_Position = mat_camera*(gl_in[0].gl_Position + glyph_rotation*vec4(offset, 0, 0));
+    tex_coord = tex;
+    color = geom_color[0];
+    frag_glyph_size = geom_size[0];
+    EmitVertex();
+}
+
+// emits the quad of a digit glyph and advances the pen
+void emit_glyph(int digit) {
+    int id = digit_glyph[digit];
+    if (id < 0 || emitted >= ${MAX_GLYPHS}) {
+        return;
+    }
+    t_glyph current = glyph[id];
+    float xo = advance + sizefactor*current.offset.x;
+    float yo = sizefactor*current.offset.y;
+    float xwidth = sizefactor*current.size.x;
+    float ywidth = sizefactor*current.size.y;
+    page_id = current.page;
+
+    emit_vertex(vec2(xo, ywidth+yo), vec2(tex_scale.x*current.position.x, tex_scale.x*(current.position.y+current.size.y)));
+    emit_vertex(vec2(xwidth+xo, ywidth+yo), vec2(tex_scale.x*(current.position.x+current.size.x), tex_scale.x*(current.position.y+current.size.y)));
+    emit_vertex(vec2(xo, yo), vec2(tex_scale.x*current.position.x, tex_scale.x*current.position.y));
+    emit_vertex(vec2(xwidth+xo, yo), vec2(tex_scale.x*(current.position.x+current.size.x), tex_scale.x*current.position.y));
+    EndPrimitive();
+
+    advance += sizefactor*(current.xadvance-16);
+    emitted += 1;
+}
+
+// emits the decimal digits of n, at least min_digits
+void emit_integer(int n, int min_digits) {
+    int digits = 1;
+    int p = 1;
+    while (p <= n / 10 && digits < 10) {
+        p *= 10;
+        digits += 1;
+    }
+    for (int i = digits; i < min_digits; ++i) {
+        emit_glyph(0);
+    }
+    for (int i = 0; i < digits; ++i) {
+        emit_glyph((n / p) % 10);
+        p /= 10;
+    }
+}
+
+void main(void)
+{
+    if (geom_size[0] <= 0) {
+        return;
+    }
+
+    glyph_rotation[0] = vec4(cos(geom_rot[0]),-sin(geom_rot[0]),0,0);
+    glyph_rotation[1] = vec4(sin(geom_rot[0]),cos(geom_rot[0]),0,0);
+    glyph_rotation[2] = vec4(0,0,1,0);
+    glyph_rotation[3] = vec4(0,0,0,1);
+    mat_camera = camera.mat_projection*camera.mat_view;
+
+    sizefactor = geom_size[0]/fontsize_real;
+    advance = 0;
+    emitted = 0;
+
+    float value = geom_value[0];
+    int decimals = clamp(geom_decimals[0], 0, 8);
+    if (value < 0) {
+        emit_glyph(GLYPH_MINUS);
+        value = -value;
+    }
+
+    int exponent = 0;
+    if (geom_notation[0] == ${NOTATION_EXPONENT} && value > 0) {
+        exponent = int(floor(log(value) / log(10.0)));
+        value = value / pow(10.0, float(exponent));
+    }
+
+    // round to the decimals, the mantissa of exponent notation
+    // might become 10.0 by rounding.
+    float scale = pow(10.0, float(decimals));
+    float rounded = floor(value*scale + 0.5);
+    if (geom_notation[0] == ${NOTATION_EXPONENT} && rounded >= 10.0*scale) {
+        rounded = floor(rounded / 10.0 + 0.5);
+        exponent += 1;
+    }
+
+    float integer_part = floor(rounded / scale);
+    emit_integer(int(min(integer_part, 2147483647.0)), 1);
+    if (decimals > 0) {
+        emit_glyph(GLYPH_POINT);
+        emit_integer(int(rounded - integer_part*scale), decimals);
+    }
+
+    if (geom_notation[0] == ${NOTATION_EXPONENT}) {
+        emit_glyph(GLYPH_E);
+        emit_glyph(exponent < 0 ? GLYPH_MINUS : GLYPH_PLUS);
+        emit_integer(abs(exponent), 2);
+    }
+}
+"""
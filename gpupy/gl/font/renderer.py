@@ -18,19 +18,26 @@ XXX
 """
 from gpupy.gl import *
 from gpupy.gl.shader import Shader, Program
-from gpupy.gl.camera import Camera
+from gpupy.gl.components.camera import Camera2D
 from gpupy.common.helper import load_lib_file, resource_path
 from gpupy.gl.texture import Texture2D
 from gpupy.gl.buffer import BufferObject, create_vao_from_program_buffer_object
 import os
 import re
+import hashlib
+import weakref
+from collections import OrderedDict, namedtuple
 
 from OpenGL.GL import *
 import numpy as np
 from scipy.ndimage.io import imread
 
 FONT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts')
-import re
+
+# compiled font caches are written to this folder, next
+# to the font file if the folder is not writable.
+FONT_CACHE_FOLDER = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')), 'gpupy', 'fonts')
+FONT_CACHE_VERSION = 2
 
 class FontException(Exception):
     pass
@@ -45,6 +52,20 @@ GLYPH_DTYPE = np.dtype([
     ('buff',      np.float32),
 ])
 
+# glyph table of a .fnt file 
+FNT_GLYPH_DTYPE = np.dtype([
+    ('id',       np.int32),
+    ('x',        np.int32),
+    ('y',        np.int32),
+    ('width',    np.int32),
+    ('height',   np.int32),
+    ('xoffset',  np.int32),
+    ('yoffset',  np.int32),
+    ('xadvance', np.int32),
+    ('page',     np.int32),
+    ('chnl',     np.int32),
+])
+
 # definition of a character:
 #
 # a character has a glyph_id and properties like position.
@@ -69,44 +90,94 @@ CHAR_DTYPE = np.dtype([
 
 
 class FontAtlas():
+    """
+    glyph uniform buffer and texture array of the font pages.
 
-    # definition of a glyph
-
-    def __init__(self, font_file, buffer_base):
+    if **lazy** is True a page is uploaded when a glyph on it
+    is required the first time, see require(). the texture 
+    layers are assigned in the order the pages are required,
+    the page field of the glyph buffer holds the layer.
+    """
+    def __init__(self, font_file, buffer_base, lazy=True):
         self.font_file = font_file
         self.buffer_base = buffer_base 
 
-        # prepare glyph atlas
-        page_data         = [imread(img_path)[:,:,3] for img_path in font_file.page_paths]
-        glypthatlas_width = page_data[0].shape[0]
-        glyphatlas_height = page_data[0].shape[1]
-        glyphatlas        = np.empty((len(page_data), glypthatlas_width, glyphatlas_height), dtype=np.float32)
-        for i, glyphdata in enumerate(page_data):
-            if glyphdata.shape[0:2] != (glypthatlas_width,glyphatlas_height):
-                raise FontException((
-                    'font "{}" corrupt: font page id={} file="{}" image size {}x{}'
-                    + ' differs from the first page id=0 file="{}" {}x{}').format(
-                        self.font, i, font_file.page_paths[i], glyphdata.shape[0],
-                        glyphdata.shape[1], font_file.page_paths[0],
-                        page_data[0].shape[0], page_data[0].shape[1]))
-
-            glyphatlas[i] = glyphdata
+        npages = len(font_file.page_paths)
+        self.layers = []
+        self._page_layer = np.full(npages, -1, dtype=np.int32)
+        self._glyph_resident = np.zeros(len(font_file.glyph_table), dtype=np.bool_)
 
         # upload glyph information
-        glyphdata = np.empty(len(font_file.glyphs), dtype=np.dtype([('glyph', GLYPH_DTYPE)]))
-        glyphdata[:] = [(c.dump(),) for c in font_file.glyphs]
-        self.glyph_buffer = BufferObject.to_device(glyphdata, target=GL_UNIFORM_BUFFER)
+        self._glyph_data = np.empty(len(font_file.glyph_table), dtype=np.dtype([('glyph', GLYPH_DTYPE)]))
+        self._glyph_data['glyph'] = font_file.glyph_data()
+        self.glyph_buffer = BufferObject.to_device(self._glyph_data, target=GL_UNIFORM_BUFFER)
         self.glyph_buffer.bind_buffer_base(self.buffer_base)
 
         # texture glyph atlas
         self.texture = Texture2D(array=True)
-        self.texture.load(glyphatlas)
+        self._reserve(1 if lazy else npages)
         self.texture.interpolation_linear()
 
+        if not lazy:
+            self.require_pages(range(npages))
+
+    def require(self, glyph_ids):
+        """ makes sure that the pages of the given glyphs 
+            are resident. """
+        glyph_ids = np.asarray(glyph_ids)
+        missing = glyph_ids[~self._glyph_resident[glyph_ids]]
+        if len(missing):
+            self.require_pages(np.unique(self.font_file.glyph_table['page'][missing]))
+
+    def require_pages(self, pages):
+        """ uploads the given pages if they are not resident """
+        pages = [p for p in pages if self._page_layer[p] < 0]
+        if not len(pages):
+            return
+
+        if len(self.layers) + len(pages) > self.texture.size[0]:
+            self._reserve(len(self.layers) + len(pages))
+
+        for page in pages:
+            layer = len(self.layers)
+            self.texture.set_layer(layer, self.font_file.page(page))
+            self._page_layer[page] = layer
+            self.layers.append(int(page))
+            GPUPY_GL.debug('font page {} resident in layer {}'.format(page, layer))
+
+        table = self.font_file.glyph_table
+        self._glyph_resident = self._page_layer[table['page']] >= 0
+        self._glyph_data['glyph']['page'] = np.maximum(self._page_layer[table['page']], 0)
+        self.glyph_buffer.set(self._glyph_data)
+
+    def _reserve(self, layers):
+        """ grows the texture array to the next power of two 
+            of **layers** and uploads the resident pages again """
+        capacity = 1 << max(0, layers - 1).bit_length()
+        capacity = min(capacity, max(1, len(self.font_file.page_paths)))
+        self.texture.format(np.uint8, (capacity,) + tuple(self.font_file.page_shape))
+        for layer, page in enumerate(self.layers):
+            self.texture.set_layer(layer, self.font_file.page(page))
+
 class FontRenderer():
+    """
+    renders TextObjects. 
+
+    in **batched** mode all text objects share a single buffer
+    of CHAR_DTYPE records. each text object owns a slot with a 
+    power of two capacity within the buffer, unused records of 
+    a slot have size 0 and are discarded by the geometry shader. 
+    a relayout only uploads the slot of the changed text object, 
+    the whole layer is rendered by a single draw call. text
+    objects which use a custom shader are not supported 
+    in batched mode.
+    """
+    MIN_SLOT_CAPACITY = 4
 
-    def __init__(self, font=None, camera=None, buffer_base=None):
+    def __init__(self, font=None, camera=None, buffer_base=None, batched=False, glyph_run_cache=None, lazy_pages=True):
         self.camera = camera
+        self.lazy_pages = lazy_pages
+        self.glyph_run_cache = glyph_run_cache if glyph_run_cache is not None else GLYPH_RUN_CACHE
         if font is None:
             font = os.path.join(FONT_FOLDER, 'arial.fnt')
         self.font_path = font
@@ -115,21 +186,28 @@ class FontRenderer():
         self._fnt = None
         self._buffer_base = buffer_base
 
+        self.batched = batched
+        self._batch_data = None
+        self._batch_buffer = None
+        self._batch_vao = None
+        self._batch_length = 0
+        self._slots = {}
+
     @property
     def font(self):
         return self._fnt
 
     def init(self):
         # load font file
-        self._fnt = FNTFile.load_from_file(self.font_path)
-        self.font_atlas = FontAtlas(self._fnt, self._buffer_base if self._buffer_base is not None else GPUPY_GL.CONTEXT.buffer_base('gpupy.gl.camera'))
+        self._fnt = FNTFile.load(self.font_path)
+        self.font_atlas = FontAtlas(self._fnt, self._buffer_base if self._buffer_base is not None else GPUPY_GL.CONTEXT.buffer_base('gpupy.gl.font.glyph_data'), lazy=self.lazy_pages)
 
         # create shader
         self.shader_program = Program()
         self.shader_program.shaders.append(Shader(GL_VERTEX_SHADER, VERTEX_SHADER))
         self.shader_program.shaders.append(Shader(GL_GEOMETRY_SHADER, GEOMETRY_SHADER))
         self.shader_program.shaders.append(Shader(GL_FRAGMENT_SHADER, FRAGMENT_SHADER))
-        self.shader_program.declare_uniform('camera', Camera.DTYPE if self.camera is None else self.camera, variable='camera')
+        self.shader_program.declare_uniform('camera', Camera2D.DTYPE if self.camera is None else self.camera, variable='camera')
         self.shader_program.declare_struct('t_glyph', GLYPH_DTYPE)
         self.shader_program.declare_uniform('glyph_data', self.font_atlas.glyph_buffer)
         self.shader_program.link()
@@ -150,6 +228,7 @@ class FontRenderer():
         sets parameters for signed distance field parameter
         functions.
         """
+        self.render_parameters = dict(width_max=width_max, width_k=width_k, edge_slope=edge_slope, edge_trans=edge_trans)
         self.shader_program.uniform('width_max', width_max)
         self.shader_program.uniform('width_k', width_k)
         self.shader_program.uniform('edge_slope', edge_slope)
@@ -174,18 +253,105 @@ class FontRenderer():
         self._has_changes = True
         return textobj
 
+    def remove_text(self, textobj):
+        """ removes a text object. in batched mode the slot
+            is cleared and reused by the next repack. """
+        self.texts.remove(textobj)
+        if textobj in self._slots:
+            offset, capacity = self._slots.pop(textobj)
+            self._batch_data['size'][offset:offset+capacity] = 0
+            self._batch_buffer.set_subdata(self._batch_data[offset:offset+capacity], offset)
+        self._has_changes = True
+
+    def _slot_capacity(self, length):
+        return max(self.MIN_SLOT_CAPACITY, 1 << max(0, length - 1).bit_length())
+
+    def _write_slot(self, textobj):
+        offset, capacity = self._slots[textobj]
+        chardata = textobj.get_data(update_buffer_object=False)
+        slot = self._batch_data[offset:offset+capacity]
+        slot[:len(chardata)] = chardata
+        slot['size'][len(chardata):] = 0
+        return slot
+
+    def _repack(self):
+        """ assigns new slots to all text objects and 
+            uploads the whole batch buffer """
+        self._slots = {}
+        offset = 0
+        for textobj in self.texts:
+            capacity = self._slot_capacity(len(textobj.get_data(update_buffer_object=False)))
+            self._slots[textobj] = (offset, capacity)
+            offset += capacity
+
+        # leave some space for new text objects
+        self._batch_data = np.zeros(1 << max(0, offset - 1).bit_length(), dtype=CHAR_DTYPE)
+        self._batch_length = offset
+        for textobj in self.texts:
+            self._write_slot(textobj)
+
+        if self._batch_buffer is None:
+            self._batch_buffer = BufferObject.to_device(self._batch_data, usage=GL_DYNAMIC_DRAW)
+            self._batch_vao = create_vao_from_program_buffer_object(self.shader_program, self._batch_buffer)
+        else:
+            self._batch_buffer.set(self._batch_data)
+
+    def _flush_batch(self):
+        """ uploads the slots of all changed text objects.
+            repacks the buffer if a text object does not fit
+            into its slot anymore. """
+        dirty = [t for t in self.texts if t._has_changes or t not in self._slots]
+        if not len(dirty):
+            return
+        
+        for textobj in dirty:
+            textobj.get_data(update_buffer_object=True)
+
+        # new text objects are appended behind the last slot
+        offset = self._batch_length
+        for textobj in dirty:
+            if textobj not in self._slots:
+                capacity = self._slot_capacity(len(textobj))
+                self._slots[textobj] = (offset, capacity)
+                offset += capacity
+
+        if (self._batch_data is None 
+            or offset > len(self._batch_data)
+            or any(len(t) > self._slots[t][1] for t in dirty)):
+            self._repack()
+            return 
+
+        self._batch_length = offset
+        for textobj in dirty:
+            self._batch_buffer.set_subdata(self._write_slot(textobj), self._slots[textobj][0])
+
     def render(self):
         glClearColor(1,1,1,1)
-        glActiveTexture(GL_TEXTURE1) # XXX disale texture later??
 
+        # the layout uploads missing font pages which unbinds
+        # the atlas texture, it must be done before binding.
+        if self.batched:
+            self._flush_batch()
+        else:
+            vaos = [textobj.get_vao(self.shader_program) for textobj in self.texts]
+
+        glActiveTexture(GL_TEXTURE1) # XXX disale texture later??
         with self.font_atlas.texture:
             glEnable (GL_BLEND)
             glBlendFunc (GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
+            if self.batched:
+                if self._batch_length:
+                    self.shader_program.use()
+                    glBindVertexArray(self._batch_vao)
+                    glDrawArrays(GL_POINTS, 0, self._batch_length)
+                    glBindVertexArray(0)
+                    self.shader_program.unuse()
+                return
+
             # render
-            for textobj in self.texts:
+            for textobj, vao in zip(self.texts, vaos):
                 shader = textobj.get_shader(self.shader_program)
-                vao = textobj.get_vao(self.shader_program)
 
                 shader.use()
                 glBindVertexArray(vao)
@@ -195,16 +361,29 @@ class FontRenderer():
 
 
     def render_text(self, textobj):
-        glActiveTexture(GL_TEXTURE1) # XXX disale texture later??
+        if self.batched:
+            if textobj not in self.texts:
+                raise FontException('text object was not created by this renderer, see create_text()')
+            self._flush_batch()
+        else:
+            vao = textobj.get_vao(self.shader_program)
 
+        glActiveTexture(GL_TEXTURE1) # XXX disale texture later??
         with self.font_atlas.texture:
             glEnable (GL_BLEND)
             glBlendFunc (GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
+            if self.batched:
+                offset, capacity = self._slots[textobj]
+                self.shader_program.use()
+                glBindVertexArray(self._batch_vao)
+                glDrawArrays(GL_POINTS, offset, capacity)
+                glBindVertexArray(0)
+                self.shader_program.unuse()
+                return
+
             # render
             shader = textobj.get_shader(self.shader_program)
-            vao = textobj.get_vao(self.shader_program)
-
             shader.use()
             glBindVertexArray(vao)
             glDrawArrays(GL_POINTS, 0, len(textobj))
@@ -244,25 +423,8 @@ class TextObject(object):
 
         self._has_changes = True
 
-    def __len__(self):
-        return len(self._chars)
-
     def _prepare(self, update_buffer_object=True):
-        if not self._has_changes:
-            pass
-
         font = self.renderer.font
-        index = 0
-        position = self.position
-
-        colors = []
-        if type(self._color[0]) in [list, tuple]:
-            for charcol in self._color:
-                colors.append(charcol)
-            for i in range(len(colors), len(self.chars)):
-                colors.append(charcol)
-        else:
-            colors = [self._color for i in range(len(self.chars))]
 
         try:
             chars = self.chars.decode('utf-8')
@@ -276,37 +438,27 @@ class TextObject(object):
             return self._LATEX_CHARACTER_MAPPING[match.group(1)]
             
         chars = re.sub(r'\$([a-zA-Z0-9]+)\$', _map_latex_placeholder, chars)
-        chardata = np.empty(len(chars), dtype=CHAR_DTYPE)
-
-        char_list = []
-        position = [self.position[0], self.position[1]]
-
-        for char in chars:
-            if not char in font.char_glyph:
-                # XXX
-                # - define me
-                print('WARNING UNKOWN CHAR renderer.py')
-                continue
-            glyph_id = font.glyphs[font.char_glyph[char]]
-
-            chardata[index] = ((position[0], position[1]), colors[index], self.size, self.rotation, font.char_glyph[char])
-            sizefactor = float(self.size)/60
-            position = (position[0]+sizefactor*float(glyph_id.xadvance-16), position[1])
-            index += 1
-
-        coords = chardata['position'] - self.position
-        transformation = np.array([
-            (np.cos(self.rotation), np.sin(self.rotation)),
-            (-np.sin(self.rotation), np.cos(self.rotation))
-        ], dtype=np.float32)
-        chardata['position'] = [transformation.dot(a) for a in coords]
+        glyph_ids, advance = self.renderer.glyph_run_cache.get(font, chars, self.size)
+        self.renderer.font_atlas.require(glyph_ids)
+
+        # rotate the advance vector around the text position.
+        # same convention as the geometry shader (y axis points down).
+        chardata = np.empty(len(glyph_ids), dtype=CHAR_DTYPE)
+        direction = np.array((np.cos(self.rotation), -np.sin(self.rotation)), dtype=np.float32)
+        chardata['position'] = advance[:, np.newaxis] * direction
         chardata['position'] += self.position
+        chardata['color'] = _char_colors(self._color, len(glyph_ids))
+        chardata['size'] = self.size
+        chardata['rot'] = self.rotation
+        chardata['glyph_id'] = glyph_ids
 
-        positions = chardata['position']
         self._char_data = chardata
-        self._boxsize = (
-            chardata['position'][-1][0]-chardata['position'][0][0]+self._size,
-            chardata['position'][0][1]-chardata['position'][-1][1]+self._size)
+        if len(chardata):
+            self._boxsize = (
+                chardata['position'][-1][0]-chardata['position'][0][0]+self._size,
+                chardata['position'][0][1]-chardata['position'][-1][1]+self._size)
+        else:
+            self._boxsize = (0, 0)
         self._has_changes = False
 
         if update_buffer_object and self._buffer_object is not None:
@@ -338,7 +490,7 @@ class TextObject(object):
 
     @rotation.setter
     def rotation(self, value):
-        self._rotation = rotation
+        self._rotation = value
         self._has_changes = True
 
     @property
@@ -380,17 +532,129 @@ class TextObject(object):
         self._has_changes = True
 
     def __len__(self):
+        """ number of glyphs. unknown characters are dropped
+            and latex placeholders are mapped, so the length
+            is only known after the layout. """
+        if self._char_data is not None:
+            return len(self._char_data)
         try:
             return len(self._chars.decode('utf-8'))
         except:
             return len(self._chars)
 
+def _char_colors(color, n):
+    """ returns a (n, 4) color array. **color** is either a single
+        color or a list of colors per character. if the list is
+        shorter than the text, the last color is repeated. """
+    colors = np.asarray(color, dtype=np.float32)
+    if colors.ndim == 1:
+        return colors
+    if not len(colors):
+        raise ValueError('at least one color is required')
+    if len(colors) >= n:
+        return colors[:n]
+    return np.concatenate((colors, np.repeat(colors[-1:], n - len(colors), axis=0)))
+
+def layout_glyph_run(font, chars, size):
+    """
+    lays out a single line of text. returns the glyph ids and the
+    advance of each glyph along the baseline relative to the first
+    glyph. characters which are not in the font are dropped.
+
+        glyph_ids, advance = layout_glyph_run(font, 'abc', 12)
+    """
+    codepoints = np.frombuffer(chars.encode('utf-32-le'), dtype=np.uint32)
+    glyph_ids = font.glyph_ids(codepoints)
+    known = glyph_ids >= 0
+    if not np.all(known):
+        GPUPY_GL.warn('font has no glyph for character(s) {}'.format(
+            ', '.join(repr(chr(c)) for c in np.unique(codepoints[~known]))))
+        glyph_ids = glyph_ids[known]
+
+    advance = np.zeros(len(glyph_ids), dtype=np.float32)
+    if len(glyph_ids) > 1:
+        sizefactor = float(size)/60
+        np.cumsum(sizefactor*(font.glyph_xadvance[glyph_ids[:-1]]-16), out=advance[1:])
+    return glyph_ids, advance
+
 
 
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+
+class GlyphRunCache():
+    """
+    lru cache of glyph runs. maps (font, text, size) to the
+    result of layout_glyph_run. the returned arrays are read
+    only since they are shared between text objects. fonts 
+    are referenced weakly, the runs of a collected font are
+    dropped.
+
+        cache = GlyphRunCache(maxsize=4096)
+        glyph_ids, advance = cache.get(font, '0.5', 12)
+        cache.info()
+    """
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._runs = OrderedDict()
+        self._fonts = weakref.WeakKeyDictionary()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, font, chars, size):
+        key = (self._font_ref(font), chars, size)
+        try:
+            run = self._runs[key]
+        except KeyError:
+            pass
+        else:
+            self._runs.move_to_end(key)
+            self._hits += 1
+            return run
+
+        self._misses += 1
+        run = layout_glyph_run(font, chars, size)
+        for a in run:
+            a.flags.writeable = False
+        self._runs[key] = run
+        while len(self._runs) > self.maxsize:
+            self._runs.popitem(last=False)
+            self._evictions += 1
+        return run
+
+    def _font_ref(self, font):
+        try:
+            return self._fonts[font]
+        except KeyError:
+            ref = self._fonts[font] = weakref.ref(font, self._forget)
+            return ref
+
+    def _forget(self, ref):
+        """ drops the runs of a collected font """
+        for key in [k for k in self._runs if k[0] is ref]:
+            del self._runs[key]
+
+    def info(self):
+        return CacheInfo(self._hits, self._misses, self._evictions, self.maxsize, len(self._runs))
+
+    def clear(self):
+        self._runs.clear()
+        self._hits = self._misses = self._evictions = 0
+
+    def __len__(self):
+        return len(self._runs)
+
+# shared by all FontRenderers which do not define their own cache
+GLYPH_RUN_CACHE = GlyphRunCache()
+
 class FNTFile():
     """
-    *.fnt representation.
-    todo: persist
+    *.fnt representation. 
+
+    the glyphs are kept in the structured array **glyph_table**
+    of FNT_GLYPH_DTYPE. FNTFile.load() reads a compiled font
+    cache (see compile_font()) if it is up to date, so neither
+    the .fnt file nor the page images have to be parsed.
     """
 
     class FNTGlyph():
@@ -403,61 +667,223 @@ class FNTFile():
             self.page, self.chnl = [int(a) for a in args]
 
         def dump(self):
-            return ((self.x, self.y,0,0), (self.width,self.height,0,0),(self.xoffset,self.yoffset,0,0),self.page,self.xadvance,self.chnl,0)
+            return ((self.x, self.y,0,0), (self.width,self.height,0,0),(self.xoffset,self.yoffset,0,0),self.xadvance,self.page,self.chnl,0)
+
+    _CHAR_PROG = re.compile(u'^char\s+id=(\d+)\s+x=(\d+)\s+y=(\d+)\s+width=(\d+)'
+                          + u'\s+height=(\d+)\s+xoffset=(-?\d+)\s+yoffset=(-?\d+)'
+                          + u'\s+xadvance=(\d+)\s+page=(\d+)\s+chnl=(\d+)', re.M)
+    _PAGE_PROG = re.compile(u'^page id=(\d+)\s+file="?(.*\.png)"?', re.M)
+    _CHARS_COUNT_PROG = re.compile(u'^chars count=(\d+)', re.M)
+    _COMMON_PROG = re.compile(u'^common\s.*?scaleW=(\d+)\s+scaleH=(\d+)', re.M)
+
+    def __init__(self, glyph_table=None, page_paths=(), codepoint_glyph=None, page_shape=None, cache_path=None):
+        self.page_paths = list(page_paths)
+        self.glyph_table = glyph_table if glyph_table is not None else np.zeros(0, dtype=FNT_GLYPH_DTYPE)
+        self.cache_path = cache_path
+        self._codepoint_glyph = codepoint_glyph
+        self._page_shape = page_shape
+        self._pages = {}
+        self._glyphs = None
+        self._char_glyph = None
+
+    @property
+    def glyphs(self):
+        """ list of FNTGlyph, use glyph_table if possible """
+        if self._glyphs is None:
+            self._glyphs = [FNTFile.FNTGlyph(*row) for row in self.glyph_table.tolist()]
+        return self._glyphs
+
+    @property
+    def char_glyph(self):
+        """ dict char -> glyph index, use codepoint_glyph if possible """
+        if self._char_glyph is None:
+            self._char_glyph = {chr(cid): i for i, cid in enumerate(self.glyph_table['id'].tolist())}
+        return self._char_glyph
+
+    @property
+    def codepoint_glyph(self):
+        """ lookup array codepoint -> glyph index, -1 if the
+            font has no glyph for the codepoint """
+        if self._codepoint_glyph is None:
+            cids = self.glyph_table['id']
+            lookup = np.full(cids.max() + 1 if len(cids) else 0, -1, dtype=np.int32)
+            lookup[cids] = np.arange(len(cids), dtype=np.int32)
+            self._codepoint_glyph = lookup
+        return self._codepoint_glyph
 
+    @property
+    def glyph_xadvance(self):
+        """ xadvance by glyph index """
+        return self.glyph_table['xadvance']
 
-    def __init__(self):
-        self.page_paths = []
-        self.glyphs = []
-        self.char_glyph = {}
+    @property
+    def atlas(self):
+        """ uint8 array (pages, width, height) of the signed distance 
+            field of all pages. """
+        return np.array([self.page(i) for i in range(len(self.page_paths))], dtype=np.uint8)
+
+    @property
+    def page_shape(self):
+        """ shape of a page, the scaleW and scaleH of the font """
+        if self._page_shape is None:
+            self._page_shape = self.page(0).shape
+        return tuple(self._page_shape)
+
+    def page(self, index):
+        """ uint8 signed distance field of page **index**. the page
+            is read from the compiled font cache or decoded from
+            the page image on first access. """
+        if index not in self._pages:
+            if self.cache_path is not None:
+                with np.load(self.cache_path, allow_pickle=False) as bundle:
+                    page = bundle['page_{}'.format(index)]
+            else:
+                page = np.asarray(imread(self.page_paths[index])[:,:,3], dtype=np.uint8)
+            if self._page_shape is not None and page.shape != tuple(self._page_shape):
+                raise FontException('font page id={} file="{}" image size {}x{} differs from the font size {}x{}'.format(
+                    index, self.page_paths[index], page.shape[0], page.shape[1], *self._page_shape))
+            self._pages[index] = page
+        return self._pages[index]
+
+    def glyph_ids(self, codepoints):
+        """ maps an array of codepoints to glyph indices, -1 for
+            codepoints without glyph """
+        lookup = self.codepoint_glyph
+        codepoints = np.asarray(codepoints)
+        inside = codepoints < len(lookup)
+        return np.where(inside, lookup[np.where(inside, codepoints, 0)] if len(lookup) else -1, -1).astype(np.int32)
+
+    def glyph_data(self):
+        """ returns the glyph table as GLYPH_DTYPE array """
+        table = self.glyph_table
+        data = np.zeros(len(table), dtype=GLYPH_DTYPE)
+        data['position'][:, 0] = table['x']
+        data['position'][:, 1] = table['y']
+        data['size'][:, 0] = table['width']
+        data['size'][:, 1] = table['height']
+        data['offset'][:, 0] = table['xoffset']
+        data['offset'][:, 1] = table['yoffset']
+        data['xadvance'] = table['xadvance']
+        data['page'] = table['page']
+        data['chnl'] = table['chnl']
+        return data
 
     @classmethod
-    def load_from_file(cls, file_path):
-        prog = re.compile(u'^char\s+id=(\d+)\s+x=(\d+)\s+y=(\d+)\s+width=(\d+)'
-                        + u'\s+height=(\d+)\s+xoffset=(-?\d+)\s+yoffset=(-?\d+)'
-                        + u'\s+xadvance=(\d+)\s+page=(\d+)\s+chnl=(\d+)')
+    def load(cls, file_path, cache=True):
+        """
+        loads a font. if **cache** is True a compiled font 
+        cache is used and created if it does not exist
+        or is outdated.
+        """
+        if not cache:
+            return cls.load_from_file(file_path)
+
+        for cache_path in font_cache_paths(file_path):
+            fnt = cls.load_from_cache(file_path, cache_path)
+            if fnt is not None:
+                return fnt
+
+        fnt = cls.load_from_file(file_path)
+        compile_font(fnt, file_path)
+        return fnt
 
-        fnt = cls()
-        page_prog = re.compile(u'^page id=(\d+)\s+file="?(.*\.png)"?')
-        page_files = []
+    @classmethod
+    def load_from_cache(cls, file_path, cache_path):
+        """ returns None if there is no valid cache at **cache_path** """
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with np.load(cache_path, allow_pickle=False) as bundle:
+                if int(bundle['version']) != FONT_CACHE_VERSION:
+                    return None
+                directory = os.path.dirname(os.path.abspath(file_path))
+                page_paths = [os.path.join(directory, p) for p in bundle['page_files'].tolist()]
+                if not np.array_equal(bundle['mtimes'], _font_mtimes(file_path, page_paths)):
+                    return None
+                return cls(glyph_table=bundle['glyph_table'], 
+                           page_paths=page_paths, 
+                           codepoint_glyph=bundle['codepoint_glyph'], 
+                           page_shape=tuple(bundle['page_shape'].tolist()),
+                           cache_path=cache_path)
+        except (OSError, KeyError, ValueError) as e:
+            GPUPY_GL.warn('could not read font cache "{}": {}'.format(cache_path, e))
+            return None
+
+    @classmethod
+    def load_from_file(cls, file_path):
+        """ parses an AngelCode .fnt file """
         with open(file_path) as f:
-            expected_chars = None
-            index = 0;
-            for line in f:
-                match = page_prog.match(line)
-                if match is not None:
-                    pid, pfile = match.groups()
-                    page_path = os.path.join(os.path.dirname(file_path), pfile)
-                    fnt.page_paths.append(page_path)
-                    continue
-
-                if expected_chars is None:
-                    if line[0:11] == 'chars count':
-                        expected_chars = int(line.split('=')[1])
-                else:
-                    match = prog.match(line)
-                    if match is not None:
-                        if len(fnt.glyphs) > expected_chars:
-                            raise Exception('more characters than declared in "chars count" found in file ""'.format(file_path))
-
-                        fntchar = FNTFile.FNTGlyph(*match.groups())
-                        fnt.glyphs.append(fntchar)
-                        try:
-                            fnt.char_glyph[unichr(fntchar.cid)] = index
-                        except:
-                            fnt.char_glyph[chr(fntchar.cid)] = index
-                        index += 1
-
-            if expected_chars is None:
-                raise Exception('"chars count" missing in file "{}"'.format(file_path))
-
-            if expected_chars != len(fnt.glyphs):
-                raise Exception(
-                    ('did not find all characters: expected {}'
-                    +' characterd to be defined but found {} in file "{}"').format(
-                    expected_chars, len(fnt.glyphs), file_path))
-
-            return fnt
+            source = f.read()
+
+        directory = os.path.dirname(file_path)
+        page_paths = [os.path.join(directory, pfile) for pid, pfile in cls._PAGE_PROG.findall(source)]
+
+        match = cls._CHARS_COUNT_PROG.search(source)
+        if match is None:
+            raise FontException('"chars count" missing in file "{}"'.format(file_path))
+        expected_chars = int(match.group(1))
+
+        # only chars declared after "chars count" are glyphs
+        chars = cls._CHAR_PROG.findall(source, match.end())
+        glyph_table = np.array([tuple(int(a) for a in c) for c in chars], dtype=FNT_GLYPH_DTYPE) \
+                      if len(chars) else np.zeros(0, dtype=FNT_GLYPH_DTYPE)
+
+        if expected_chars != len(glyph_table):
+            raise FontException(
+                ('did not find all characters: expected {}'
+                +' characterd to be defined but found {} in file "{}"').format(
+                expected_chars, len(glyph_table), file_path))
+
+        # the page size is known without decoding the pages
+        match = cls._COMMON_PROG.search(source)
+        page_shape = None
+        if match is not None:
+            page_shape = (int(match.group(2)), int(match.group(1)))
+
+        return cls(glyph_table=glyph_table, page_paths=page_paths, page_shape=page_shape)
+
+def font_cache_paths(file_path):
+    """ candidates of the compiled font cache: within
+        FONT_CACHE_FOLDER or next to the font file """
+    file_path = os.path.abspath(file_path)
+    name = '{}-{}.npz'.format(os.path.basename(file_path), hashlib.sha1(file_path.encode()).hexdigest()[:12])
+    return [os.path.join(FONT_CACHE_FOLDER, name), file_path + '.npz']
+
+def compile_font(fnt, file_path):
+    """
+    writes the compiled font cache of **fnt** which was loaded 
+    from **file_path**: the glyph table, the codepoint lookup
+    and the uint8 pages. the arrays are stored uncompressed, 
+    each page is a separate member so it can be read on demand.
+    returns the path of the cache or None if no cache location
+    is writable.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    bundle = dict(
+        version=np.int32(FONT_CACHE_VERSION),
+        glyph_table=fnt.glyph_table,
+        codepoint_glyph=fnt.codepoint_glyph,
+        page_shape=np.array(fnt.page_shape, dtype=np.int32),
+        page_files=np.array([os.path.relpath(p, directory) for p in fnt.page_paths], dtype=np.str_),
+        mtimes=_font_mtimes(file_path, fnt.page_paths))
+    for i in range(len(fnt.page_paths)):
+        bundle['page_{}'.format(i)] = fnt.page(i)
+
+    for cache_path in font_cache_paths(file_path):
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            # np.savez appends .npz if the name does not end with it
+            with open(cache_path, 'wb') as f:
+                np.savez(f, **bundle)
+            fnt.cache_path = cache_path
+            return cache_path
+        except OSError:
+            continue
+    GPUPY_GL.warn('could not write font cache for "{}"'.format(file_path))
+    return None
+
+def _font_mtimes(file_path, page_paths):
+    return np.array([os.stat(p).st_mtime_ns for p in [file_path] + list(page_paths)], dtype=np.int64)
 
 
 VERTEX_SHADER = """
@@ -526,6 +952,11 @@ t_glyph current;
 
 void main(void)
 {
+    // unused records of a batch slot
+    if (geom_glyph_size[0] <= 0) {
+        return;
+    }
+
     glyph_rotation[0] = vec4(cos(geom_glyph_rot[0]),-sin(geom_glyph_rot[0]),0,0);
     glyph_rotation[1] = vec4(sin(geom_glyph_rot[0]),cos(geom_glyph_rot[0]),0,0);
     glyph_rotation[2] = vec4(0,0,1,0);
@@ -605,7 +1036,7 @@ void main()
     _e = edge_slope / frag_glyph_size + edge_trans;
 
     // signed distance field
-    distance = 1.0-texture(tex, vec3(tex_coord, page_id)).r/255;
+    distance = 1.0-texture(tex, vec3(tex_coord, page_id)).r;
     alpha = 1.0-smoothstep(_w, _w+_e, distance);
 
     // colorize
@@ -6,12 +6,19 @@ framebuffer utilities
 """
 
 from OpenGL.GL import * 
+from gpupy.gl import GPUPY_GL
 from gpupy.gl.texture import gl_texture_id
 from gpupy.gl.errors import GlError
 
 def create_framebuffer(color=None, depth=None, stencil=None):
     pass
 
+def default_framebuffer():
+    """ returns the framebuffer of the current context which is
+        bound if no offscreen framebuffer is in use. this is 0 
+        except for headless contexts. """
+    return getattr(GPUPY_GL.CONTEXT, 'default_framebuffer', 0)
+
 class Framebuffer():
 
     def __init__(self):
@@ -56,7 +63,16 @@ class Framebuffer():
             raise GlError('framebuffer is not configured properly.')
 
     def unuse(self):
-        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, 0)
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, default_framebuffer())
+
+    def delete(self):
+        """
+        deletes the gl framebuffer if exists. the attached
+        textures are not deleted.
+        """
+        if self.gl_framebuffer_id is not None:
+            glDeleteFramebuffers(1, [self.gl_framebuffer_id])
+            self.gl_framebuffer_id = None
 
     def blit(): pass
 
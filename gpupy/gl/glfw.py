@@ -52,7 +52,17 @@ def create_runner(windows):
     XXX: Is this bad?
     """
     while len(windows):
-        glfwPollEvents()
+        # nothing was damaged within the last cycle, sleep until
+        # an event arrives or the idle timeout is over.
+        idle = [getattr(w, 'idle_timeout', None) for w in windows if getattr(w, 'idle', False)]
+        if len(idle) == len(windows):
+            timeout = None if None in idle else min(idle)
+            if timeout is None or not 'glfwWaitEventsTimeout' in globals():
+                glfwWaitEvents()
+            else:
+                glfwWaitEventsTimeout(timeout)
+        else:
+            glfwPollEvents()
         for window in windows:
             try:
                 yield window
@@ -76,10 +86,21 @@ class GLFW_Window(Context):
         size=(400, 400), 
         title='gpupy glfw window',
         bootstrap=True, 
-        widget=None
+        widget=None,
+        damage_driven=False,
+        idle_timeout=0.1
     ):
+        """
+        if **damage_driven** the buffers are only swapped if the
+        context was damaged within the cycle. if no window was
+        damaged, the runner waits for events up to **idle_timeout**
+        seconds (forever if None) instead of polling.
+        """
         super().__init__()
         self._glfw_initialized = False
+        self.damage_driven = damage_driven
+        self.idle_timeout = idle_timeout
+        self.idle = False
         self.size = size 
         self.title = title
         self.visible = True 
@@ -122,6 +143,7 @@ class GLFW_Window(Context):
 
         def _resize_callback(window, width, height):
             self.size = (width, height)
+            self.damage()
 
             if len(self.on_resize):
                 # at this point we only make a new context if we are not just
@@ -144,6 +166,7 @@ class GLFW_Window(Context):
 
         def _v2_callback(attr, window, width, height):
             setattr(self, attr, (width, height)) 
+            self.damage()
 
 
         def _close_callback(*e):
@@ -190,7 +213,10 @@ class GLFW_Window(Context):
         # run widget and close if return value is False
         self.on_cycle(self)
         success = self.widget()
-        glfwSwapBuffers(self._handle)
+        self.idle = self.damage_driven and not self.damaged
+        if not self.idle:
+            glfwSwapBuffers(self._handle)
+            self.damaged = False
         self._in_cycle = False
         if not success:
             self._active = False 
@@ -193,6 +193,15 @@ def dtype_is_struct(dtype):
 
 #SUPPORTED_VECOTR_TYPS
 
+def uniform_block_glsl_name(name, variable=None):
+    """
+    returns the glsl name of the uniform block **name**. the 
+    block name must not be used as the instance **variable** 
+    (GLSL 4.1, 4.3.7), strict compilers like mesa reject it. 
+    such blocks are suffixed by "_block".
+    """
+    return '{}_block'.format(name) if variable == name else name
+
 def render_uniform_block_from_dtype(name, dtype, layout, length=None, structs={}, variable=None):
     """
     renders a glsl uniform block by a given dtype
@@ -210,7 +219,7 @@ def render_uniform_block_from_dtype(name, dtype, layout, length=None, structs={}
         <dtype>
     }[<length>] <variable>;
     """
-    gl_code = "layout ({}) uniform {}\n{{\n".format(layout, name)
+    gl_code = "layout ({}) uniform {}\n{{\n".format(layout, uniform_block_glsl_name(name, variable))
     gl_code += render_struct_items_from_dtype(dtype, structs=structs, length=length)
 
     if variable is not None:
@@ -6,6 +6,10 @@ class GPUPY_GL:
 
     CHECK_VALUES = os.environ.get('GPUPY_DEVELOPMENT', 0) == '1'
 
+    """ whether shaders loaded from files are reloaded 
+        when the files change. see gpupy.gl.watcher """
+    WATCH_SHADERS = os.environ.get('GPUPY_WATCH_SHADERS', 0) == '1'
+
     """ whether the application is in debug mode. """
     DEBUG = False
 
@@ -0,0 +1,243 @@
+#-*- coding: utf-8 -*-
+"""
+headless contexts render into a framebuffer object instead of
+a window, no display is required. the OpenGL context is created
+by EGL (surfaceless, e.g. mesa llvmpipe or gpu render nodes) or
+by OSMesa.
+
+PyOpenGL binds its platform when OpenGL is imported for the first
+time, so PYOPENGL_PLATFORM must be set before anything of gpupy
+is imported:
+
+    import os
+    os.environ['PYOPENGL_PLATFORM'] = 'egl'
+
+    from gpupy.gl.headless import HeadlessContext
+    context = HeadlessContext(size=(800, 600))
+    context.widget = my_widget
+    context()
+    image = context.read_pixels()
+
+XXX
+- multisampling
+
+:author: keksnicoh
+"""
+
+from gpupy.gl import GPUPY_GL
+from gpupy.gl.context import Context, ContextException, GlVersion
+from gpupy.gl.texture import Texture2D
+from gpupy.gl.framebuffer import Framebuffer
+from gpupy.gl.lib import attributes
+
+from OpenGL import platform
+from OpenGL.GL import *
+import numpy as np
+import ctypes
+
+__all__ = ['HeadlessContext']
+
+BACKENDS = ('egl', 'osmesa')
+
+# EGL_MESA_platform_surfaceless
+EGL_PLATFORM_SURFACELESS_MESA = 0x31DD
+
+def_version = GlVersion('4.1', core_profile=True, forward_compat=True)
+
+class HeadlessContext(Context):
+    """
+    context without a display. the widget renders into the
+    framebuffer object of default_framebuffer which is bound
+    whenever gpupy.gl.framebuffer.Framebuffer.unuse() is called.
+    """
+    size       = attributes.VectorAttribute(2)
+    resolution = attributes.VectorAttribute(2)
+
+    def __init__(self, size=(400, 400), backend=None, version=def_version, widget=None):
+        super().__init__()
+        self.backend = backend or _platform_backend()
+        if not self.backend in BACKENDS:
+            raise ValueError('unknown backend "{}". Available: {}'.format(self.backend, ', '.join(BACKENDS)))
+        if self.backend != _platform_backend():
+            raise ContextException((
+                'PyOpenGL uses the "{}" platform. set PYOPENGL_PLATFORM={} '
+                'before OpenGL is imported.').format(_platform_backend(), self.backend))
+
+        self._handle = None
+        self._framebuffer = None
+        self._color = None
+        self._depth = None
+
+        self.size = size
+        self.resolution = self.size
+        self.widget = widget or (lambda *a: True)
+
+        if self.backend == 'egl':
+            self._handle = _create_egl_context(version)
+        else:
+            self._handle = _create_osmesa_context(version)
+
+        self.make_context()
+        self._init_framebuffer()
+        self.on_ready(self)
+
+    def _init_framebuffer(self):
+        self._color = Texture2D.empty((*self._int_size(), 4), np.uint8)
+        self._color.interpolation_nearest()
+        self._framebuffer = Framebuffer()
+        self._framebuffer.color_attachment(self._color)
+
+        self._depth = glGenRenderbuffers(1)
+        glBindRenderbuffer(GL_RENDERBUFFER, self._depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH24_STENCIL8, *self._int_size())
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+
+        glBindFramebuffer(GL_FRAMEBUFFER, self._framebuffer.gl_framebuffer_id)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_STENCIL_ATTACHMENT, GL_RENDERBUFFER, self._depth)
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise ContextException('headless framebuffer is incomplete')
+
+        self.default_framebuffer = self._framebuffer.gl_framebuffer_id
+
+    def _int_size(self):
+        return tuple(int(v) for v in self.size.values)
+
+    @size.on_change
+    def _resize(self, size):
+        self.resolution = size
+        if self._framebuffer is None:
+            return
+        self.make_context()
+        self._color.resize(self._int_size())
+        glBindRenderbuffer(GL_RENDERBUFFER, self._depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH24_STENCIL8, *self._int_size())
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        self.damage()
+        self.on_resize(self)
+
+    def make_context(self):
+        """
+        makes the context current and assigns itself
+        to GPUPY_GL.CONTEXT.
+        """
+        if self.backend == 'egl':
+            from OpenGL import EGL
+            display, context = self._handle
+            EGL.eglMakeCurrent(display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, context)
+        else:
+            from OpenGL import osmesa
+            context, buffer = self._handle
+            osmesa.OSMesaMakeCurrent(context, buffer, GL_UNSIGNED_BYTE, 1, 1)
+        GPUPY_GL.CONTEXT = self
+
+    def __call__(self):
+        """
+        runs a cycle and the widget.
+
+        Returns:
+        - Bool: the return value of the widget
+        """
+        self.make_context()
+        glBindFramebuffer(GL_FRAMEBUFFER, self.default_framebuffer)
+        glViewport(0, 0, *self._int_size())
+
+        self.on_cycle(self)
+        success = self.widget()
+        self.damaged = False
+        return bool(success)
+
+    def read_pixels(self):
+        """ returns the rendered image as (height, width, 4)
+            uint8 array, the first row is the top of the image. """
+        self.make_context()
+        width, height = self._int_size()
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self.default_framebuffer)
+        glReadBuffer(GL_COLOR_ATTACHMENT0)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, width, height, GL_RGBA, GL_UNSIGNED_BYTE)
+        return np.frombuffer(data, dtype=np.uint8).reshape((height, width, 4))[::-1]
+
+    def delete(self):
+        """ destroys the gl context """
+        if self._handle is None:
+            return
+        if self.backend == 'egl':
+            from OpenGL import EGL
+            display, context = self._handle
+            EGL.eglMakeCurrent(display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+            EGL.eglDestroyContext(display, context)
+            EGL.eglTerminate(display)
+        else:
+            from OpenGL import osmesa
+            osmesa.OSMesaDestroyContext(self._handle[0])
+        if GPUPY_GL.CONTEXT is self:
+            GPUPY_GL.CONTEXT = None
+        self._handle = None
+
+def _platform_backend():
+    """ the backend of the PyOpenGL platform """
+    name = type(platform.PLATFORM).__name__.lower()
+    for backend in BACKENDS:
+        if name.startswith(backend):
+            return backend
+    return name
+
+def _create_egl_context(version):
+    from OpenGL import EGL
+
+    # prefer the surfaceless platform, the default display
+    # requires a running display server on most drivers.
+    display = EGL.EGL_NO_DISPLAY
+    try:
+        from OpenGL.EGL.EXT.platform_base import eglGetPlatformDisplayEXT
+        display = eglGetPlatformDisplayEXT(EGL_PLATFORM_SURFACELESS_MESA, EGL.EGL_DEFAULT_DISPLAY, None)
+    except Exception:
+        pass
+    if not display:
+        display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+
+    major, minor = EGL.EGLint(), EGL.EGLint()
+    if not EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+        raise ContextException('eglInitialize() error')
+
+    config_attribs = _egl_attribs(EGL, [
+        EGL.EGL_SURFACE_TYPE,    EGL.EGL_PBUFFER_BIT,
+        EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT])
+    configs, n = (EGL.EGLConfig * 1)(), EGL.EGLint()
+    if not EGL.eglChooseConfig(display, config_attribs, configs, 1, ctypes.pointer(n)) or not n.value:
+        raise ContextException('eglChooseConfig() found no OpenGL config')
+
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    context_attribs = _egl_attribs(EGL, [
+        EGL.EGL_CONTEXT_MAJOR_VERSION, version.version[0],
+        EGL.EGL_CONTEXT_MINOR_VERSION, version.version[1],
+        EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK,
+            EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT if version.core_profile
+            else EGL.EGL_CONTEXT_OPENGL_COMPATIBILITY_PROFILE_BIT])
+    context = EGL.eglCreateContext(display, configs[0], EGL.EGL_NO_CONTEXT, context_attribs)
+    if not context:
+        raise ContextException('eglCreateContext() error')
+    return display, context
+
+def _egl_attribs(EGL, attribs):
+    attribs = list(attribs) + [EGL.EGL_NONE]
+    return (EGL.EGLint * len(attribs))(*attribs)
+
+def _create_osmesa_context(version):
+    from OpenGL import osmesa, arrays
+    attribs = arrays.GLintArray.asArray([
+        osmesa.OSMESA_FORMAT,                osmesa.OSMESA_RGBA,
+        osmesa.OSMESA_DEPTH_BITS,            24,
+        osmesa.OSMESA_PROFILE,               osmesa.OSMESA_CORE_PROFILE if version.core_profile
+                                             else osmesa.OSMESA_COMPAT_PROFILE,
+        osmesa.OSMESA_CONTEXT_MAJOR_VERSION, version.version[0],
+        osmesa.OSMESA_CONTEXT_MINOR_VERSION, version.version[1],
+        0])
+    context = osmesa.OSMesaCreateContextAttribs(attribs, None)
+    if not context:
+        raise ContextException('OSMesaCreateContextAttribs() error')
+
+    # osmesa requires a buffer to make the context current. the
+    # widgets render into the framebuffer object, 1x1 is enough.
+    buffer = arrays.GLubyteArray.zeros((1, 1, 4))
+    return context, buffer
@@ -24,8 +24,10 @@ class Event(list):
 
     def __call__(self, *args, **kwargs):
         """ invokes listeners l with arguments l(*args, **kwargs)"""
+        # iterate a copy, once() listeners remove themselves
+        # while the event is invoked.
         try:
-            for l in self:
+            for l in list(self):
                 l(*args, **kwargs)
         except TypeError:
             raise TypeError(l)
@@ -91,7 +91,7 @@ class Attribute():
                 self._register(instance_obj, None, val)
            # self._val[instance_obj].on_change(self._val[instance_obj].val)
         else:
-            self.__assign__(self._val[instance_obj], self._val[instance_obj].transformation(val))
+            self.__assign__(self._val[instance_obj], self._val[instance_obj].transformation(observable_value(val)))
             attr_val = self._val[instance_obj]
             val_on_change = observable_event(val)
 
@@ -2,11 +2,16 @@
 """
 contains some function which creates basic geometric meshes.
 
+the mesh3d_* functions create triangle soups by default. With 
+indexed=True the duplicated vertices are welded and a tuple
+(vertices, indices) is returned which can be drawn by IndexedMesh.
+
 :author: Nicolas 'keksnicoh' Heimann
 """
 import numpy as np
 
 from gpupy.gl import BufferObject
+from gpupy.gl.buffer import vertex_attrib_pointer, pack_normals, PACKED_NORMAL_DTYPE, NORMALIZED_UBYTE_DTYPE
 
 from OpenGL.GL import * 
 from ctypes import c_void_p
@@ -19,6 +24,30 @@ MESH_DTYPE = np.dtype([
     ('tex', np.float32, 2),
 ])
 
+# compact mesh dtype (20 bytes instead of 48 bytes). 
+# vertices and texture coordinates are half floats, colors 
+# normalized unsigned bytes and normals are packed into 
+# GL_INT_2_10_10_10_REV. see compact_mesh().
+MESH_DTYPE_COMPACT = np.dtype([
+    ('vertex', np.float16, 4),
+    ('color', NORMALIZED_UBYTE_DTYPE, 4),
+    ('normal', PACKED_NORMAL_DTYPE),
+    ('tex', np.float16, 2),
+])
+
+def compact_mesh(mesh):
+    """ converts a MESH_DTYPE mesh to MESH_DTYPE_COMPACT. 
+        the glsl declarations of the attributes do not change. """
+    compact = np.zeros(len(mesh), dtype=MESH_DTYPE_COMPACT)
+    compact['vertex'][:, :3] = mesh['vertex']
+    compact['vertex'][:, 3] = 1
+    compact['color'] = np.round(np.clip(mesh['color'], 0, 1) * 255)
+    # packed normals are normalized to [-1, 1]
+    length = np.linalg.norm(mesh['normal'], axis=-1)[:, None]
+    compact['normal'] = pack_normals(mesh['normal'] / np.where(length > 0, length, 1))
+    compact['tex'] = mesh['tex']
+    return compact
+
 class Mesh():
     """
     basic mesh class
@@ -32,6 +61,9 @@ class Mesh():
     def draw(self):
         raise NotImplementedError('abstract method')
 
+    def delete(self):
+        raise NotImplementedError('abstract method')
+
 class StridedVertexMesh(Mesh):
     """
     strided mesh
@@ -74,23 +106,7 @@ class StridedVertexMesh(Mesh):
         self.vao = glGenVertexArrays(1)
 
         glBindVertexArray(self.vao)
-        self.buffer.bind()
-
-        for attribute, location in self.attribute_locations.items():
-            if self.buffer.dtype[attribute].subdtype is None:
-                components = 1
-            else:
-                components = self.buffer.dtype[attribute].subdtype[1][0]
-
-            glVertexAttribPointer(location, 
-                                  components, 
-                                  GL_FLOAT, 
-                                  GL_FALSE, 
-                                  self.buffer.dtype.itemsize, 
-                                  c_void_p(self.buffer.dtype.fields[attribute][1]))
-            glEnableVertexAttribArray(location)
-
-        self.buffer.unbind()
+        enable_attribute_pointers(self.buffer, self.attribute_locations)
         glBindVertexArray(0)
 
     def draw(self):
@@ -101,355 +117,527 @@ class StridedVertexMesh(Mesh):
         glDrawArrays(self.vertex_type, 0, len(self.buffer))
         glBindVertexArray(0)
 
+    def delete(self):
+        """
+        deletes the vertex array object and the vertex buffer
+        """
+        if self.vao is not None:
+            glDeleteVertexArrays(1, [self.vao])
+            self.vao = None
+        if self.buffer is not None:
+            self.buffer.delete()
+            self.buffer = None
+
+
+class IndexedMesh(StridedVertexMesh):
+    """
+    strided mesh with an element buffer
+
+        vertices, indices = mesh3d_sphere(prec=100, indexed=True)
+        mesh = IndexedMesh(vertices, indices, attribute_locations=program.attributes)
+
+    if optimize_cache is True the indices are reordered for the 
+    post-transform vertex cache, see optimize_vertex_cache().
+    """
+    def __init__(self, vertices, indices, vertex_type=GL_TRIANGLES, attribute_locations={'vertex': 1, 'color': 2, 'normal': 3, 'tex': 4}, optimize_cache=False):
+        self.indices = np.asarray(indices, dtype=np.uint32).reshape(-1)
+        if optimize_cache:
+            if vertex_type != GL_TRIANGLES:
+                raise ValueError('vertex cache optimization requires GL_TRIANGLES.')
+            self.indices = optimize_vertex_cache(self.indices, len(vertices))
+        self.element_buffer = None
+        super().__init__(vertices, vertex_type, attribute_locations)
+
+    @classmethod
+    def from_vertices(cls, vertices, *args, **kwargs):
+        """ creates an indexed mesh from a triangle soup
+            by welding duplicate vertices """
+        return cls(*weld_vertices(vertices), *args, **kwargs)
 
-def mesh3d_cylinder(r=1, h=1, prec=50, color=(.5, .5, .5, 1)):
-    if not callable(color):
-        b = color
-        del color
-        color = lambda *a: b
+    def init(self):
+        super().init()
+        self.element_buffer = BufferObject.to_device(self.indices, target=GL_ELEMENT_ARRAY_BUFFER)
 
-    phi_range = [2 * np.pi / prec * phi for phi in range(prec+1)]
+        # the element buffer binding is part of the vao state
+        glBindVertexArray(self.vao)
+        self.element_buffer.bind()
+        glBindVertexArray(0)
+
+    def draw(self):
+        """
+        draws the vertex array object
+        """
+        glBindVertexArray(self.vao)
+        glDrawElements(self.vertex_type, len(self.indices), GL_UNSIGNED_INT, c_void_p(0))
+        glBindVertexArray(0)
+
+    def delete(self):
+        """
+        deletes the vertex array object, the vertex buffer
+        and the element buffer
+        """
+        super().delete()
+        if self.element_buffer is not None:
+            self.element_buffer.delete()
+            self.element_buffer = None
+
+
+class InstancedMesh(Mesh):
+    """
+    draws many instances of a StridedVertexMesh or IndexedMesh 
+    by a single draw call. The per instance attributes are read
+    from a strided instance buffer.
+
+        INSTANCE_DTYPE = np.dtype([
+            ('model', np.float32, (4, 4)),
+            ('color', np.float32, 4),
+        ])
+        cube = StridedVertexMesh(mesh3d_cube((1, 1, 1)), attribute_locations=program.attributes)
+        cubes = InstancedMesh(cube, instances, attribute_locations=program.attributes)
+
+    the vertex buffer and element buffer of the base mesh are shared.
+    attributes which exist in the instance dtype are read from the
+    instance buffer, all other attributes from the base mesh buffer. 
+    A (4, 4) field occupies four attribute locations where each row 
+    of the numpy matrix is one column of the glsl mat4.
+    """
+    def __init__(self, base_mesh, instances, attribute_locations=None, divisor=1):
+        """
+        Arguments:
+            - base_mesh: StridedVertexMesh or IndexedMesh
+            - instances: strided numpy data or BufferObject
+            - attribute_locations: defaults to the locations of the base mesh
+            - divisor: number of instances which share one instance record
+        """
+        super().__init__(attribute_locations or base_mesh.attribute_locations)
+        self.base_mesh = base_mesh
+        self.divisor = divisor
+        if isinstance(instances, BufferObject):
+            self.instance_buffer = instances
+        else:
+            self.instance_buffer = BufferObject.to_device(instances, usage=GL_DYNAMIC_DRAW)
+        self.vao = None
+        self.init()
+
+    @property
+    def count(self):
+        """ the number of drawn instances """
+        return len(self.instance_buffer) * self.divisor
+
+    def set_instances(self, instances):
+        """ uploads new instance data """
+        self.instance_buffer.set(instances)
+
+    def init(self):
+        instance_fields = self.instance_buffer.dtype.names
+        vertex_locations = {k: v for k, v in self.attribute_locations.items() if not k in instance_fields}
+        instance_locations = {k: v for k, v in self.attribute_locations.items() if k in instance_fields}
+
+        self.vao = glGenVertexArrays(1)
+        glBindVertexArray(self.vao)
+        enable_attribute_pointers(self.base_mesh.buffer, vertex_locations)
+        enable_attribute_pointers(self.instance_buffer, instance_locations, divisor=self.divisor)
+        if isinstance(self.base_mesh, IndexedMesh):
+            self.base_mesh.element_buffer.bind()
+        glBindVertexArray(0)
+
+    def draw(self):
+        """
+        draws all instances
+        """
+        glBindVertexArray(self.vao)
+        if isinstance(self.base_mesh, IndexedMesh):
+            glDrawElementsInstanced(self.base_mesh.vertex_type, 
+                                    len(self.base_mesh.indices), 
+                                    GL_UNSIGNED_INT, 
+                                    c_void_p(0), 
+                                    self.count)
+        else:
+            glDrawArraysInstanced(self.base_mesh.vertex_type, 
+                                  0, 
+                                  len(self.base_mesh.buffer), 
+                                  self.count)
+        glBindVertexArray(0)
+
+    def delete(self):
+        """
+        deletes the vertex array object and the instance buffer.
+        the buffers of the base mesh are not deleted.
+        """
+        if self.vao is not None:
+            glDeleteVertexArrays(1, [self.vao])
+            self.vao = None
+        if self.instance_buffer is not None:
+            self.instance_buffer.delete()
+            self.instance_buffer = None
+
+
+class MeshBatch(Mesh):
+    """
+    packs the vertices of many meshes into one buffer and one
+    vertex array object. All meshes are drawn by a single
+    glMultiDrawArrays call.
+
+        batch = MeshBatch(attribute_locations=program.attributes)
+        a = batch.append(mesh3d_cube((1, 1, 1)))
+        b = batch.append(mesh3d_sphere(20))
+        batch.draw()
+
+    the meshes must share the dtype of the first mesh and the 
+    vertex type of the batch.
+    append() returns a handle which can be used to update the 
+    vertices of a mesh or to draw a subset of meshes.
+    """
+    def __init__(self, meshes=(), vertex_type=GL_TRIANGLES, attribute_locations={'vertex': 1, 'color': 2, 'normal': 3, 'tex': 4}):
+        super().__init__(attribute_locations)
+        self.vertex_type = vertex_type
+        self.buffer = None
+        self.vao = None
+        self.first = np.zeros(0, dtype=np.int32)
+        self.count = np.zeros(0, dtype=np.int32)
+        self._vertices = []
+        self._requires_init = False
+        for mesh in meshes:
+            self.append(mesh)
+
+    def __len__(self):
+        return len(self._vertices)
+
+    def append(self, mesh):
+        """ appends a StridedVertexMesh or strided vertex data. 
+            returns the handle of the mesh within the batch. """
+        vertices = self._batch_vertices(mesh)
+        first = int(self.first[-1] + self.count[-1]) if len(self) else 0
+        self._vertices.append(vertices)
+        self.first = np.append(self.first, np.int32(first))
+        self.count = np.append(self.count, np.int32(len(vertices)))
+        self._requires_init = True
+        return len(self._vertices) - 1
+
+    def update(self, handle, vertices):
+        """ replaces the vertices of a mesh by a StridedVertexMesh or
+            strided vertex data. if the number of vertices is unchanged 
+            only the range of the mesh is uploaded. """
+        if not 0 <= handle < len(self):
+            raise IndexError('invalid mesh handle {}'.format(handle))
+        vertices = self._batch_vertices(vertices)
+        if len(vertices) != self.count[handle]:
+            self._vertices[handle] = vertices
+            self.count[handle] = len(vertices)
+            self.first[1:] = np.cumsum(self.count[:-1])
+            self._requires_init = True
+        else:
+            self._vertices[handle] = vertices
+            if not self._requires_init:
+                self.buffer.set_subdata(vertices, int(self.first[handle]))
+
+    def _batch_vertices(self, mesh):
+        """ returns the vertices of **mesh** if they fit into the batch """
+        if isinstance(mesh, IndexedMesh):
+            raise ValueError('indexed meshes cannot be batched')
+        if isinstance(mesh, StridedVertexMesh):
+            if mesh.vertex_type != self.vertex_type:
+                raise ValueError('mesh vertex type {} does not match batch vertex type {}'.format(mesh.vertex_type, self.vertex_type))
+            mesh = mesh.vertices
+        if len(self._vertices) and mesh.dtype != self._vertices[0].dtype:
+            raise ValueError('mesh dtype {} does not match batch dtype {}'.format(mesh.dtype, self._vertices[0].dtype))
+        return mesh
+
+    def init(self):
+        """ uploads all vertices into a single buffer """
+        if self.vao is None:
+            self.vao = glGenVertexArrays(1)
+        if self.buffer is not None:
+            self.buffer.delete()
+        self.buffer = BufferObject.to_device(np.concatenate(self._vertices))
+
+        glBindVertexArray(self.vao)
+        enable_attribute_pointers(self.buffer, self.attribute_locations)
+        glBindVertexArray(0)
+        self._requires_init = False
+
+    def draw(self, handles=None):
+        """
+        draws all meshes or a subset given by a handle or a
+        sequence of handles
+        """
+        if not len(self):
+            return
+        if self._requires_init:
+            self.init()
+
+        first, count = self.first, self.count
+        if handles is not None:
+            handles = np.atleast_1d(handles)
+            first, count = first[handles], count[handles]
+
+        glBindVertexArray(self.vao)
+        glMultiDrawArrays(self.vertex_type, first, count, len(first))
+        glBindVertexArray(0)
+
+    def delete(self):
+        """
+        deletes the vertex array object and the buffer
+        """
+        if self.vao is not None:
+            glDeleteVertexArrays(1, [self.vao])
+            self.vao = None
+        if self.buffer is not None:
+            self.buffer.delete()
+            self.buffer = None
+        self._requires_init = len(self) > 0
+
+
+def enable_attribute_pointers(buffer, attribute_locations, divisor=0):
+    """
+    enables the vertex attribute pointers of the strided buffer 
+    fields within the bound vertex array object. Fields of shape 
+    (n, m) are passed as n attributes with m components at 
+    consecutive locations. Attributes which are not fields
+    of the buffer are skipped.
+    """
+    buffer.bind()
+    for attribute, location in attribute_locations.items():
+        if location < 0 or not attribute in buffer.dtype.names:
+            continue
+        vertex_attrib_pointer(location, 
+                              buffer.dtype[attribute], 
+                              buffer.dtype.itemsize, 
+                              buffer.dtype.fields[attribute][1], 
+                              divisor)
+    buffer.unbind()
+
+
+def weld_vertices(vertices):
+    """ merges identical records of a structured vertex array.
+        returns (unique_vertices, indices) where the unique
+        vertices keep the order of their first occurrence. """
+    vertices = np.ascontiguousarray(vertices).copy()
+
+    # -0.0 and 0.0 are equal but have different bytes
+    for name in vertices.dtype.names:
+        if vertices.dtype[name].base.kind == 'f':
+            vertices[name] += 0.0
+
+    records = vertices.view(np.dtype((np.void, vertices.dtype.itemsize)))
+    _, first, inverse = np.unique(records, return_index=True, return_inverse=True)
+
+    order = np.argsort(first, kind='stable')
+    remap = np.empty(len(first), dtype=np.uint32)
+    remap[order] = np.arange(len(first), dtype=np.uint32)
+    return vertices[first[order]], remap[inverse.reshape(-1)]
+
+def optimize_vertex_cache(indices, vertex_count=None, cache_size=16):
+    """ reorders triangle indices for the post-transform vertex 
+        cache using the tipsify algorithm of P. Sander, D. Nehab 
+        and J. Barczak, "Fast Triangle Reordering for Vertex 
+        Locality and Reduced Overdraw", SIGGRAPH 2007. 
+
+        the algorithm runs in linear time but is implemented in 
+        python, so it is meant to be used once on static meshes. """
+    indices = np.asarray(indices, dtype=np.uint32).reshape(-1)
+    if len(indices) % 3:
+        raise ValueError('indices must describe triangles.')
+    if vertex_count is None:
+        vertex_count = int(indices.max()) + 1 if len(indices) else 0
+
+    # vertex -> triangles adjacency
+    live = np.bincount(indices, minlength=vertex_count)
+    offsets = np.concatenate(([0], np.cumsum(live))).tolist()
+    adjacency = (np.argsort(indices, kind='stable') // 3).tolist()
+    triangles = indices.reshape(-1, 3).tolist()
+    live = live.tolist()
+
+    cache_time = [0] * vertex_count
+    emitted = [False] * len(triangles)
+    output = []
+    dead_end = []
+    timestamp = cache_size + 1
+    cursor = 0
+    fanning = 0 if vertex_count else -1
+
+    while fanning >= 0:
+        candidates = []
+        for t in adjacency[offsets[fanning]:offsets[fanning+1]]:
+            if emitted[t]:
+                continue
+            emitted[t] = True
+            for v in triangles[t]:
+                output.append(v)
+                dead_end.append(v)
+                candidates.append(v)
+                live[v] -= 1
+                if timestamp - cache_time[v] > cache_size:
+                    cache_time[v] = timestamp
+                    timestamp += 1
+
+        # next fanning vertex: the candidate which stays 
+        # longest in the cache when all its triangles are emitted.
+        fanning, best = -1, -1
+        for v in candidates:
+            if live[v] > 0:
+                priority = 0
+                if timestamp - cache_time[v] + 2 * live[v] <= cache_size:
+                    priority = timestamp - cache_time[v]
+                if priority > best:
+                    fanning, best = v, priority
+
+        if fanning == -1:
+            while len(dead_end):
+                v = dead_end.pop()
+                if live[v] > 0:
+                    fanning = v
+                    break
+        while fanning == -1 and cursor < vertex_count:
+            if live[cursor] > 0:
+                fanning = cursor
+            cursor += 1
+
+    return np.array(output, dtype=np.uint32)
+
+def average_cache_miss_ratio(indices, cache_size=16):
+    """ average number of vertex shader invocations per triangle
+        for a FIFO post-transform cache of given size. """
+    cache = []
+    misses = 0
+    for v in np.asarray(indices).reshape(-1).tolist():
+        if not v in cache:
+            misses += 1
+            cache.append(v)
+            if len(cache) > cache_size:
+                cache.pop(0)
+    return 3 * misses / max(1, len(indices))
+
+def _indexed(mesh, indexed):
+    return weld_vertices(mesh) if indexed else mesh
+
+def _mesh_colors(color, n, *args):
+    """ evaluates the color of n vertices. color is either
+        a constant rgba color or a callable which is invoked
+        once with arrays of vertex parameters *args. 
+
+        the callable may return a single color, a (n, 4) array 
+        or a tuple of four component arrays. """
+    if callable(color):
+        color = color(*args)
+        if isinstance(color, (tuple, list)) and any(np.ndim(c) for c in color):
+            color = np.stack(np.broadcast_arrays(*color), axis=-1)
+    return np.broadcast_to(np.asarray(color, dtype=np.float32), (n, 4))
+
+def mesh3d_cylinder(r=1, h=1, prec=50, color=(.5, .5, .5, 1), indexed=False):
+    """ creates a cylinder mesh of radius r and height h. 
+        color might be a callable color(phi) which gets the 
+        azimuthal angle of all vertices as an array. """
+    phi_range = 2 * np.pi / prec * np.arange(prec+1)
     phi_range[-1] = 0
 
+    # ring points (i, i+1) at the top (y=0) and the bottom (y=-h)
+    x, z = r*np.cos(phi_range), r*np.sin(phi_range)
+    zeros = np.zeros(prec)
+    t0 = np.stack((x[:-1], zeros, z[:-1]), axis=-1)
+    t1 = np.stack((x[1:],  zeros, z[1:]),  axis=-1)
+    b0, b1 = t0 - (0, h, 0), t1 - (0, h, 0)
+    top_center = np.zeros((prec, 3))
+    bottom_center = top_center - (0, h, 0)
+
+    # per segment: top cap, bottom cap, two wall triangles
+    vertex = np.stack((t0, t1, top_center, 
+                       b0, b1, bottom_center, 
+                       t0, t1, b0, 
+                       b0, b1, t1), axis=1)
+
+    up, down = np.broadcast_to((0, 1, 0), (prec, 3)), np.broadcast_to((0, -1, 0), (prec, 3))
+    n0 = np.stack((x[:-1], zeros, z[:-1]), axis=-1)
+    n1 = np.stack((x[1:],  zeros, z[1:]),  axis=-1)
+    normal = np.stack((up, up, up, 
+                       down, down, down, 
+                       n0, n1, n0, 
+                       n0, n1, n1), axis=1)
+
+    # azimuthal angle index of each vertex within a segment
+    phi_offset = np.array([0, 1, 0, 0, 1, 0, 0, 1, 0, 0, 1, 1])
+    phi = phi_range[np.arange(prec)[:, None] + phi_offset].reshape(-1)
+
     mesh = np.zeros(prec*12, dtype=MESH_DTYPE)
+    mesh['vertex'] = vertex.reshape(-1, 3)
+    mesh['normal'] = normal.reshape(-1, 3)
+    mesh['color'] = _mesh_colors(color, len(mesh), phi)
+    return _indexed(mesh, indexed)
 
-    index = 0
-    for i in range(prec):
-        mesh['vertex'][index] = (r*np.cos(phi_range[i]), 0, r*np.sin(phi_range[i]))
-        mesh['color'][index] = color(phi)
-        mesh['normal'][index] = (0, 1, 0)
-        index += 1
-
-        mesh['vertex'][index] = (r*np.cos(phi_range[i+1]), 0, r*np.sin(phi_range[i+1]))
-        mesh['color'][index] = color(phi)
-        mesh['normal'][index] = (0, 1, 0)
-        index += 1
-
-        mesh['vertex'][index] = (0, 0, 0)
-        mesh['color'][index] = color(phi)
-        mesh['normal'][index] = (0, 1, 0)
-        index += 1
-
-        mesh['vertex'][index] = (r*np.cos(phi_range[i]), -h, r*np.sin(phi_range[i]))
-        mesh['color'][index] = color(phi)
-        mesh['normal'][index] = (0, -1, 0)
-        index += 1
-
-        mesh['vertex'][index] = (r*np.cos(phi_range[i+1]), -h, r*np.sin(phi_range[i+1]))
-        mesh['color'][index] = color(phi)
-        mesh['normal'][index] = (0, -1, 0)
-        index += 1
-
-        mesh['vertex'][index] = (0, -h, 0)
-        mesh['color'][index] = color(phi)
-        mesh['normal'][index] = (0, -1, 0)
-        index += 1
-
-        # walls
-        mesh['vertex'][index] = (r*np.cos(phi_range[i]), 0, r*np.sin(phi_range[i]))
-        mesh['color'][index] = color(phi)
-        mesh['normal'][index] = (r*np.cos(phi_range[i]), 0, r*np.sin(phi_range[i]))
-        index += 1
-
-        mesh['vertex'][index] = (r*np.cos(phi_range[i+1]), 0, r*np.sin(phi_range[i+1]))
-        mesh['color'][index] = color(phi)
-        mesh['normal'][index] = (r*np.cos(phi_range[i+1]), 0, r*np.sin(phi_range[i+1]))
-        index += 1
-
-        mesh['vertex'][index] = (r*np.cos(phi_range[i]), -h, r*np.sin(phi_range[i]))
-        mesh['color'][index] = color(phi)
-        mesh['normal'][index] = (r*np.cos(phi_range[i]), 0, r*np.sin(phi_range[i]))
-        index += 1
-
-        mesh['vertex'][index] = (r*np.cos(phi_range[i]), -h, r*np.sin(phi_range[i]))
-        mesh['color'][index] = color(phi)
-        mesh['normal'][index] = (r*np.cos(phi_range[i]), 0, r*np.sin(phi_range[i]))
-        index += 1
-
-        mesh['vertex'][index] = (r*np.cos(phi_range[i+1]), -h, r*np.sin(phi_range[i+1]))
-        mesh['color'][index] = color(phi)
-        mesh['normal'][index] = (r*np.cos(phi_range[i+1]), 0, r*np.sin(phi_range[i+1]))
-        index += 1
-
-        mesh['vertex'][index] = (r*np.cos(phi_range[i+1]), 0, r*np.sin(phi_range[i+1]))
-        mesh['color'][index] = color(phi)
-        mesh['normal'][index] = (r*np.cos(phi_range[i+1]), 0, r*np.sin(phi_range[i+1]))
-        index += 1
-
-
-    return mesh
-def mesh3d_sphere(prec=50, r=1, color=(.5, .5, .5, 1)):
+def mesh3d_sphere(prec=50, r=1, color=(.5, .5, .5, 1), indexed=False):
     """ creates a sphere mesh with a certain precision prec
-        and a radius r """
-    if not callable(color):
-        b = color
-        del color
-        color = lambda *a: b
-
-    theta_range = [np.pi / prec * theta for theta in range(prec+1)]
+        and a radius r. color might be a callable color(theta, phi)
+        which gets the polar and azimuthal angles of all vertices 
+        as arrays. """
+    theta_range = np.pi / prec * np.arange(prec+1)
     theta_range[-1] = np.pi
 
-    phi_range = [2 * np.pi / prec * phi for phi in range(prec+1)]
+    phi_range = 2 * np.pi / prec * np.arange(prec+1)
     phi_range[-1] = 0
 
-    mesh = np.zeros((prec-1) * prec * 6, dtype=MESH_DTYPE)
-    sphere_vec = lambda theta, phi: (r * np.sin(theta) * np.cos(phi), r * np.sin(theta) * np.sin(phi), r * np.cos(theta))
-    index = 0
-    for i in range(prec-1):
-        for j in range(prec):
-            v = sphere_vec(theta_range[i], phi_range[j])
-            mesh['vertex'][index] = v
-            mesh['color'][index] = color(theta_range[i], phi)
-            mesh['normal'][index] = v
-            index += 1
-
-            v = sphere_vec(theta_range[i+1], phi_range[j])
-            mesh['vertex'][index] = v
-            mesh['color'][index] = color(theta_range[i+1], phi)
-            mesh['normal'][index] = v
-            index += 1
-
-            v = sphere_vec(theta_range[i+1], phi_range[j+1])
-            mesh['vertex'][index] = v
-            mesh['color'][index] = color(theta_range[i+1], phi)
-            mesh['normal'][index] = v
-            index += 1
-
-            v = sphere_vec(theta_range[i+1], phi_range[j])
-            mesh['vertex'][index] = v
-            mesh['color'][index] = color(theta_range[i+1], phi)
-            mesh['normal'][index] = v
-            index += 1
-
-            v = sphere_vec(theta_range[i+1], phi_range[j+1])
-            mesh['vertex'][index] = v
-            mesh['color'][index] = color(theta_range[i+1], phi)
-            mesh['normal'][index] = v
-            index += 1
-
-            v = sphere_vec(theta_range[i+2], phi_range[j+1])
-            mesh['vertex'][index] = v
-            mesh['color'][index] = color(theta_range[i+2], phi)
-            mesh['normal'][index] = v
-            index += 1
-
-    return mesh
-
-def mesh3d_rectangle(a=1, b=1, color=(1, 1, 1, 1), center=(0, 0)):
-    if not callable(color):
-        _color = color
-        del color
-        color = lambda a: _color
-
+    # the sphere vertices are points of a (theta, phi) lattice. 
+    # the lattice is evaluated once and the triangles - two 
+    # for each (i, j) patch - are gathered by lattice index.
+    lattice = np.zeros((prec+1, prec+1), dtype=MESH_DTYPE)
+    sin_theta = r * np.sin(theta_range)[:, None]
+    lattice['vertex'][..., 0] = sin_theta * np.cos(phi_range)
+    lattice['vertex'][..., 1] = sin_theta * np.sin(phi_range)
+    lattice['vertex'][..., 2] = r * np.cos(theta_range)[:, None]
+    lattice['normal'] = lattice['vertex']
+    theta, phi = np.meshgrid(theta_range, phi_range, indexing='ij')
+    lattice['color'] = _mesh_colors(color, lattice.size, 
+        theta.reshape(-1), phi.reshape(-1)).reshape(lattice.shape + (4, ))
+
+    theta_index = np.arange(prec-1)[:, None, None] + np.array([0, 1, 1, 1, 1, 2])
+    phi_index = np.arange(prec)[None, :, None] + np.array([0, 0, 1, 0, 1, 1])
+    index = (theta_index * (prec+1) + phi_index).reshape(-1)
+
+    # the poles and the phi=0 seam contain duplicates
+    if indexed:
+        lattice, lattice_index = weld_vertices(lattice.reshape(-1))
+        return lattice, lattice_index[index]
+
+    # gathering raw records is much faster than gathering fields
+    records = lattice.reshape(-1).view(np.dtype((np.void, MESH_DTYPE.itemsize)))
+    return np.take(records, index).view(MESH_DTYPE)
+
+_RECTANGLE_VERTEX = np.array([(0, 0), (1, 0), (1, 1), (0, 1), (0, 0), (1, 1)], dtype=np.float32)
+_RECTANGLE_TEX    = np.array([(0, 1), (1, 1), (1, 0), (0, 0), (0, 1), (1, 0)], dtype=np.float32)
+
+def mesh3d_rectangle(a=1, b=1, color=(1, 1, 1, 1), center=(0, 0), indexed=False):
+    """ creates a rectangle mesh of size (a, b). color might 
+        be a callable color(i) which gets the vertex indices 
+        as an array. """
     mesh = np.zeros(6, dtype=MESH_DTYPE)
-
-    i = 0
-    mesh['vertex'][i] = (center[0], center[1], 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, 1)
-    mesh['tex'][i] = (0, 1)
-
-    i += 1
-    mesh['vertex'][i] = (center[0]+a, center[1], 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, 1)
-    mesh['tex'][i] = (1, 1)
-
-    i += 1
-    mesh['vertex'][i] = (center[0]+a, center[1]+b, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, 1)
-    mesh['tex'][i] = (1, 0)
-
-    i += 1
-    mesh['vertex'][i] = (center[0]+0, center[1]+b, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, 1)
-    mesh['tex'][i] = (0, 0)
-
-    i += 1
-    mesh['vertex'][i] = (center[0]+0, center[1], 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, 1)
-    mesh['tex'][i] = (0, 1)
-
-    i += 1
-    mesh['vertex'][i] = (center[0]+a, center[1]+b, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, 1)
-    
-    mesh['tex'][i] = (1, 0)
-    return mesh
-
-def mesh3d_cube(size, color=(1, 1, 1, 1), center=False):
-    a,b,c=size
-    if not callable(color):
-        erg = color
-        del color
-        color = lambda a: erg
+    mesh['vertex'][:, :2] = _RECTANGLE_VERTEX * (a, b) + center
+    mesh['normal'] = (0, 0, 1)
+    mesh['tex'] = _RECTANGLE_TEX
+    mesh['color'] = _mesh_colors(color, len(mesh), np.arange(len(mesh)))
+    return _indexed(mesh, indexed)
+
+# unit cube triangles and face normals
+_CUBE_VERTEX = np.array([
+    (0, 0, 0), (1, 1, 0), (1, 0, 0), (0, 0, 0), (0, 1, 0), (1, 1, 0),
+    (1, 0,-1), (1, 1,-1), (0, 0,-1), (1, 1,-1), (0, 1,-1), (0, 0,-1),
+    (0, 1, 0), (0, 1,-1), (1, 1,-1), (0, 1, 0), (1, 1,-1), (1, 1, 0),
+    (0, 0,-1), (0, 0, 0), (1, 0,-1), (0, 0, 0), (1, 0, 0), (1, 0,-1),
+    (1, 0,-1), (1, 0, 0), (1, 1,-1), (1, 0, 0), (1, 1, 0), (1, 1,-1),
+    (0, 0, 0), (0, 0,-1), (0, 1,-1), (0, 0, 0), (0, 1,-1), (0, 1, 0),
+], dtype=np.float32)
+_CUBE_NORMAL = np.repeat(np.array([
+    (0, 0, 1), (0, 0, -1), (0, 1, 0), (0, -1, 0), (1, 0, 0), (-1, 0, 0),
+], dtype=np.float32), 6, axis=0)
+
+def mesh3d_cube(size, color=(1, 1, 1, 1), center=False, indexed=False):
+    """ creates a cube mesh of size (a, b, c). color might 
+        be a callable color(i) which gets the vertex indices 
+        as an array. """
+    a, b, c = size
     mesh = np.zeros(12*3, dtype=MESH_DTYPE)
-    i = 0
-    mesh['vertex'][i] = (0, 0, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, 1)
-    i += 1
-    mesh['vertex'][i] = (a, b, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, 1)
-    i += 1
-    mesh['vertex'][i] = (a, 0, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, 1)
-    i += 1
-    mesh['vertex'][i] = (0, 0, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, 1)
-    i += 1
-    mesh['vertex'][i] = (0, b, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, 1)
-    i += 1
-    mesh['vertex'][i] = (a, b, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, 1)
-
-    i += 1
-    mesh['vertex'][i] = (a, 0, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, -1)
-    i += 1
-    mesh['vertex'][i] = (a, b, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, -1)
-    i += 1
-    mesh['vertex'][i] = (0, 0, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, -1)
-    i += 1
-    mesh['vertex'][i] = (a, b, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, -1)
-    i += 1
-    mesh['vertex'][i] = (0, b, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, -1)
-    i += 1
-    mesh['vertex'][i] = (0, 0, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 0, -1)
-
-    i += 1
-    mesh['vertex'][i] = (0, b, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 1, 0)
-    i += 1
-    mesh['vertex'][i] = (0, b, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 1, 0)
-    i += 1
-    mesh['vertex'][i] = (a, b, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 1, 0)
-    i += 1
-    mesh['vertex'][i] = (0, b, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 1, 0)
-    i += 1
-    mesh['vertex'][i] = (a, b, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 1, 0)
-    i += 1
-    mesh['vertex'][i] = (a, b, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, 1, 0)
-    i += 1
-
-
-    mesh['vertex'][i] = (0, 0, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, -1, 0)
-    i += 1
-    mesh['vertex'][i] = (0, 0, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, -1, 0)
-    i += 1
-    mesh['vertex'][i] = (a, 0, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, -1, 0)
-    i += 1
-    mesh['vertex'][i] = (0, 0, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, -1, 0)
-    i += 1
-    mesh['vertex'][i] = (a, 0, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, -1, 0)
-    i += 1
-    mesh['vertex'][i] = (a, 0, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (0, -1, 0)
-    i += 1
-
-
-
-    mesh['vertex'][i] = (a, 0, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (1, 0, 0)
-    i += 1
-    mesh['vertex'][i] = (a, 0, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (1, 0, 0)
-    i += 1
-    mesh['vertex'][i] = (a, b, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (1, 0, 0)
-    i += 1
-    mesh['vertex'][i] = (a, 0, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (1, 0, 0)
-    i += 1
-    mesh['vertex'][i] = (a, b, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (1, 0, 0)
-    i += 1
-    mesh['vertex'][i] = (a, b, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (1, 0, 0)
-    i += 1
-
-    mesh['vertex'][i] = (0, 0, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (-1, 0, 0)
-    i += 1
-    mesh['vertex'][i] = (0, 0, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (-1, 0, 0)
-    i += 1
-    mesh['vertex'][i] = (0, b, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (-1, 0, 0)
-    i += 1
-    mesh['vertex'][i] = (0, 0, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (-1, 0, 0)
-    i += 1
-    mesh['vertex'][i] = (0, b, -c)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (-1, 0, 0)
-    i += 1
-    mesh['vertex'][i] = (0, b, 0)
-    mesh['color'][i] = color(i)
-    mesh['normal'][i] = (-1, 0, 0)
-    i += 1
+    mesh['vertex'] = _CUBE_VERTEX * (a, b, c)
+    mesh['normal'] = _CUBE_NORMAL
+    mesh['color'] = _mesh_colors(color, len(mesh), np.arange(len(mesh)))
 
     if center:
-        for i, vertex in enumerate(mesh['vertex']):
-         #   mesh['vertex'][i][0] *= 0.5
-            mesh['vertex'][i][0] += -a * 0.5
-
-          #  mesh['vertex'][i][1] *= 0.5
-            mesh['vertex'][i][1] += -b * 0.5
-
-          #  mesh['vertex'][i][2] *= 0.5
-            mesh['vertex'][i][2] += c * 0.5
-    return mesh
\ No newline at end of file
+        mesh['vertex'] += (-a * 0.5, -b * 0.5, c * 0.5)
+    return _indexed(mesh, indexed)
@@ -0,0 +1,363 @@
+#-*- coding: utf-8 -*-
+"""
+gpu reductions over buffers and textures.
+
+min, max, sum, mean, bounds and histograms are computed by
+drawing one point per sample into a tiny float framebuffer
+with GL_MIN, GL_MAX or additive blending. the result is read
+back through a pixel pack buffer, a fence tells when it is
+available, so the series never has to be copied to the host.
+
+    reduction = default_reduction()
+    result = reduction.bounds(buffer)
+
+    # later, e.g. in the next frame
+    if result.ready():
+        lower, upper = result.get()
+
+XXX
+- sums are accumulated in float32, long series lose precision.
+- float64 buffers are converted to float32 by the vertex fetch.
+- integer buffers are not supported
+
+:author: keksnicoh
+"""
+
+from gpupy.gl import GPUPY_GL
+from gpupy.gl.shader import Shader, Program
+from gpupy.gl.buffer import BufferObject, vertex_attrib_pointer, vertex_attribute_glsl_type, vertex_attribute_format
+from gpupy.gl.texture import Texture2D
+from gpupy.gl.framebuffer import Framebuffer
+from gpupy.gl.glsl import dtype_is_struct
+from gpupy.gl.errors import GlError
+
+from OpenGL.GL import *
+import numpy as np
+from ctypes import c_void_p
+
+__all__ = ['Reduction', 'ReductionResult', 'default_reduction']
+
+# largest float32, used as neutral element of min
+FLOAT_MAX = float(np.finfo(np.float32).max)
+
+_DEFAULT_REDUCTION = None
+
+def default_reduction():
+    """ returns the shared reduction engine of the current context """
+    global _DEFAULT_REDUCTION
+    if _DEFAULT_REDUCTION is None:
+        _DEFAULT_REDUCTION = Reduction()
+    return _DEFAULT_REDUCTION
+
+class ReductionResult():
+    """
+    pending result of a reduction. the values are read from a
+    pixel pack buffer once the fence was signaled.
+    """
+    def __init__(self, pbo, fence, transformation):
+        self._pbo = pbo
+        self._fence = fence
+        self._transformation = transformation
+        self._value = None
+
+    def ready(self):
+        """ non blocking check whether the result is available """
+        if self._value is not None:
+            return True
+        status = glClientWaitSync(self._fence, 0, 0)
+        return status in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED)
+
+    def get(self, timeout=10**9):
+        """ returns the result. blocks up to **timeout**
+            nanoseconds if the gpu did not finish yet. """
+        if self._value is None:
+            status = glClientWaitSync(self._fence, GL_SYNC_FLUSH_COMMANDS_BIT, timeout)
+            if status == GL_TIMEOUT_EXPIRED:
+                raise GlError('reduction did not finish within {}ns'.format(timeout))
+            glDeleteSync(self._fence)
+            self._value = self._transformation(self._pbo.get())
+            self._pbo.delete()
+            self._pbo = None
+        return self._value
+
+class Reduction():
+    """
+    reduction engine. the programs are compiled on first use
+    for each source type.
+    """
+    OPERATIONS = ('min', 'max', 'sum', 'mean')
+
+    def __init__(self):
+        self._programs = {}
+        self._targets = {}
+        self._empty_vao = None
+
+    # -- api
+
+    def reduce(self, source, operation='min', field=None, offset=0, length=None):
+        """
+        reduces **source** (BufferObject or Texture2D) by **operation**.
+        the result is a float32 vector with the components of the
+        source. **field** selects a field of a structured buffer.
+        """
+        if not operation in self.OPERATIONS:
+            raise ValueError('unknown operation "{}". Available: {}'.format(operation, ', '.join(self.OPERATIONS)))
+
+        length = self._length(source, offset, length)
+        components = self._components(source, field)
+
+        equation = {'min': GL_MIN, 'max': GL_MAX}.get(operation, GL_FUNC_ADD)
+        clear = {'min': FLOAT_MAX, 'max': -FLOAT_MAX}.get(operation, 0)
+        target = self._begin(1, clear, equation)
+        self._draw(source, field, offset, length, texel=0, texels=1)
+
+        def _transform(data):
+            value = data[0, :components]
+            return value / length if operation == 'mean' else value
+        return self._end(target, _transform)
+
+    def bounds(self, source, field=None, offset=0, length=None, ranges=None):
+        """ returns (min, max) of **source** by a single readback. 
+            if **ranges** of (offset, length) are given, the bounds 
+            of all ranges are returned. """
+        if ranges is None:
+            ranges = [(offset, self._length(source, offset, length))]
+        elif not len(ranges):
+            raise ValueError('nothing to reduce')
+        components = self._components(source, field)
+
+        # max(x) = -min(-x)
+        target = self._begin(2, FLOAT_MAX, GL_MIN)
+        for offset, length in ranges:
+            self._draw(source, field, offset, length, texel=0, texels=2)
+            self._draw(source, field, offset, length, texel=1, texels=2, sign=-1)
+
+        return self._end(target, lambda data: (data[0, :components], -data[1, :components]))
+
+    def histogram(self, source, bins, range, component=0, field=None, offset=0, length=None):
+        """ counts the values of **component** within **range**
+            into **bins** equal sized bins """
+        length = self._length(source, offset, length)
+        lo, hi = range
+        if not hi > lo:
+            raise ValueError('invalid histogram range ({}, {})'.format(lo, hi))
+
+        target = self._begin(bins, 0, GL_FUNC_ADD)
+        self._draw(source, field, offset, length, texel=0, texels=bins,
+                   histogram=(component, lo, bins / (hi - lo)))
+        return self._end(target, lambda data: data[:, 0].astype(np.int64))
+
+    # -- source handling
+
+    def _length(self, source, offset, length):
+        if length is None:
+            if isinstance(source, Texture2D):
+                length = int(np.prod(source.size[0:2]))
+            else:
+                length = len(source)
+            length -= offset
+        if length <= 0:
+            raise ValueError('nothing to reduce')
+        return length
+
+    def _components(self, source, field):
+        if isinstance(source, Texture2D):
+            return 4
+        return vertex_attribute_format(self._attribute_dtype(source, field)).components
+
+    def _attribute_dtype(self, buffer, field):
+        dtype = buffer.dtype
+        if dtype_is_struct(dtype):
+            if field is None:
+                raise ValueError('field required for structured buffer of dtype {}'.format(dtype))
+            return dtype[field]
+        if field is not None:
+            raise ValueError('buffer is not structured')
+        if len(buffer.shape) > 1 and buffer.shape[1] > 1:
+            return np.dtype((dtype, buffer.shape[1]))
+        return dtype
+
+    def _program(self, source, field, histogram):
+        if isinstance(source, Texture2D):
+            key = ('texture', histogram)
+        else:
+            dtype = self._attribute_dtype(source, field)
+            fmt = vertex_attribute_format(dtype)
+            if fmt.integer or fmt.columns > 1:
+                raise GlError('cannot reduce {} attributes'.format(vertex_attribute_glsl_type(dtype)))
+            glsl_type = vertex_attribute_glsl_type(dtype)
+            if fmt.gl_type == GL_DOUBLE:
+                # double, dvecN -> float, vecN, see _draw()
+                glsl_type = 'float' if glsl_type == 'double' else glsl_type[1:]
+            key = (glsl_type, histogram)
+
+        if not key in self._programs:
+            glsl_type, histogram = key
+            if glsl_type == 'texture':
+                source, fetch = _GLSL_SOURCE_TEXTURE, _GLSL_FETCH_TEXTURE
+            else:
+                source, fetch = 'in {} value;'.format(glsl_type), ''
+            to_vec4 = {'float': 'vec4(value, 0, 0, 0)', 'vec2': 'vec4(value, 0, 0)',
+                       'vec3': 'vec4(value, 0)', 'vec4': 'value', 'texture': 'value'}[glsl_type]
+            output = _GLSL_OUTPUT_HISTOGRAM if histogram else _GLSL_OUTPUT_REDUCE
+
+            program = Program()
+            program.shaders.append(Shader(GL_VERTEX_SHADER, VERTEX_SHADER, {
+                'SOURCE': source, 'FETCH': fetch, 'TO_VEC4': to_vec4, 'OUTPUT': output}))
+            program.shaders.append(Shader(GL_FRAGMENT_SHADER, FRAGMENT_SHADER))
+            program.link()
+            self._programs[key] = program
+        return self._programs[key]
+
+    # -- rendering
+
+    def _begin(self, texels, clear, equation):
+        """ binds and clears the target framebuffer of **texels**
+            RGBA32F texels. the previous state is restored by _end() """
+        if not texels in self._targets:
+            texture = Texture2D.empty((texels, 1, 4), np.float32)
+            texture.interpolation_nearest()
+            framebuffer = Framebuffer()
+            framebuffer.color_attachment(texture)
+            self._targets[texels] = (framebuffer, texture)
+        framebuffer, texture = self._targets[texels]
+
+        self._state = (glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING),
+                       glGetIntegerv(GL_READ_FRAMEBUFFER_BINDING),
+                       glGetIntegerv(GL_VIEWPORT),
+                       glIsEnabled(GL_BLEND),
+                       [glGetIntegerv(p) for p in (GL_BLEND_EQUATION_RGB, GL_BLEND_EQUATION_ALPHA)],
+                       [glGetIntegerv(p) for p in (GL_BLEND_SRC_RGB, GL_BLEND_DST_RGB, 
+                                                   GL_BLEND_SRC_ALPHA, GL_BLEND_DST_ALPHA)])
+
+        framebuffer.use()
+        glViewport(0, 0, texels, 1)
+        glClearColor(clear, clear, clear, clear)
+        glClear(GL_COLOR_BUFFER_BIT)
+        glEnable(GL_BLEND)
+        glBlendEquation(equation)
+        glBlendFunc(GL_ONE, GL_ONE)
+        return self._targets[texels]
+
+    def _draw(self, source, field, offset, length, texel, texels, sign=1, histogram=None):
+        program = self._program(source, field, histogram is not None)
+        if histogram is None:
+            program.uniform('u_texel', ((texel + 0.5) / texels * 2 - 1))
+            program.uniform('u_sign', sign)
+        else:
+            component, lo, scale = histogram
+            program.uniform('u_component', component)
+            program.uniform('u_histogram', (lo, scale))
+            program.uniform('u_bins', texels)
+
+        if isinstance(source, Texture2D):
+            if self._empty_vao is None:
+                self._empty_vao = glGenVertexArrays(1)
+            vao = self._empty_vao
+            source.bind(unit=0)
+            program.uniform('u_source', 0)
+        else:
+            vao = glGenVertexArrays(1)
+            glBindVertexArray(vao)
+            source.bind()
+            dtype = self._attribute_dtype(source, field)
+            field_offset = source.dtype.fields[field][1] if field is not None else 0
+            stride = source.dtype.itemsize if field is not None else 0
+            location = program.attributes['value']
+            fmt = vertex_attribute_format(dtype)
+            if fmt.gl_type == GL_DOUBLE:
+                # glVertexAttribPointer converts to single precision
+                glVertexAttribPointer(location, fmt.components, GL_DOUBLE, GL_FALSE, stride, c_void_p(field_offset))
+                glEnableVertexAttribArray(location)
+            else:
+                vertex_attrib_pointer(location, dtype, stride, field_offset)
+            source.unbind()
+            glBindVertexArray(0)
+
+        program.use()
+        glBindVertexArray(vao)
+        glDrawArrays(GL_POINTS, offset, length)
+        glBindVertexArray(0)
+        program.unuse()
+
+        if vao is not self._empty_vao:
+            glDeleteVertexArrays(1, [vao])
+
+    def _end(self, target, transformation):
+        """ queues the readback into a pixel pack buffer and
+            restores the previous framebuffer state """
+        framebuffer, texture = target
+        texels = texture.size[0]
+
+        pbo = BufferObject.to_device(np.zeros((1, texels, 4), dtype=np.float32),
+                                     target=GL_PIXEL_PACK_BUFFER, usage=GL_STREAM_READ)
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, framebuffer.gl_framebuffer_id)
+        glReadBuffer(GL_COLOR_ATTACHMENT0)
+        pbo.bind()
+        glReadPixels(0, 0, texels, 1, GL_RGBA, GL_FLOAT, c_void_p(0))
+        pbo.unbind()
+        fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+
+        draw_fbo, read_fbo, viewport, blend, equation, func = self._state
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, draw_fbo)
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, read_fbo)
+        glViewport(*viewport)
+        glBlendEquationSeparate(*equation)
+        glBlendFuncSeparate(*func)
+        if not blend:
+            glDisable(GL_BLEND)
+
+        return ReductionResult(pbo, fence, lambda data: transformation(data.reshape((texels, 4))))
+
+_GLSL_SOURCE_TEXTURE = "uniform sampler2D u_source;"
+
+_GLSL_FETCH_TEXTURE = """
+    ivec2 size = textureSize(u_source, 0);
+    vec4 value = texelFetch(u_source, ivec2(gl_VertexID % size.x, gl_VertexID / size.x), 0);
+"""
+
+_GLSL_OUTPUT_REDUCE = """
+uniform float u_texel;
+uniform float u_sign;
+void write_value(vec4 v) {
+    v_value = u_sign * v;
+    gl_Position = vec4(u_texel, 0, 0, 1);
+}
+"""
+
+_GLSL_OUTPUT_HISTOGRAM = """
+uniform int  u_component;
+uniform vec2 u_histogram;
+uniform int  u_bins;
+void write_value(vec4 v) {
+    float bin = floor((v[u_component] - u_histogram.x) * u_histogram.y);
+    v_value = vec4(1, 0, 0, 0);
+    if (bin < 0 || bin >= u_bins) {
+        // outside of the viewport
+        gl_Position = vec4(2, 2, 0, 1);
+    } else {
+        gl_Position = vec4((bin + 0.5) / u_bins * 2 - 1, 0, 0, 1);
+    }
+}
+"""
+
+VERTEX_SHADER = """
+{% version %}
+${SOURCE}
+out vec4 v_value;
+${OUTPUT}
+void main() {
+    ${FETCH}
+    gl_PointSize = 1;
+    write_value(${TO_VEC4});
+}
+"""
+
+FRAGMENT_SHADER = """
+{% version %}
+in vec4 v_value;
+out vec4 frag_value;
+void main() {
+    frag_value = v_value;
+}
+"""
@@ -16,6 +16,14 @@ shader library
 programs find out which attributes and uniforms are present in
 given shaders.
 
+preprocessor defines can be attached to shaders. They are injected
+right after the #version directive when the shader gets compiled.
+ProgramVariants lazily links and caches one program per define set:
+
+    variants = ProgramVariants(lambda: create_program(vrt, frg, link=False))
+    points = variants.get({'POINT_MODE': True})
+    lines  = variants.get()
+
 XXX
 - interface blocks
 - register dtypes in some way?
@@ -46,6 +54,20 @@ STRING_SHADER_NAMES = {
     GL_COMPUTE_SHADER        : 'GL_COMPUTE_SHADER',
 }
 
+def uniform_equal(a, b):
+    """ whether two uniform values are equal. textures are equal
+        if they refer to the same gl texture. """
+    if a is b:
+        return True
+    if a is None or b is None:
+        return False
+    if hasattr(a, 'gl_texture_id') or hasattr(b, 'gl_texture_id'):
+        return getattr(a, 'gl_texture_id', a) == getattr(b, 'gl_texture_id', b)
+    try:
+        return np.array_equal(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+    except (TypeError, ValueError):
+        return False
+
 def create_program(vertex=None, fragment=None, link=True):
     program = Program()
     if vertex is not None:
@@ -58,6 +80,57 @@ def create_program(vertex=None, fragment=None, link=True):
 
     return program
 
+def render_defines(defines):
+    """ renders a dict of preprocessor defines into glsl
+        #define lines. True renders a flag define, None or 
+        False skips the define. """
+    lines = []
+    for name, value in sorted(defines.items()):
+        if value is None or value is False:
+            continue
+        if value is True:
+            lines.append('#define {}'.format(name))
+        else:
+            lines.append('#define {} {}'.format(name, value))
+    return lines
+
+def variant_key(defines=None):
+    """ hashable key of a define set. disabled defines
+        do not contribute to the key. """
+    if not defines:
+        return ()
+    return tuple((n, str(v)) for n, v in sorted(defines.items()) 
+                             if v is not None and v is not False)
+
+def active_source(source, defines=None):
+    """ removes the lines of #ifdef/#ifndef branches which are
+        inactive for **defines**. other conditionals (#if, #elif)
+        are kept as they are. """
+    defined = {name for name, _ in variant_key(defines)}
+    lines, stack = [], []
+    for line in source.split('\n'):
+        directive = line.strip().split()
+        keyword = directive[0] if directive else ''
+        if keyword in ('#ifdef', '#ifndef') and len(directive) > 1:
+            active = (directive[1] in defined) == (keyword == '#ifdef')
+            stack.append([True, active])
+            continue
+        elif keyword in ('#if', '#elif'):
+            if keyword == '#if':
+                stack.append([False, True])
+            elif stack:
+                stack[-1] = [False, True]
+        elif keyword == '#else' and stack and stack[-1][0]:
+            stack[-1][1] = not stack[-1][1]
+            continue
+        elif keyword == '#endif' and stack:
+            tracked, _ = stack.pop()
+            if tracked:
+                continue
+        if all(active for _, active in stack):
+            lines.append(line)
+    return '\n'.join(lines)
+
 class ShaderError(GlError):
     def __init__(self, shader, msg, *args, **kwargs):
         GlError.__init__(self, 'Shader({}): {}'.format(STRING_SHADER_NAMES[shader.type], msg), *args, **kwargs)
@@ -70,7 +143,7 @@ class Shader():
     """
     shader representation
     """
-    def __init__(self, type, source, substitutions={}):
+    def __init__(self, type, source, substitutions={}, defines=None):
         """
         initializes shader by given source.
         matches all attributes and uniforms
@@ -83,6 +156,9 @@ class Shader():
         }
         self.substitutions.update(substitutions)
 
+        # preprocessor defines, see Shader.define()
+        self.defines = dict(defines or {})
+
         self.source = source
         self.type = type
         self.gl_shader_type = self.type
@@ -103,6 +179,7 @@ class Shader():
         self.uniforms_declarations = {}
         self.uniform_dtype = {} # contains information about uniform block dtypes
         self.uniform_blocks = [] # a list of all uniform blocks within the shader
+        self.uniform_block_glsl_names = {} # glsl names of the declared uniform blocks
 
         # struct declaration
         self.structs_require_declraration = {}
@@ -204,6 +281,17 @@ class Shader():
         self.structs_declarations[name] = gl_code
         self.structs_dtype[name] = dtype
 
+    def define(self, name, value=True):
+        """ sets a preprocessor define. value None or False 
+            removes the define. defines must be set before
+            the shader gets compiled. """
+        if self.gl_shader_id is not None:
+            self._serr('cannot define "{}" since the shader is allready compiled.'.format(name))
+        if value is None or value is False:
+            self.defines.pop(name, None)
+        else:
+            self.defines[name] = value
+
     def declare_uniform(self, name, declr, layout='std140', variable=None, length=None):
         """ declares uniform interface block. if declr
             is numpy dtype it will be rendered to glsl
@@ -279,6 +367,7 @@ class Shader():
                         self._auto_declare_struct_ubo[struct_name] = name
 
             gl_code = render_uniform_block_from_dtype(name, declr, layout, length, self.structs_dtype, variable=variable)
+            self.uniform_block_glsl_names[name] = uniform_block_glsl_name(name, variable)
             dtype = declr
 
         # a gl_code declaration was given. It will be parsed to check
@@ -321,6 +410,45 @@ class Shader():
             glDeleteShader(self.gl_shader_id)
             self.gl_shader_id = None
 
+    def reload(self, source):
+        """
+        recompiles the shader from a new source. substitutions,
+        defines and declarations are carried over. if the new 
+        source does not compile a ShaderError is raised and the
+        shader keeps its previous state.
+
+        programs which include the shader must be relinked by
+        Program.relink() afterwards.
+        """
+        shader = Shader(self.type, source, self.substitutions, self.defines)
+
+        # structs and uniform blocks declared by declare_struct() and 
+        # declare_uniform(). Implicitly declared structs of uniform 
+        # blocks are injected by placeholders which need to be copied too.
+        for name, gl_code in self.structs_declarations.items():
+            if name in shader.structs or name in self._auto_declare_struct_ubo:
+                shader.structs_declarations[name] = gl_code
+                shader.structs_dtype[name] = self.structs_dtype[name]
+        for name, block_name in self._auto_declare_struct_ubo.items():
+            if block_name in shader.uniform_blocks:
+                placeholder = self.structs_require_declraration[name]
+                shader._inject_gl_code.append(placeholder)
+                shader.structs_require_declraration[name] = placeholder
+                shader.structs.append(name)
+                shader._auto_declare_struct_ubo[name] = block_name
+        for name, gl_code in self.uniforms_declarations.items():
+            if name in shader.uniform_blocks:
+                shader.uniforms_declarations[name] = gl_code
+                shader.uniform_dtype[name] = self.uniform_dtype[name]
+
+        shader.compile()
+
+        # linked programs do not keep their shader objects
+        # attached (see Program.link), the old one is freed.
+        self.delete()
+        self.__dict__.update(shader.__dict__)
+        return self.gl_shader_id
+
 
     def compile(self):
         """
@@ -339,6 +467,7 @@ class Shader():
             self._compile_inject_gl_code()
             self._compile_structs()
             self._compile_uniform_blocks()
+            self._compile_defines()
 
             glShaderSource(self.gl_shader_id, self._precompiled_source)
             glCompileShader(self.gl_shader_id)
@@ -410,6 +539,20 @@ class Shader():
         for name, code in self.substitutions.items():
             self._precompiled_source = self._precompiled_source.replace('/*{$%s$}*/'%name, str(code))
 
+    def _compile_defines(self):
+        # the #version directive must stay the first line
+        # so the defines are injected right after it.
+        if not len(self.defines):
+            return
+        source = self._precompiled_source.split('\n')
+        at = 0
+        for i, line in enumerate(source):
+            if line.strip().startswith('#version'):
+                at = i + 1
+                break
+        source[at:at] = render_defines(self.defines)
+        self._precompiled_source = '\n'.join(source)
+
     def _compile_inject_gl_code(self):
         source = self._precompiled_source.split('\n')
         for inject in reversed(self._inject_gl_code):
@@ -503,12 +646,13 @@ class Shader():
         - structured uniforms
         """
 
-        # find atomic uniforms
+        # find atomic uniforms, uniforms of inactive #ifdef 
+        # branches are not part of the shader variant.
         self.uniforms = {k: (t, d) for t, k, d in re.findall(
             # example: uniform float dorp = 2;
             #          uniform vec3 burb;
             r'uniform\s+(\w+)\s+([\w]+)\s*=?\s*(.*?)(?:\[\d+\])?;', 
-            self._precompiled_source, 
+            active_source(self._precompiled_source, self.defines), 
             flags=re.MULTILINE)}
 
     def _prepare_uniform_blocks(self):
@@ -596,6 +740,16 @@ class Program():
         self._uniform_values = {}
         self.uniform_block_index = {}
         self.uniform_dtype = None
+        self._uniform_block_bindings = {}
+
+        # incremented if a uniform value changes or the program
+        # was relinked. users of the program (e.g. cached plot 
+        # graphs) compare versions to detect changes.
+        self.version = 0
+
+        # invoked with the program after Program.relink() 
+        # succeeded. attribute locations might have changed.
+        self.on_relink = Event()
 
         self.uniforms = setter_dict(self.uniform)
         self.uniform_blocks = setter_dict(self.uniform_block_binding)
@@ -656,21 +810,35 @@ class Program():
         for shader in self.shaders:
             self.uniform_dtype.update(shader.uniform_dtype)
 
-        for shader in self.shaders:
-            # implicit type declarations
-            if len(shader.uniforms_require_declraration):
-                for name in shader.uniforms_require_declraration:
-                    if not name in shader.uniforms_declarations and name in self.uniform_dtype:
-                        shader.declare_uniform(name, self.uniform_dtype[name])
-
-            shader.compile()
-            glAttachShader(self.gl_shader_id, shader.gl_shader_id)
-        glLinkProgram(self.gl_shader_id)
-
-        error_log = glGetProgramInfoLog(self.gl_shader_id)
-        if error_log:
+        attached = []
+        try:
+            for shader in self.shaders:
+                # implicit type declarations
+                if len(shader.uniforms_require_declraration):
+                    for name in shader.uniforms_require_declraration:
+                        if not name in shader.uniforms_declarations and name in self.uniform_dtype:
+                            shader.declare_uniform(name, self.uniform_dtype[name])
+
+                shader.compile()
+                glAttachShader(self.gl_shader_id, shader.gl_shader_id)
+                attached.append(shader.gl_shader_id)
+            glLinkProgram(self.gl_shader_id)
+
+            error_log = glGetProgramInfoLog(self.gl_shader_id)
+            if glGetProgramiv(self.gl_shader_id, GL_LINK_STATUS) != GL_TRUE:
+                raise ProgramError(error_log)
+            if error_log:
+                GPUPY_GL.warn('program link log: {}'.format(error_log))
+        except GlError:
             self.delete()
-            raise ProgramError(error_log)
+            raise
+        finally:
+            # the linked program does not require the shader objects,
+            # detached shaders are freed when they are deleted (e.g.
+            # replaced by Shader.reload()).
+            for gl_shader_id in attached:
+                if self.gl_shader_id is not None:
+                    glDetachShader(self.gl_shader_id, gl_shader_id)
 
         self._configure_attributes()
         self._configure_uniforms()
@@ -679,6 +847,49 @@ class Program():
 
         return self.gl_shader_id
 
+    def relink(self):
+        """
+        relinks the program e.g. after a shader was reloaded. 
+        
+        the old gl program stays alive until the new one was 
+        linked successfully. if compiling or linking fails, the
+        error is raised and the old program is still used. if 
+        there is no old program, the program stays unlinked 
+        (gl_shader_id is None). Uniform values and uniform block
+        bindings are carried over.
+        """
+        if self.gl_shader_id is not None and self.gl_shader_id == Program.__LAST_USE_GL_ID:
+            raise ProgramError('cannot relink program {} while it is in use'.format(self.gl_shader_id))
+
+        old_gl_id = self.gl_shader_id
+        old_state = (self.uniform_block_index, self.uniform_dtype)
+        uniform_values = {k: v for k, v in self._uniform_values.items() if v is not None}
+        uniform_values.update(self._uniform_changes)
+
+        self.uniform_block_index = {}
+        try:
+            self.link()
+        except GlError as e:
+            self.gl_shader_id = old_gl_id
+            self.uniform_block_index, self.uniform_dtype = old_state
+            if old_gl_id is None:
+                GPUPY_GL.warn('program is not linked and cannot be used: {}'.format(e))
+            raise
+
+        # queue previous uniform values, they are 
+        # flushed on next Program.use()
+        self._uniform_changes = {k: v for k, v in uniform_values.items() if k in self._uniforms}
+        for name, index in self._uniform_block_bindings.items():
+            if name in self.uniform_block_index:
+                glUniformBlockBinding(self.gl_shader_id, self.uniform_block_index[name], index)
+
+        if old_gl_id is not None:
+            glDeleteProgram(old_gl_id)
+
+        self.version += 1
+        self.on_relink(self)
+        return self.gl_shader_id
+
     def _check_uniform_blocks(self):
         for name, dtype in self.uniform_dtype.items():
             byte_count = 0
@@ -719,6 +930,8 @@ class Program():
 
         if not name in self._uniforms:
             raise ProgramError('unkown uniform "{}". Available: {}'.format(name, ', '.join(list(self._uniforms.keys()))))
+        if not uniform_equal(self._uniform_changes.get(name, self._uniform_values.get(name)), value):
+            self.version += 1
         if flush or self.gl_shader_id == Program.__LAST_USE_GL_ID:
             self._uniform(name, value)
         else:
@@ -872,7 +1085,8 @@ class Program():
 
             # uniform block
             for block_name in shader.uniform_blocks:
-                block_index = glGetUniformBlockIndex(self.gl_shader_id, block_name)
+                glsl_name = shader.uniform_block_glsl_names.get(block_name, block_name)
+                block_index = glGetUniformBlockIndex(self.gl_shader_id, glsl_name)
                 if block_index == GL_INVALID_INDEX:
                     GPUPY_GL.warn(('could not receive uniform_block location "{}". '
                                       'Maybe it was never used within main() function?').format(block_name))
@@ -893,5 +1107,63 @@ class Program():
 
        # if shape is not None:
        #     dd()
+        self._uniform_block_bindings[name] = index
         glUniformBlockBinding(self.gl_shader_id, self.uniform_block_index[name], index)
 
+
+
+class ProgramVariants():
+    """
+    lazy cache of linked programs, one for each set of 
+    preprocessor defines. 
+
+    the factory creates a new unlinked Program. The defines
+    are attached to all shaders before the program gets linked. 
+    on_link(program) is invoked once after linking, e.g. to 
+    bind uniform blocks.
+
+        variants = ProgramVariants(factory, on_link=bind_blocks)
+        program = variants.get({'POINT_MODE': True})
+
+    switching between known variants is a dictionary lookup.
+    """
+    def __init__(self, factory, on_link=None):
+        self.factory = factory
+        self.on_link = on_link
+        self._programs = {}
+
+    def get(self, defines=None):
+        """ returns the linked program for given defines """
+        key = variant_key(defines)
+        if key not in self._programs:
+            self._programs[key] = self._create(defines or {})
+        return self._programs[key]
+
+    __getitem__ = get
+
+    def __contains__(self, defines):
+        return variant_key(defines) in self._programs
+
+    def __len__(self):
+        return len(self._programs)
+
+    def __iter__(self):
+        return iter(self._programs.values())
+
+    def delete(self):
+        """ deletes all linked variants """
+        for program in self._programs.values():
+            program.delete()
+        self._programs = {}
+
+    def _create(self, defines):
+        program = self.factory()
+        if program.gl_shader_id is not None:
+            raise ProgramError('variant factory must return an unlinked program.')
+        for shader in program.shaders:
+            for name, value in defines.items():
+                shader.define(name, value)
+        program.link()
+        if self.on_link is not None:
+            self.on_link(program)
+        return program
@@ -0,0 +1,56 @@
+#-*- coding: utf-8 -*-
+"""
+helpers for tests which render into a headless context (see
+gpupy.gl.headless). PyOpenGL binds its platform on the first
+import, so the tests must run with an egl or osmesa platform,
+see runtests.sh:
+
+    PYOPENGL_PLATFORM=egl python3 -m unittest discover -s gpupy/gl/test -t .
+
+tests which require a context are skipped if no headless
+context can be created.
+
+:author: keksnicoh
+"""
+
+import unittest
+
+__all__ = ['headless_context', 'HeadlessTestCase']
+
+# all tests share one context, gl objects of previous
+# tests stay valid.
+_context = None
+_context_error = None
+
+def headless_context(size=(200, 100)):
+    """ returns the shared headless context resized to **size**.
+        raises unittest.SkipTest if no context is available. """
+    global _context, _context_error
+    if _context is None and _context_error is None:
+        try:
+            from gpupy.gl.headless import HeadlessContext
+            _context = HeadlessContext(size=size)
+        except Exception as e:
+            _context_error = e
+    if _context_error is not None:
+        raise unittest.SkipTest('no headless context: {}'.format(_context_error))
+
+    _context.make_context()
+    if tuple(_context.size.values) != tuple(size):
+        _context.size = size
+    return _context
+
+class HeadlessTestCase(unittest.TestCase):
+    """ test case rendering into a headless context of **size** """
+    size = (200, 100)
+
+    def setUp(self):
+        self.context = headless_context(self.size)
+
+    def render(self, widget, frames=1):
+        """ runs **frames** cycles of the context with **widget**
+            and returns the pixels of the last frame """
+        self.context.widget = widget
+        for i in range(frames):
+            self.context()
+        return self.context.read_pixels()
@@ -0,0 +1,71 @@
+#-*- coding: utf-8 -*-
+"""
+tests of gpupy.gl.export.
+
+:author: keksnicoh
+"""
+
+from gpupy.gl.test import HeadlessTestCase
+from gpupy.gl.export import Exporter
+
+from OpenGL.GL import *
+from concurrent.futures import ProcessPoolExecutor
+from tempfile import TemporaryDirectory
+import numpy as np
+import unittest
+import os
+
+class ExporterTest(HeadlessTestCase):
+
+    # rows of 5 pixels, the frames are not symmetric
+    SIZE = (5, 3)
+
+    def setUp(self):
+        super().setUp()
+        self.colors = [(1, 0, 0, 1), (0, 1, 0, 1), (0, 0, 1, 1), (1, 1, 0, 1)]
+        self.color = None
+
+    def render(self):
+        glClearColor(*self.color)
+        glClear(GL_COLOR_BUFFER_BIT)
+
+        # mark the top left pixel
+        glEnable(GL_SCISSOR_TEST)
+        glScissor(0, self.SIZE[1] - 1, 1, 1)
+        glClearColor(1, 1, 1, 1)
+        glClear(GL_COLOR_BUFFER_BIT)
+        glDisable(GL_SCISSOR_TEST)
+
+    def expected(self, color):
+        image = np.tile(np.uint8(np.multiply(color, 255)), (self.SIZE[1], self.SIZE[0], 1))
+        image[0, 0] = 255
+        return image
+
+    def set_color(self, color):
+        self.color = color
+
+    def test_npy(self):
+        with TemporaryDirectory() as folder, ProcessPoolExecutor(max_workers=2) as executor:
+            exporter = Exporter(self.SIZE, self.render, ring_size=2, executor=executor, max_pending=1)
+            glPixelStorei(GL_PACK_ALIGNMENT, 4)
+            exporter.export_frames(self.colors, self.set_color, os.path.join(folder, '{}.npy'))
+            self.assertLessEqual(len(exporter.futures), 1)
+            self.assertEqual(glGetIntegerv(GL_PACK_ALIGNMENT), 4)
+
+            paths = exporter.close()
+            self.assertEqual(paths, [os.path.join(folder, '{}.npy'.format(i)) for i in range(len(self.colors))])
+            for path, color in zip(paths, self.colors):
+                np.testing.assert_array_equal(np.load(path), self.expected(color))
+
+        self.assertIsNone(exporter._framebuffer.gl_framebuffer_id)
+        self.assertIsNone(exporter._color.gl_texture_id)
+
+    def test_unknown_format(self):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            exporter = Exporter(self.SIZE, self.render, executor=executor)
+            with self.assertRaises(ValueError):
+                exporter.export('frame.bmp')
+            exporter.close()
+
+if __name__ == '__main__':
+    unittest.main()
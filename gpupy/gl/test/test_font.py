@@ -0,0 +1,343 @@
+#-*- coding: utf-8 -*-
+"""
+tests of gpupy.gl.font.renderer.
+
+:author: keksnicoh
+"""
+
+from gpupy.gl.font import renderer
+from gpupy.gl.font.renderer import FNTFile, FontAtlas, FontRenderer, FontException, TextObject, GlyphRunCache, FONT_FOLDER, layout_glyph_run
+from gpupy.gl.font.numeric import NumericLabels, NOTATION_EXPONENT
+from gpupy.gl.components.camera import Camera2D
+from gpupy.gl.test import HeadlessTestCase
+from gpupy.gl import GPUPY_GL
+
+from types import SimpleNamespace
+from unittest import mock
+from OpenGL.GL import *
+import numpy as np
+import unittest
+import tempfile
+import weakref
+import gc
+import os
+
+ARIAL = os.path.join(FONT_FOLDER, 'arial.fnt')
+
+def per_character_layout(font, chars, size, position, rotation):
+    """ the layout of the per character loop which was replaced
+        by layout_glyph_run(). returns the glyph ids and positions. """
+    glyph_ids, positions = [], []
+    x, y = position
+    for char in chars:
+        if not char in font.char_glyph:
+            continue
+        glyph = font.glyphs[font.char_glyph[char]]
+        glyph_ids.append(font.char_glyph[char])
+        positions.append((x, y))
+        x += float(size)/60*float(glyph.xadvance-16)
+
+    transformation = np.array([
+        (np.cos(rotation), np.sin(rotation)),
+        (-np.sin(rotation), np.cos(rotation))
+    ], dtype=np.float32)
+    coords = np.array(positions, dtype=np.float32).reshape(-1, 2) - position
+    return np.array(glyph_ids), np.array([transformation.dot(a) for a in coords]).reshape(-1, 2) + position
+
+def text_object(font, chars, size=12, position=(0, 0), rotation=0):
+    """ text object with a renderer which has no gl resources """
+    renderer = SimpleNamespace(font=font,
+                               glyph_run_cache=GlyphRunCache(),
+                               font_atlas=SimpleNamespace(require=lambda glyph_ids: None))
+    return TextObject(renderer, chars, size, position, rotation=rotation)
+
+class LayoutTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.font = FNTFile.load_from_file(ARIAL)
+
+    def test_per_character_layout(self):
+        for chars, size, position, rotation in (
+            ('Hello World', 12, (0, 0), 0),
+            ('x = 0.25e-3', 31, (10, -4), np.pi/3),
+            ('a', 60, (5, 5), np.pi),
+            ('', 12, (0, 0), 0)):
+            with self.subTest(chars=chars, rotation=rotation):
+                textobj = text_object(self.font, chars, size, position, rotation)
+                chardata = textobj.get_data()
+
+                glyph_ids, positions = per_character_layout(self.font, chars, size, position, rotation)
+                np.testing.assert_array_equal(chardata['glyph_id'], glyph_ids)
+                np.testing.assert_allclose(chardata['position'], positions, rtol=1e-5, atol=1e-3)
+                np.testing.assert_array_equal(chardata['size'], size)
+
+    def test_unknown_characters(self):
+        glyph_ids, advance = layout_glyph_run(self.font, u'a☃b', 60)
+        np.testing.assert_array_equal(glyph_ids, [self.font.char_glyph['a'], self.font.char_glyph['b']])
+        self.assertEqual(advance[1], self.font.glyphs[self.font.char_glyph['a']].xadvance - 16)
+
+class GlyphRunCacheTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.font = FNTFile.load_from_file(ARIAL)
+
+    def test_lru(self):
+        cache = GlyphRunCache(maxsize=2)
+        a = cache.get(self.font, 'a', 12)
+        cache.get(self.font, 'b', 12)
+        self.assertIs(cache.get(self.font, 'a', 12), a)
+        self.assertEqual(cache.info(), (1, 2, 0, 2, 2))
+
+        # 'b' is the least recently used run
+        cache.get(self.font, 'c', 12)
+        self.assertEqual(cache.info(), (1, 3, 1, 2, 2))
+        self.assertIs(cache.get(self.font, 'a', 12), a)
+        cache.get(self.font, 'b', 12)
+        self.assertEqual(cache.info(), (2, 4, 2, 2, 2))
+
+        # the size is part of the key
+        self.assertIsNot(cache.get(self.font, 'b', 13), cache.get(self.font, 'b', 12))
+
+        cache.clear()
+        self.assertEqual(cache.info(), (0, 0, 0, 2, 0))
+
+    def test_runs_are_read_only(self):
+        glyph_ids, advance = GlyphRunCache().get(self.font, 'abc', 12)
+        with self.assertRaises(ValueError):
+            advance[0] = 1
+
+    def test_weak_font_reference(self):
+        cache = GlyphRunCache()
+        font = FNTFile.load_from_file(ARIAL)
+        cache.get(font, 'abc', 12)
+        cache.get(self.font, 'abc', 12)
+        self.assertEqual(len(cache), 2)
+
+        ref = weakref.ref(font)
+        del font
+        gc.collect()
+        self.assertIsNone(ref())
+        self.assertEqual(len(cache), 1)
+
+class FontCacheTest(unittest.TestCase):
+
+    def test_user_cache_folder(self):
+        font_path = ARIAL
+        with tempfile.TemporaryDirectory() as folder, \
+             mock.patch.object(renderer, 'FONT_CACHE_FOLDER', folder):
+            fnt = FNTFile.load(font_path)
+            self.assertEqual(os.path.dirname(fnt.cache_path), folder)
+            self.assertFalse(os.path.exists(font_path + '.npz'))
+
+            cached = FNTFile.load(font_path)
+            self.assertEqual(cached.cache_path, fnt.cache_path)
+            np.testing.assert_array_equal(cached.glyph_table, fnt.glyph_table)
+            np.testing.assert_array_equal(cached.page(0), FNTFile.load_from_file(font_path).page(0))
+
+class FontTestCase(HeadlessTestCase):
+    """ compiled font caches are written to a temporary folder """
+
+    def setUp(self):
+        super().setUp()
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        patcher = mock.patch.object(renderer, 'FONT_CACHE_FOLDER', folder.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_renderer(self, **kwargs):
+        font_renderer = FontRenderer(**kwargs)
+        font_renderer.init()
+        return font_renderer
+
+class AtlasTest(FontTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.font = FNTFile.load_from_file(ARIAL)
+        self.buffer_base = GPUPY_GL.CONTEXT.buffer_base('gpupy.gl.test.font_atlas')
+
+    def glyphs(self, chars):
+        return [self.font.char_glyph[c] for c in chars]
+
+    def assert_layers(self, atlas):
+        """ the texture layers hold the pages and the glyph buffer
+            refers to the layers of the resident glyphs """
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        with atlas.texture:
+            data = glGetTexImage(atlas.texture.gl_target, 0, GL_RED, GL_UNSIGNED_BYTE)
+        glPixelStorei(GL_PACK_ALIGNMENT, 4)
+        layers = np.frombuffer(data, dtype=np.uint8).reshape(atlas.texture.size[0], *self.font.page_shape)
+        for layer, page in enumerate(atlas.layers):
+            np.testing.assert_array_equal(layers[layer], self.font.page(page))
+
+        resident = atlas._glyph_resident
+        pages = self.font.glyph_table['page'][resident]
+        np.testing.assert_array_equal(atlas.glyph_buffer.get()['glyph']['page'][resident], 
+                                      [atlas.layers.index(p) for p in pages])
+
+    def test_lazy_pages(self):
+        atlas = FontAtlas(self.font, self.buffer_base, lazy=True)
+        self.assertEqual(atlas.layers, [])
+        self.assertEqual(atlas.texture.size[0], 1)
+        self.assertEqual(len(self.font._pages), 0)
+
+        # '.' is on the second page, it is the first resident layer
+        atlas.require(self.glyphs('.'))
+        self.assertEqual(atlas.layers, [1])
+        self.assertEqual(set(self.font._pages), {1})
+        self.assert_layers(atlas)
+
+        # pages are not uploaded twice
+        atlas.require(self.glyphs('.,'))
+        self.assertEqual(atlas.layers, [1])
+
+        # the texture grows and keeps the resident layers
+        atlas.require(self.glyphs('A.'))
+        self.assertEqual(atlas.layers, [1, 0])
+        self.assertEqual(atlas.texture.size[0], 2)
+        self.assertTrue(np.all(atlas._glyph_resident))
+        self.assert_layers(atlas)
+
+    def test_eager_pages(self):
+        atlas = FontAtlas(self.font, self.buffer_base, lazy=False)
+        self.assertEqual(atlas.layers, [0, 1])
+        self.assert_layers(atlas)
+
+    def test_text_requires_pages(self):
+        font_renderer = self.create_renderer(font=ARIAL)
+        font_renderer.create_text('AB').get_data()
+        self.assertEqual(font_renderer.font_atlas.layers, [0])
+
+class BatchTest(FontTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.renderer = self.create_renderer(batched=True)
+
+    def assert_slot(self, textobj):
+        """ the slot of **textobj** within the gpu buffer holds its 
+            characters, the remaining records have size 0 """
+        offset, capacity = self.renderer._slots[textobj]
+        self.assertGreaterEqual(capacity, len(textobj))
+        slot = self.renderer._batch_buffer.get()[offset:offset+capacity]
+        np.testing.assert_array_equal(slot[:len(textobj)], textobj.get_data(update_buffer_object=False))
+        np.testing.assert_array_equal(slot['size'][len(textobj):], 0)
+
+    def test_flush_batch(self):
+        a = self.renderer.create_text('abc', size=12)
+        b = self.renderer.create_text('hello', size=20, position=(0, 30))
+        self.renderer._flush_batch()
+        self.assert_slot(a)
+        self.assert_slot(b)
+
+        # fits into the slot, no repack
+        slots = dict(self.renderer._slots)
+        a.chars = 'xy'
+        self.renderer._flush_batch()
+        self.assertEqual(self.renderer._slots, slots)
+        self.assert_slot(a)
+        self.assert_slot(b)
+
+        # new text objects are appended behind the last slot
+        c = self.renderer.create_text('0', size=12)
+        self.renderer._flush_batch()
+        self.assertGreaterEqual(self.renderer._slots[c][0], sum(slots[t][1] for t in (a, b)))
+        for textobj in (a, b, c):
+            self.assert_slot(textobj)
+
+    def test_repack(self):
+        a = self.renderer.create_text('abc', size=12)
+        b = self.renderer.create_text('def', size=12)
+        self.renderer._flush_batch()
+
+        # a does not fit into its slot anymore
+        a.chars = 'a much longer text'
+        self.renderer._flush_batch()
+        offset_a, capacity_a = self.renderer._slots[a]
+        offset_b, capacity_b = self.renderer._slots[b]
+        self.assertGreaterEqual(capacity_a, len(a))
+        self.assertTrue(offset_a + capacity_a <= offset_b or offset_b + capacity_b <= offset_a)
+        self.assertEqual(self.renderer._batch_length, capacity_a + capacity_b)
+        self.assert_slot(a)
+        self.assert_slot(b)
+
+    def test_remove_text(self):
+        a = self.renderer.create_text('abc', size=12)
+        b = self.renderer.create_text('def', size=12)
+        self.renderer._flush_batch()
+
+        offset, capacity = self.renderer._slots[a]
+        self.renderer.remove_text(a)
+        self.assertNotIn(a, self.renderer._slots)
+        self.assertNotIn(a, self.renderer.texts)
+        np.testing.assert_array_equal(self.renderer._batch_buffer.get()['size'][offset:offset+capacity], 0)
+        self.assert_slot(b)
+
+        # the free slot is reused by the next repack
+        self.renderer._repack()
+        self.assertEqual(self.renderer._batch_length, self.renderer._slots[b][1])
+        self.assert_slot(b)
+
+    def test_render_foreign_text(self):
+        textobj = self.create_renderer().create_text('abc')
+        with self.assertRaises(FontException):
+            self.renderer.render_text(textobj)
+
+class NumericLabelsTest(FontTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.camera = Camera2D(self.size)
+        self.renderer = self.create_renderer()
+        self.labels = NumericLabels(self.renderer)
+        self.labels.init()
+
+    def render_with(self, draw):
+        def widget():
+            glClearColor(1, 1, 1, 1)
+            glClear(GL_COLOR_BUFFER_BIT)
+            self.camera.enable()
+            draw()
+            return True
+        return self.render(widget)
+
+    def test_digit_expansion(self):
+        position, size = (-90, -10), 30
+        label = self.labels.add(0, position=position, size=size)
+        for value, precision, notation, text in (
+            (3.14159, 2, 0, '3.14'),
+            (-42, 0, 0, '-42'),
+            (0.05, 3, 0, '0.050'),
+            (12345.678, 2, NOTATION_EXPONENT, '1.23e+04'),
+            (-0.000123, 1, NOTATION_EXPONENT, '-1.2e-04')):
+            with self.subTest(text=text):
+                self.labels._data['decimals'][label] = precision
+                self.labels._data['notation'][label] = notation
+                self.labels._has_changes = True
+                self.labels.set_value(label, value)
+                numeric = self.render_with(self.labels.render)
+
+                textobj = self.renderer.create_text(text, size=size, position=position)
+                expected = self.render_with(lambda: self.renderer.render_text(textobj))
+                self.renderer.remove_text(textobj)
+
+                self.assertGreater(np.count_nonzero(expected[:, :, 0] < 128), 0)
+                difference = np.abs(numeric.astype(np.int32) - expected)
+                self.assertLessEqual(np.count_nonzero(difference > 8), 0.001 * difference.size)
+
+    def test_max_glyphs(self):
+        with self.assertRaises(ValueError):
+            self.labels.add(123456789.0, precision=8)
+        label = self.labels.add(123456789.0, precision=8, notation=NOTATION_EXPONENT)
+        label = self.labels.add(1, precision=6)
+        with self.assertRaises(ValueError):
+            self.labels.set_value(label, 1e9)
+        with self.assertRaises(ValueError):
+            self.labels.set_values([1, 1e9])
+        self.assertEqual(self.labels.values[label], 1)
+
+if __name__ == '__main__':
+    unittest.main()
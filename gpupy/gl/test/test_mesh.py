@@ -0,0 +1,199 @@
+#-*- coding: utf-8 -*-
+"""
+tests of gpupy.gl.mesh.
+
+:author: keksnicoh
+"""
+
+from gpupy.gl.test import HeadlessTestCase
+from gpupy.gl import create_program, BufferObject
+from gpupy.gl.errors import GlError
+from gpupy.gl.mesh import *
+
+from OpenGL.GL import *
+import numpy as np
+import unittest
+
+def triangles(indices):
+    """ set of triangles where each triangle is rotated 
+        to start with its smallest index """
+    result = set()
+    for t in np.asarray(indices).reshape(-1, 3).tolist():
+        i = t.index(min(t))
+        result.add(tuple(t[i:] + t[:i]))
+    return result
+
+class MeshBuilderTest(unittest.TestCase):
+
+    def test_indexed(self):
+        builders = (lambda **kw: mesh3d_cube((1, 2, 3), **kw), 
+                    lambda **kw: mesh3d_sphere(8, **kw), 
+                    lambda **kw: mesh3d_cylinder(prec=8, **kw), 
+                    mesh3d_rectangle)
+        for builder in builders:
+            soup = builder()
+            vertices, indices = builder(indexed=True)
+            self.assertLess(len(vertices), len(soup))
+            for field in MESH_DTYPE.names:
+                np.testing.assert_array_equal(vertices[indices][field], soup[field])
+
+    def test_color_callable(self):
+        cube = mesh3d_cube((1, 1, 1), color=lambda i: (i / 36, 0, 0, 1))
+        np.testing.assert_allclose(cube['color'][:, 0], np.arange(36) / 36)
+
+        sphere = mesh3d_sphere(4, color=lambda theta, phi: (theta, phi, 0, 1))
+        self.assertLessEqual(np.max(sphere['color'][:, 0]), np.float32(np.pi))
+
+    def test_cube_center(self):
+        vertex = mesh3d_cube((2, 4, 6), center=True)['vertex']
+        np.testing.assert_array_equal(vertex.min(axis=0), -vertex.max(axis=0))
+
+    def test_weld_vertices(self):
+        soup = mesh3d_rectangle()
+        vertices, indices = weld_vertices(soup)
+        self.assertEqual(len(vertices), 4)
+        np.testing.assert_array_equal(indices, [0, 1, 2, 3, 0, 2])
+
+    def test_optimize_vertex_cache(self):
+        vertices, indices = mesh3d_sphere(20, indexed=True)
+        np.random.RandomState(0).shuffle(indices.reshape(-1, 3))
+        optimized = optimize_vertex_cache(indices, len(vertices))
+        self.assertEqual(triangles(optimized), triangles(indices))
+        self.assertLess(average_cache_miss_ratio(optimized), average_cache_miss_ratio(indices))
+
+        with self.assertRaises(ValueError):
+            optimize_vertex_cache(indices[:-1])
+
+class MeshRenderTest(HeadlessTestCase):
+    size = (8, 8)
+
+    VERTEX_SHADER = """
+        {% version %}
+        in vec4 vertex;
+        in vec4 color;
+        in vec2 offset;
+        out vec4 v_color;
+        void main() {
+            v_color = color;
+            gl_Position = vec4(vertex.xy + offset, 0, 1);
+        }
+    """
+
+    FRAGMENT_SHADER = """
+        {% version %}
+        in vec4 v_color;
+        out vec4 frag_color;
+        void main() {
+            frag_color = v_color;
+        }
+    """
+
+    RED, GREEN, BLUE = (1, 0, 0, 1), (0, 1, 0, 1), (0, 0, 1, 1)
+
+    def setUp(self):
+        super().setUp()
+        self.program = create_program(vertex=self.VERTEX_SHADER, fragment=self.FRAGMENT_SHADER)
+
+    def draw(self, mesh, *args, **kwargs):
+        def widget():
+            glClearColor(0, 0, 0, 0)
+            glClear(GL_COLOR_BUFFER_BIT)
+            self.program.use()
+            mesh.draw(*args, **kwargs)
+            self.program.unuse()
+            return True
+        return self.render(widget)
+
+    def quadrants(self, image):
+        """ rgba of the top left, top right, bottom left 
+            and bottom right pixel """
+        return [tuple(int(c) for c in image[y, x]) for y, x in ((0, 0), (0, -1), (-1, 0), (-1, -1))]
+
+    def test_indexed_mesh(self):
+        soup = mesh3d_rectangle(color=self.RED)
+        expected = self.draw(StridedVertexMesh(soup, attribute_locations=self.program.attributes))
+        self.assertEqual(self.quadrants(expected)[1], (255, 0, 0, 255))
+
+        for mesh in (IndexedMesh.from_vertices(soup, attribute_locations=self.program.attributes),
+                     IndexedMesh(*weld_vertices(soup), attribute_locations=self.program.attributes, optimize_cache=True)):
+            np.testing.assert_array_equal(self.draw(mesh), expected)
+            mesh.delete()
+            self.assertIsNone(mesh.element_buffer)
+
+        with self.assertRaises(ValueError):
+            IndexedMesh(*weld_vertices(soup), vertex_type=GL_LINES, optimize_cache=True)
+
+    def test_compact_mesh(self):
+        soup = mesh3d_rectangle(a=0.5, b=2, center=(-0.75, -1), color=(0.2, 0.4, 0.6, 1))
+        expected = self.draw(StridedVertexMesh(soup, attribute_locations=self.program.attributes))
+        compact = compact_mesh(soup)
+        self.assertEqual(compact.dtype, MESH_DTYPE_COMPACT)
+        np.testing.assert_array_equal(self.draw(StridedVertexMesh(compact, attribute_locations=self.program.attributes)), expected)
+
+    def test_instanced_mesh(self):
+        base = StridedVertexMesh(mesh3d_rectangle(color=self.BLUE), attribute_locations=self.program.attributes)
+        instances = np.array([((-1, -1), self.RED), ((0, 0), self.GREEN)], 
+                             dtype=[('offset', np.float32, 2), ('color', np.float32, 4)])
+        mesh = InstancedMesh(base, instances)
+        self.assertEqual(mesh.count, 2)
+        self.assertEqual(self.quadrants(self.draw(mesh)), 
+                         [(0, 0, 0, 0), (0, 255, 0, 255), (255, 0, 0, 255), (0, 0, 0, 0)])
+
+        instances['offset'][1] = (-1, 0)
+        mesh.set_instances(instances)
+        self.assertEqual(self.quadrants(self.draw(mesh))[0], (0, 255, 0, 255))
+
+        # the indexed base mesh shares its element buffer
+        indexed = IndexedMesh.from_vertices(base.vertices, attribute_locations=self.program.attributes)
+        self.assertEqual(self.quadrants(self.draw(InstancedMesh(indexed, instances)))[0], (0, 255, 0, 255))
+
+    def test_mesh_batch(self):
+        batch = MeshBatch(attribute_locations=self.program.attributes)
+        red = batch.append(mesh3d_rectangle(center=(-1, -1), color=self.RED))
+        green = batch.append(StridedVertexMesh(mesh3d_rectangle(color=self.GREEN), attribute_locations=self.program.attributes))
+        blue = batch.append(mesh3d_rectangle(center=(-1, 0), color=self.BLUE))
+        self.assertEqual(len(batch), 3)
+
+        self.assertEqual(self.quadrants(self.draw(batch)), 
+                         [(0, 0, 255, 255), (0, 255, 0, 255), (255, 0, 0, 255), (0, 0, 0, 0)])
+        self.assertEqual(self.quadrants(self.draw(batch, handles=green)), 
+                         [(0, 0, 0, 0), (0, 255, 0, 255), (0, 0, 0, 0), (0, 0, 0, 0)])
+        self.assertEqual(self.quadrants(self.draw(batch, handles=[red, blue])), 
+                         [(0, 0, 255, 255), (0, 0, 0, 0), (255, 0, 0, 255), (0, 0, 0, 0)])
+
+        # same size, sub range upload
+        buffer = batch.buffer
+        batch.update(green, mesh3d_rectangle(center=(0, -1), color=self.GREEN))
+        self.assertIs(batch.buffer, buffer)
+        self.assertEqual(self.quadrants(self.draw(batch))[1:], [(0, 0, 0, 0), (255, 0, 0, 255), (0, 255, 0, 255)])
+
+        # other size, the batch is uploaded again
+        cube = mesh3d_cube((1, 1, 0), color=self.RED)
+        batch.update(red, cube[:6])
+        batch.update(red, np.concatenate((cube[:6], mesh3d_rectangle(center=(0, 0), color=self.RED))))
+        self.assertEqual(list(batch.count), [12, 6, 6])
+        self.assertEqual(list(batch.first), [0, 12, 18])
+        self.assertEqual(self.quadrants(self.draw(batch)), 
+                         [(0, 0, 255, 255), (255, 0, 0, 255), (0, 0, 0, 0), (0, 255, 0, 255)])
+
+    def test_mesh_batch_validation(self):
+        batch = MeshBatch([mesh3d_rectangle()], attribute_locations=self.program.attributes)
+        with self.assertRaises(ValueError):
+            batch.append(compact_mesh(mesh3d_rectangle()))
+        with self.assertRaises(ValueError):
+            batch.update(0, compact_mesh(mesh3d_rectangle()))
+        with self.assertRaises(ValueError):
+            batch.update(0, StridedVertexMesh(mesh3d_rectangle(), GL_LINES, attribute_locations=self.program.attributes))
+        with self.assertRaises(ValueError):
+            batch.append(IndexedMesh.from_vertices(mesh3d_rectangle(), attribute_locations=self.program.attributes))
+        with self.assertRaises(IndexError):
+            batch.update(1, mesh3d_rectangle())
+
+    def test_empty_buffer_subdata(self):
+        buffer = BufferObject.to_device(np.zeros((0, 2), dtype=np.float32))
+        buffer.set_subdata(np.zeros((0, 2), dtype=np.float32))
+        with self.assertRaises(GlError):
+            buffer.set_subdata(np.zeros((1, 2), dtype=np.float32))
+
+if __name__ == '__main__':
+    unittest.main()
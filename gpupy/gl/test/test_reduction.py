@@ -0,0 +1,75 @@
+#-*- coding: utf-8 -*-
+"""
+tests of gpupy.gl.reduction against numpy.
+
+:author: keksnicoh
+"""
+
+from gpupy.gl.test import HeadlessTestCase
+from gpupy.gl import BufferObject
+from gpupy.gl.reduction import default_reduction
+
+from OpenGL.GL import *
+import numpy as np
+import unittest
+
+class ReductionTest(HeadlessTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.reduction = default_reduction()
+        self.data = np.random.RandomState(0).randn(10000, 2).astype(np.float32)
+        self.buffer = BufferObject.to_device(self.data)
+
+    def test_reduce(self):
+        for operation in ('min', 'max', 'sum', 'mean'):
+            with self.subTest(operation=operation):
+                result = self.reduction.reduce(self.buffer, operation).get()
+                expected = getattr(self.data.astype(np.float64), operation)(axis=0)
+                np.testing.assert_allclose(result, expected, rtol=1e-4, atol=1e-2)
+
+    def test_bounds(self):
+        lo, hi = self.reduction.bounds(self.buffer).get()
+        np.testing.assert_allclose(lo, self.data.min(axis=0))
+        np.testing.assert_allclose(hi, self.data.max(axis=0))
+
+    def test_bounds_range(self):
+        lo, hi = self.reduction.bounds(self.buffer, offset=100, length=50).get()
+        np.testing.assert_allclose(lo, self.data[100:150].min(axis=0))
+        np.testing.assert_allclose(hi, self.data[100:150].max(axis=0))
+
+    def test_bounds_ranges(self):
+        lo, hi = self.reduction.bounds(self.buffer, ranges=[(100, 50), (9000, 10)]).get()
+        data = np.concatenate((self.data[100:150], self.data[9000:9010]))
+        np.testing.assert_allclose(lo, data.min(axis=0))
+        np.testing.assert_allclose(hi, data.max(axis=0))
+
+    def test_struct_field(self):
+        data = np.zeros(5, dtype=[('a', np.float32, 2), ('b', np.float32)])
+        data['b'] = [3, 1, 4, 1, 5]
+        lo, hi = self.reduction.bounds(BufferObject.to_device(data), field='b').get()
+        self.assertEqual((float(np.ravel(lo)[0]), float(np.ravel(hi)[0])), (1, 5))
+
+    def test_float64(self):
+        data = self.data.astype(np.float64)
+        lo, hi = self.reduction.bounds(BufferObject.to_device(data)).get()
+        np.testing.assert_allclose(lo, data.min(axis=0), rtol=1e-6)
+        np.testing.assert_allclose(hi, data.max(axis=0), rtol=1e-6)
+
+    def test_restores_blend_state(self):
+        glEnable(GL_BLEND)
+        glBlendEquation(GL_FUNC_ADD)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        self.reduction.bounds(self.buffer).get()
+        self.assertTrue(glIsEnabled(GL_BLEND))
+        self.assertEqual(glGetIntegerv(GL_BLEND_EQUATION_RGB), GL_FUNC_ADD)
+        self.assertEqual(glGetIntegerv(GL_BLEND_SRC_RGB), GL_SRC_ALPHA)
+        self.assertEqual(glGetIntegerv(GL_BLEND_DST_ALPHA), GL_ONE_MINUS_SRC_ALPHA)
+
+    def test_histogram(self):
+        result = self.reduction.histogram(self.buffer, 8, (-2, 2)).get()
+        expected = np.histogram(self.data[:, 0], 8, (-2, 2))[0]
+        np.testing.assert_array_equal(np.ravel(result), expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+#-*- coding: utf-8 -*-
+"""
+tests of shader variants and events.
+
+:author: keksnicoh
+"""
+
+from gpupy.gl.test import HeadlessTestCase
+from gpupy.gl.lib import Event
+from gpupy.gl.shader import active_source, ProgramVariants
+from gpupy.gl import create_program
+from gpupy.gl.errors import GlError
+from gpupy.gl.watcher import ShaderWatcher
+
+from tempfile import TemporaryDirectory
+
+from OpenGL.GL import *
+import unittest
+import os
+
+VERTEX_SHADER = """
+{% version %}
+#ifdef SCALED
+uniform float scale;
+#else
+uniform vec2 offset;
+#endif
+in vec4 vertex;
+void main() {
+#ifdef SCALED
+    gl_Position = scale * vertex;
+#else
+    gl_Position = vertex + vec4(offset, 0, 0);
+#endif
+}
+"""
+
+FRAGMENT_SHADER = """
+{% version %}
+out vec4 color;
+void main() {
+    color = vec4(1);
+}
+"""
+
+class EventTest(unittest.TestCase):
+
+    def test_once_does_not_skip_listeners(self):
+        calls = []
+        event = Event()
+        event.once(lambda: calls.append('a'))
+        event.once(lambda: calls.append('b'))
+        event.append(lambda: calls.append('c'))
+        event()
+        event()
+        self.assertEqual(calls, ['a', 'b', 'c', 'c'])
+
+class ActiveSourceTest(unittest.TestCase):
+
+    def test_branches(self):
+        source = '#ifdef A\na\n#else\nb\n#endif\n#ifndef A\nc\n#endif\n#if X\nd\n#endif'
+        self.assertEqual(active_source(source, {'A': True}).split(), ['a', '#if', 'X', 'd', '#endif'])
+        self.assertEqual(active_source(source, {}).split(), ['b', 'c', '#if', 'X', 'd', '#endif'])
+
+class ProgramVariantsTest(HeadlessTestCase):
+
+    def test_variant_uniforms(self):
+        variants = ProgramVariants(lambda: create_program(vertex=VERTEX_SHADER, 
+                                                          fragment=FRAGMENT_SHADER, 
+                                                          link=False))
+        scaled = variants.get({'SCALED': True})
+        plain = variants.get()
+        self.assertIn('scale', scaled._uniforms)
+        self.assertNotIn('offset', scaled._uniforms)
+        self.assertIn('offset', plain._uniforms)
+        self.assertNotIn('scale', plain._uniforms)
+        self.assertIs(variants.get({'SCALED': True}), scaled)
+
+class RelinkTest(HeadlessTestCase):
+    size = (4, 4)
+
+    VERTEX_SHADER = """
+        {% version %}
+        void main() {
+            gl_Position = vec4(4 * vec2(gl_VertexID % 2, gl_VertexID / 2) - 1, 0, 1);
+        }
+    """
+
+    FRAGMENT_SHADER = """
+        {% version %}
+        uniform vec4 fill;
+        out vec4 color;
+        void main() {
+            color = fill;
+        }
+    """
+
+    # compiles but does not link, shade() is not defined
+    BROKEN_FRAGMENT_SHADER = """
+        {% version %}
+        uniform vec4 fill;
+        out vec4 color;
+        vec4 shade(vec4 c);
+        void main() {
+            color = shade(fill);
+        }
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.vao = glGenVertexArrays(1)
+        self.program = create_program(vertex=self.VERTEX_SHADER, fragment=self.FRAGMENT_SHADER)
+        self.program.uniform('fill', (0, 1, 0, 1))
+
+    def draw(self):
+        def widget():
+            glClearColor(0, 0, 0, 0)
+            glClear(GL_COLOR_BUFFER_BIT)
+            glBindVertexArray(self.vao)
+            self.program.use()
+            glDrawArrays(GL_TRIANGLES, 0, 3)
+            self.program.unuse()
+            glBindVertexArray(0)
+            return True
+        return self.render(widget)[0, 0]
+
+    def test_relink_releases_shaders(self):
+        fragment = self.program.get_shader(GL_FRAGMENT_SHADER)
+        old_shader = fragment.gl_shader_id
+        old_program = self.program.gl_shader_id
+
+        fragment.reload(self.FRAGMENT_SHADER.replace('color = fill', 'color = fill.bgra'))
+        self.program.relink()
+
+        self.assertEqual(glGetProgramiv(self.program.gl_shader_id, GL_ATTACHED_SHADERS), 0)
+        self.assertFalse(glIsShader(old_shader))
+        self.assertFalse(glIsProgram(old_program))
+        self.assertEqual(tuple(self.draw()), (0, 255, 0, 255))
+
+    def test_failed_relink_keeps_program(self):
+        self.assertEqual(tuple(self.draw()), (0, 255, 0, 255))
+        program_id = self.program.gl_shader_id
+
+        self.program.get_shader(GL_FRAGMENT_SHADER).reload(self.BROKEN_FRAGMENT_SHADER)
+        with self.assertRaises(GlError):
+            self.program.relink()
+
+        self.assertEqual(self.program.gl_shader_id, program_id)
+        self.assertEqual(tuple(self.draw()), (0, 255, 0, 255))
+
+    def test_polling_watcher(self):
+        watcher = ShaderWatcher(interval=0, inotify=False)
+        fragment = self.program.get_shader(GL_FRAGMENT_SHADER)
+        with TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'fill.frg.glsl')
+            with open(path, 'w') as f:
+                f.write(self.FRAGMENT_SHADER)
+            watcher.watch(path, fragment, self.program)
+            self.assertEqual(watcher.poll(), [])
+
+            with open(path, 'w') as f:
+                f.write(self.FRAGMENT_SHADER.replace('color = fill', 'color = fill.gbra'))
+            # mtime resolution of the file system might be coarse
+            mtime = os.stat(path).st_mtime_ns
+            os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+
+            self.assertEqual(watcher.poll(), [self.program])
+            self.assertEqual(watcher.poll(), [])
+        self.assertEqual(tuple(self.draw()), (255, 0, 0, 255))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#-*- coding: utf-8 -*-
+"""
+tests of gpupy.gl.texture.
+
+:author: keksnicoh
+"""
+
+from gpupy.gl.test import HeadlessTestCase
+from gpupy.gl.texture import Texture2D
+
+from OpenGL.GL import *
+import numpy as np
+import unittest
+
+def read_texture(texture, gl_format=GL_RED):
+    """ returns the bytes of the first level of **texture** """
+    glPixelStorei(GL_PACK_ALIGNMENT, 1)
+    with texture:
+        data = glGetTexImage(texture.gl_target, 0, gl_format, GL_UNSIGNED_BYTE)
+    glPixelStorei(GL_PACK_ALIGNMENT, 4)
+    return np.frombuffer(data, dtype=np.uint8)
+
+class TextureTest(HeadlessTestCase):
+
+    def test_unpack_alignment(self):
+        # rows of 5 bytes are not 4 byte aligned
+        data = np.arange(15, dtype=np.uint8).reshape(5, 3)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        texture = Texture2D.to_device(data)
+        self.assertEqual(glGetIntegerv(GL_UNPACK_ALIGNMENT), 4)
+        np.testing.assert_array_equal(read_texture(texture), data.flatten())
+
+        texture = Texture2D(array=True)
+        texture.format(np.uint8, (2, 5, 3))
+        texture.set_layer(1, data)
+        self.assertEqual(glGetIntegerv(GL_UNPACK_ALIGNMENT), 4)
+        np.testing.assert_array_equal(read_texture(texture)[15:], data.flatten())
+
+    def test_set_layer(self):
+        texture = Texture2D(array=True)
+        texture.format(np.uint8, (3, 4, 4))
+        layers = np.arange(48, dtype=np.uint8).reshape(3, 4, 4)
+        version = texture.version
+        for layer in (2, 0):
+            texture.set_layer(layer, layers[layer])
+        self.assertNotEqual(texture.version, version)
+        data = read_texture(texture).reshape(3, 4, 4)
+        np.testing.assert_array_equal(data[[0, 2]], layers[[0, 2]])
+
+        with self.assertRaises(ValueError):
+            texture.set_layer(3, layers[0])
+        with self.assertRaises(ValueError):
+            Texture2D.to_device(layers[0]).set_layer(0, layers[0])
+
+if __name__ == '__main__':
+    unittest.main()
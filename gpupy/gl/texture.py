@@ -9,6 +9,8 @@ from gpupy.gl.lib import imread, setter_dict
 from OpenGL.GL import *
 import numpy as np
 import os 
+from itertools import count
+from contextlib import contextmanager
 
 # it is important to define at least those
 # texture parameters. otherwise the texture
@@ -23,12 +25,29 @@ LINEAR_FILTERS = {
     GL_TEXTURE_MIN_FILTER: GL_LINEAR
 }
 
+# versions of the texture contents, unique among all textures
+_versions = count(1)
+
 NEAREST_FILTERS = {
     GL_TEXTURE_MAG_FILTER: GL_NEAREST,
     GL_TEXTURE_MIN_FILTER: GL_NEAREST
 }
 
 
+@contextmanager
+def unpack_alignment(gl_type):
+    """ rows of byte textures are not 4 byte aligned in general,
+        GL_UNPACK_ALIGNMENT is 1 for GL_UNSIGNED_BYTE within the
+        context and restored afterwards. """
+    if gl_type != GL_UNSIGNED_BYTE:
+        yield
+        return
+    previous = glGetIntegerv(GL_UNPACK_ALIGNMENT)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    try:
+        yield
+    finally:
+        glPixelStorei(GL_UNPACK_ALIGNMENT, previous)
 
 def gl_texture_id(texture_id):
     """
@@ -76,6 +95,9 @@ class AbstractTexture():
         self._gl_type = None
         self._data = None
 
+        # changes with each upload and parameter change
+        self.version = next(_versions)
+
         # -- for better user experience (XXX maybe remove me when this is not cool)
         self.parameters = setter_dict(self.parameter)
 
@@ -90,6 +112,14 @@ class AbstractTexture():
     
     def __del__(self):
         pass
+
+    def delete(self):
+        """
+        deletes the gl texture if exists
+        """
+        if self.gl_texture_id is not None:
+            glDeleteTextures([self.gl_texture_id])
+            self.gl_texture_id = None
         
     def __gl_tex_image__(self, gl_internal_format, size, gl_format, gl_type, data):
         """
@@ -183,13 +213,14 @@ class AbstractTexture():
 
         data = ndarray.flatten() if ndarray is not None else None
 
-        with self:
+        with self, unpack_alignment(gl_type):
             self.__gl_tex_image__(gl_internal_format, size, gl_format, gl_type, data)
 
         self._gl_format = gl_format
         self._gl_internal_format = gl_internal_format
         self._gl_type = gl_type
         self._data = ndarray
+        self.version = next(_versions)
 
         self.size = size
 
@@ -250,17 +281,20 @@ class AbstractTexture():
         with self:
             for p, v in NEAREST_FILTERS.items():
                 glTexParameterf(self.gl_target, p, v)
+        self.version = next(_versions)
 
     def interpolation_linear(self):
         self.gl_texture_parameters.update(LINEAR_FILTERS)
         with self:
             for p, v in LINEAR_FILTERS.items():
                 glTexParameterf(self.gl_target, p, v)
+        self.version = next(_versions)
 
     def tex_parameterf(self, pname, param):
         self.gl_texture_parameters[pname] = param
         with self:
             glTexParameterf(self.gl_target, pname, param)
+        self.version = next(_versions)
 
     def interpolate_linear(self):
         self.interpolation_linear()
@@ -275,7 +309,8 @@ class AbstractTexture():
 
         with self:
             glTexParameterf(self.gl_target, p, v)
-            
+        self.version = next(_versions)
+
     def _gl_texture_parameters(self):
         """
         assign texture parameters to texture
@@ -323,6 +358,25 @@ class AbstractTexture():
                 gl_format = GL_RGBA
                 gl_internal_format = GL_RGBA32F
 
+        # -- normalized unsigned bytes
+        #
+        # the shader samples values within [0, 1]
+        elif dtype == np.uint8:
+            gl_type = GL_UNSIGNED_BYTE
+
+            if channels == 1:
+                gl_format = GL_RED
+                gl_internal_format = GL_R8
+            elif channels == 2:
+                gl_format = GL_RG
+                gl_internal_format = GL_RG8
+            elif channels == 3:
+                gl_format = GL_RGB
+                gl_internal_format = GL_RGB8
+            elif channels == 4:
+                gl_format = GL_RGBA
+                gl_internal_format = GL_RGBA8
+
         # -- complex numbers
         #
         # XXX is this correct? Does numpy represent complex numbers
@@ -351,7 +405,7 @@ class AbstractTexture():
 
         # -- missing implementation
         else:
-            raise ValueError('bad dtype {}. currently np.float32, np.complex64 supported'.format(dtype))
+            raise ValueError('bad dtype {}. currently np.float32, np.uint8, np.complex64 supported'.format(dtype))
 
         return gl_type, gl_format, gl_internal_format
 
@@ -485,6 +539,31 @@ class Texture2D(AbstractTexture):
                                            gl_type,
                                            data)
 
+    def set_layer(self, layer, ndarray):
+        """
+        uploads **ndarray** of shape (x, y [, c]) into the layer
+        **layer** of an array texture. the texture must be
+        formatted before.
+        """
+        if not self.array:
+            raise ValueError('set_layer() requires an array texture')
+        if layer < 0 or layer >= self.size[0]:
+            raise ValueError('layer {} out of range, texture has {} layers'.format(layer, self.size[0]))
+
+        channels = ndarray.shape[2] if len(ndarray.shape) > 2 else 1
+        gl_type, gl_format, _ = self._find_texture_type_and_format(ndarray.dtype, channels)
+        with self, unpack_alignment(gl_type):
+            GPUPY_GL.debug_wrap(glTexSubImage3D, self.gl_target,
+                                                 0, 0, 0,
+                                                 np.int32(layer),
+                                                 np.int32(ndarray.shape[0]),
+                                                 np.int32(ndarray.shape[1]),
+                                                 1,
+                                                 gl_format,
+                                                 gl_type,
+                                                 ndarray.flatten())
+        self.version = next(_versions)
+
     def __get_size_and_channels_from_shape__(self, np_shape):
 
         # a 2d texture array must have shape (z, x, y [, c [, 1]*])
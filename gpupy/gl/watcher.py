@@ -0,0 +1,198 @@
+#-*- coding: utf-8 -*-
+"""
+shader file watcher
+
+watches glsl files and reloads the shaders which were created
+from them. only the programs which include a changed shader
+are relinked. The old program stays alive until the new one
+was linked, so a broken shader file does not break a running
+application.
+
+    watcher = ShaderWatcher()
+    watcher.watch('kernel.frg.glsl', shader, program)
+
+    # within the render loop (the thread owning the gl context)
+    watcher.poll()
+
+inotify is used on linux. Otherwise the watcher polls the
+modification times of the watched files.
+
+the default watcher is enabled by the environment variable
+GPUPY_WATCH_SHADERS=1, see GPUPY_GL.WATCH_SHADERS.
+
+:author: keksnicoh
+"""
+
+from gpupy.gl import GPUPY_GL
+from gpupy.gl.errors import GlError
+
+import os
+import struct
+import ctypes
+import ctypes.util
+from time import time
+from weakref import WeakSet, WeakKeyDictionary
+
+__all__ = ['ShaderWatcher', 'default_watcher']
+
+_DEFAULT_WATCHER = None
+
+def default_watcher():
+    """ returns the global shader watcher """
+    global _DEFAULT_WATCHER
+    if _DEFAULT_WATCHER is None:
+        _DEFAULT_WATCHER = ShaderWatcher()
+    return _DEFAULT_WATCHER
+
+class ShaderWatcher():
+    """
+    maps files to shaders and shaders to programs. All references
+    are weak so the watcher does not keep dead programs alive.
+    """
+    def __init__(self, interval=0.5, inotify=True):
+        self._shaders = {}
+        self._programs = WeakKeyDictionary()
+        self._backend = None
+        if inotify:
+            self._backend = _InotifyBackend.create()
+        if self._backend is None:
+            self._backend = _PollingBackend(interval)
+
+    def watch(self, path, shader, program=None):
+        """ watches file **path** which is the source of **shader**.
+            **program** is relinked when the shader changed. """
+        path = os.path.abspath(path)
+        if not path in self._shaders:
+            self._shaders[path] = WeakSet()
+            self._backend.add(path)
+        self._shaders[path].add(shader)
+        if not shader in self._programs:
+            self._programs[shader] = WeakSet()
+        if program is not None:
+            self._programs[shader].add(program)
+
+    def poll(self):
+        """ reloads changed shaders and relinks the affected
+            programs. must be invoked within the gl context.
+            returns a list of relinked programs. """
+        programs = set()
+        for path in self._backend.changed():
+            shaders = list(self._shaders.get(path, ()))
+            if not len(shaders):
+                continue
+            try:
+                with open(path) as f:
+                    source = f.read()
+            except OSError as e:
+                GPUPY_GL.warn('could not read shader file "{}": {}'.format(path, e))
+                continue
+
+            for shader in shaders:
+                try:
+                    shader.reload(source)
+                except GlError as e:
+                    GPUPY_GL.warn('could not reload "{}", keep previous shader.'.format(path))
+                    continue
+                GPUPY_GL.info('reloaded shader "{}"'.format(path))
+                programs.update(self._programs.get(shader, ()))
+
+        relinked = []
+        for program in programs:
+            try:
+                program.relink()
+            except GlError as e:
+                GPUPY_GL.warn('could not relink program {}, keep previous program: {}'.format(program.gl_shader_id, e))
+                continue
+            relinked.append(program)
+        return relinked
+
+class _PollingBackend():
+    """ compares file modification times at most
+        every **interval** seconds """
+    def __init__(self, interval):
+        self.interval = interval
+        self._mtimes = {}
+        self._last_poll = 0
+
+    def add(self, path):
+        self._mtimes[path] = self._mtime(path)
+
+    def changed(self):
+        if time() - self._last_poll < self.interval:
+            return []
+        self._last_poll = time()
+        changed = []
+        for path, mtime in self._mtimes.items():
+            current = self._mtime(path)
+            if current != mtime:
+                self._mtimes[path] = current
+                changed.append(path)
+        return changed
+
+    def _mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+class _InotifyBackend():
+    """ non blocking inotify. the directories are watched
+        since many editors replace files by renaming. """
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO    = 0x00000080
+    EVENT_HEADER   = struct.Struct('iIII')
+
+    @classmethod
+    def create(cls):
+        """ returns None if inotify is not available """
+        if not hasattr(os, 'O_NONBLOCK'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            libc.inotify_init1, libc.inotify_add_watch
+        except (OSError, AttributeError):
+            return None
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        return cls(libc, fd)
+
+    def __init__(self, libc, fd):
+        self._libc = libc
+        self._fd = fd
+        self._directories = {}
+        self._paths = set()
+
+    def add(self, path):
+        self._paths.add(path)
+        directory = os.path.dirname(path)
+        if directory in self._directories.values():
+            return
+        wd = self._libc.inotify_add_watch(self._fd, directory.encode(),
+                                          self.IN_CLOSE_WRITE | self.IN_MOVED_TO)
+        if wd < 0:
+            GPUPY_GL.warn('inotify could not watch "{}": {}'.format(
+                directory, os.strerror(ctypes.get_errno())))
+            return
+        self._directories[wd] = directory
+
+    def changed(self):
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 8192)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = self.EVENT_HEADER.unpack_from(data, offset)
+                offset += self.EVENT_HEADER.size
+                name = data[offset:offset+length].rstrip(b'\0').decode()
+                offset += length
+                path = os.path.join(self._directories.get(wd, ''), name)
+                if path in self._paths:
+                    changed.add(path)
+        return list(changed)
+
+    def __del__(self):
+        os.close(self._fd)
@@ -1,19 +1,28 @@
-from gpupy.gl.glfw import GLFW_Context, GLFW_run
-
 from gpupy.plot.plotter2d import Plotter2d
 from OpenGL.GL import *
 from gpupy.gl import *
 from gpupy.gl.lib.vector import *
 import numpy as np
 from gpupy.gl.components.camera import Camera2D
-from gpupy.gl.glfw import GLFW_window
 from time import time
 from gpupy.plot import domain
 
 from functools import partial
 
+# glfw requires the glfw library, the window classes are
+# imported on first access such that the plotting library
+# can be used by headless contexts without glfw.
+_GLFW_EXPORTS = ('GLFW_Context', 'GLFW_run', 'GLFW_window')
+
+def __getattr__(name):
+    if name in _GLFW_EXPORTS:
+        from gpupy.gl import glfw
+        return getattr(glfw, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 def plot2d(f):
+    from gpupy.gl.glfw import GLFW_Context, GLFW_run
+
     def ready(window):
         Plotter2dBasic(window, f)
     width, height = 400, 400
@@ -17,10 +17,13 @@ should be applied.
 from gpupy.gl.lib import attributes, imread
 from gpupy.gl.glsl import dtype_is_struct, dtype_vector, dtype_fields_glsl
 from gpupy.gl import Texture3D, Texture2D, Texture1D
+from gpupy.gl.buffer import BufferObject, vertex_attrib_pointer, vertex_attribute_glsl_type
+from gpupy.plot.nputil import minmax_pyramid
 
 from OpenGL.GL import * 
 import numpy as np 
 
+from collections import OrderedDict
 from ctypes import c_void_p
 import re
 import os
@@ -47,9 +50,16 @@ __all__ = [
     'sones_like',
     'szeros_like',
     'VertexDomain', 
+    'StreamingVertexDomain',
+    'LodVertexDomain',
+    'MemmapVertexDomain',
     'TextureDomain', 
     'RandomDomain', 
     'FunctionDomain',
+    'GridDomain',
+    'LinspaceDomain',
+    'grid',
+    'linspace',
     'enable_for_program',
     'domains_to_subsitutions',
     'colorwheel'
@@ -82,6 +92,13 @@ def ones(shape, dtype=np.float32):
 
 def random(timeseed=False): 
     return RandomDomain(timeseed=timeseed) 
+
+def linspace(start, stop, num):
+    return LinspaceDomain(start, stop, num)
+
+def grid(cs=(0, 1, 0, 1), steps=None):
+    return GridDomain(cs, steps)
+
 def empty_like(): pass
 def ones_like(): pass 
 def zeros_like(): pass 
@@ -122,6 +139,14 @@ class AbstractDomain():
     """
     # ON CHANGE EVENT
 
+    # incremented when the domain data changes. graphs which
+    # cache their output compare the versions of their domains.
+    version = 0
+
+    # volatile domains change with every frame (e.g. time seeded
+    # random numbers), their output cannot be cached.
+    volatile = False
+
     def requires(self, domains):
         """
         checks whether all required domains are available.
@@ -223,12 +248,32 @@ class _GlslDeclarationDomain(AbstractDomain):
 class VertexDomain(_GlslAttributePointerDomain):
     """
     vertex domain provides vertex attributes for 
-    glsl shader by a given BufferObject
+    glsl shader by a given BufferObject. 
+
+    the vertex attribute format is derived from the dtype, see
+    gpupy.gl.buffer.vertex_attribute_format. E.g. float16 data
+    or normalized uint8 colors are read as float vectors.
     """
     buffer = attributes.BufferObjectAttribute()
 
+    # incremented on changes which are not uploads
+    _version = 0
+
     def __init__(self, data):
         self.buffer = data
+        self._x_version = None
+        self._x_index = None
+
+    @property
+    def version(self):
+        """ changes with each upload into the buffer and if
+            another buffer is assigned """
+        return (self._version, self.buffer.version)
+
+    def data_ranges(self):
+        """ returns the (offset, length) ranges of the valid 
+            rows of the buffer """
+        return [(0, len(self.buffer))]
 
     @classmethod 
     def arange(cls, start, stop, step=None, dtype=np.float32):
@@ -238,69 +283,481 @@ class VertexDomain(_GlslAttributePointerDomain):
         """
         return cls(np.arange(start, stop, step, dtype))
 
+    @classmethod
+    def from_memmap(cls, data, chunk_rows=2**20, **kwargs):
+        """
+        creates an out of core domain of a (n, 2) series which 
+        stays on disk, see MemmapVertexDomain. **data** is a .npy 
+        path or an array like np.memmap.
+        """
+        return MemmapVertexDomain(data, chunk_rows, **kwargs)
+
     # -- domain API 
 
     def glsl_identifier(self, pref):
+        return [(f, '{}_{}'.format(pref, f) if f is not None else pref, 0, t) 
+                for f, t, _ in self._attribute_fields()]
+
+    def _attribute_fields(self):
+        """ returns a list of (field, glsl_type, field_dtype) where
+            field is None if the buffer is not structured """
         dtype = self.buffer.dtype
         if dtype_is_struct(dtype):
-            fields = dtype_fields_glsl(dtype)
-            return [(f, '{}_{}'.format(pref, f), 0, t) for t, f in fields]
+            return [(f, vertex_attribute_glsl_type(dtype[f]), dtype[f]) for f in dtype.names]
+
+        # (n, k) buffers are vector attributes
         shape = self.buffer.shape
-        if len(shape) == 1:
-            shape = (shape, 1)
-        gltype = dtype_vector(dtype, shape[1])
-        return [(None, pref, 0, gltype)]
+        if len(shape) > 1 and shape[1] > 1:
+            dtype = np.dtype((dtype, shape[1]))
+        return [(None, vertex_attribute_glsl_type(dtype), dtype)]
 
     # -- sequencial domain API 
 
     def glsl_attributes(self, aname):
-        shape = self.buffer.shape
-        dtype = self.buffer.dtype
-
-        if dtype_is_struct(dtype):
-            glsl_fields = dtype_fields_glsl(dtype)
-            tmpl = 'in {gltype:} {aname:}_{field:};'
-            return '\n'.join(tmpl.format(gltype=t, field=f, aname=aname) for t, f in glsl_fields)
-        else:
-            # XXX support matrix?
-            oshape = shape
-            if len(shape) == 1:
-                shape = (shape, 1)
-            gltype = dtype_vector(dtype, shape[1])
-            return "in {gltype:} {aname:};".format(gltype=gltype, aname=aname)
-
-    def attrib_pointers(self, aname, attribute_locations):
-        buff = self.buffer
+        tmpl = 'in {gltype:} {aname:};'
+        return '\n'.join(tmpl.format(gltype=t, aname=aname if f is None else '{}_{}'.format(aname, f)) 
+                         for f, t, _ in self._attribute_fields())
+
+    def attrib_pointers(self, aname, attribute_locations, buffer=None):
+        """ binds the attribute pointers to the domain buffer or 
+            to **buffer** of the same format """
+        buff = buffer or self.buffer
         buff.bind()
 
+        # attributes which are not used by the kernel are
+        # inactive and have no location.
+
         # dtype is a structure => strided
         if dtype_is_struct(buff.dtype):
-            dom_attrs = [(d[0], aname+'_'+d[0]) for d in buff.dtype.descr]
-            for field, attr in dom_attrs:
-                sdtype = buff.dtype[field].subdtype is None
-                components = 1 if sdtype else buff.dtype[field].subdtype[1][0]
-                glVertexAttribPointer(attribute_locations[attr], 
-                                      components, 
-                                      GL_FLOAT, 
-                                      GL_FALSE, 
-                                      buff.dtype.itemsize, 
-                                      c_void_p(buff.dtype.fields[field][1]))
-                glEnableVertexAttribArray(attribute_locations[attr])
+            for field, _, dtype in self._attribute_fields():
+                location = attribute_locations.get(aname+'_'+field, -1)
+                if location >= 0:
+                    vertex_attrib_pointer(location, 
+                                          dtype, 
+                                          buff.dtype.itemsize, 
+                                          buff.dtype.fields[field][1])
 
         # vector buffer
         else:
-            dim = buff.shape[1] if len(buff.shape) > 1 else 1
-            glVertexAttribPointer(attribute_locations[aname], 
-                                  dim, 
-                                  GL_FLOAT, 
-                                  GL_FALSE, 
-                                  0, 
-                                  None)
-            glEnableVertexAttribArray(attribute_locations[aname]) 
+            _, _, dtype = self._attribute_fields()[0]
+            location = attribute_locations.get(aname, -1)
+            if location >= 0:
+                vertex_attrib_pointer(location, dtype)
 
     def __len__(self):
         return len(self.buffer)
 
+    # -- visibility 
+
+    def x_index(self):
+        """ returns the host side x column if the buffer is a 
+            (n, k) vector buffer with monotonic x, otherwise None. """
+        # the version is unique among all buffers, it changes
+        # with uploads and if another buffer is assigned.
+        if self.buffer.version != self._x_version:
+            self._x_version = self.buffer.version
+            self._x_index = None
+            host = self.buffer.host
+            if host is not None and not dtype_is_struct(host.dtype) \
+                and len(host.shape) == 2 and host.shape[1] > 1:
+                x = host[:, 0]
+                if np.all(x[1:] >= x[:-1]):
+                    self._x_index = x
+        return self._x_index
+
+    def visible_range(self, x0, x1):
+        """ returns (offset, length) of the samples within [x0, x1]
+            including one sample on each side so lines leaving the 
+            interval are drawn. None if x is not monotonic. """
+        x = self.x_index()
+        if x is None:
+            return None
+        return _visible_range(x, x0, x1)
+
+
+def _visible_range(x, x0, x1):
+    # cs of a flipped axis
+    x0, x1 = min(x0, x1), max(x0, x1)
+    i0 = max(0, np.searchsorted(x, x0, 'left') - 1)
+    i1 = min(len(x), np.searchsorted(x, x1, 'right') + 1)
+    return int(i0), int(max(0, i1 - i0))
+
+
+class StreamingVertexDomain(VertexDomain):
+    """
+    vertex domain of a fixed size ring buffer. samples are 
+    appended by sub range uploads, the buffer is never
+    reallocated. 
+
+        stream = StreamingVertexDomain(10000, np.dtype((np.float32, 2)))
+        graph = GlPrimitivesGraph(stream, mode='lines')
+
+        # each tick
+        stream.append(samples)
+
+    once the buffer is full, the oldest samples are overwritten.
+    the graph draws the ring by the ranges of draw_ranges(). 
+    the buffer has one additional row which mirrors the first 
+    row, so a line strip is not interrupted at the wrap around.
+    """
+    def __init__(self, capacity, dtype=np.float32):
+        if capacity < 1:
+            raise ValueError('capacity must be positive')
+        super().__init__(BufferObject.to_device(np.zeros(capacity + 1, dtype=dtype), usage=GL_DYNAMIC_DRAW))
+        self.capacity = capacity
+        self._head = 0
+        self._count = 0
+
+    def append(self, samples):
+        """ appends samples to the ring buffer. at most two
+            sub range uploads (plus the mirror row) are required. """
+        buff = self.buffer
+        samples = np.asarray(samples, dtype=buff.dtype).reshape((-1,) + buff.shape[1:])
+
+        # only the newest samples survive
+        if len(samples) > self.capacity:
+            self._head = (self._head + len(samples) - self.capacity) % self.capacity
+            self._count = self.capacity
+            samples = samples[-self.capacity:]
+
+        n = len(samples)
+        if not n:
+            return
+        tail = min(n, self.capacity - self._head)
+        buff.set_subdata(samples[:tail], self._head)
+        if tail < n:
+            buff.set_subdata(samples[tail:], 0)
+
+        # keep the mirror row in sync with the first row
+        if self._head == 0 or tail < n:
+            first = tail if tail < n else 0
+            buff.set_subdata(samples[first:first+1], self.capacity)
+
+        self._head = (self._head + n) % self.capacity
+        self._count = min(self.capacity, self._count + n)
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+        self._version += 1
+
+    def draw_ranges(self, connected=False, cs=None, resolution=None, cull=False):
+        """
+        returns the (offset, length) ranges of the valid samples
+        in chronological order. if **connected** the first range
+        includes the mirror row such that a line strip connects
+        both ranges.
+        """
+        if self._count < self.capacity:
+            return [(0, self._count)] if self._count else []
+        if self._head == 0:
+            return [(0, self.capacity)]
+        return [(self._head, self.capacity - self._head + (1 if connected else 0)), 
+                (0, self._head)]
+
+    def __len__(self):
+        return self._count
+
+    def data_ranges(self):
+        # neither the unused rows nor the mirror row
+        return self.draw_ranges()
+
+    def visible_range(self, x0, x1):
+        # the ring is not ordered by x
+        return None
+
+
+class LodVertexDomain(VertexDomain):
+    """
+    vertex domain of a (n, 2) series of (x, y) samples with
+    levels of detail. the levels are created at upload time 
+    by nputil.minmax_pyramid and stored one after another in 
+    a single buffer. 
+
+    each frame the graph asks for draw_ranges() with the current
+    configuration space and resolution. the coarsest level whose
+    buckets are not wider than **pixel_fraction** pixels is drawn. 
+    since the minimum and maximum of each bucket is kept, no peaks 
+    are lost. deviations from the full series are below 
+    **pixel_fraction** pixels along the x axis.
+
+        graph = GlPrimitivesGraph(LodVertexDomain(data), mode='lines')
+    """
+    def __init__(self, data, min_length=4096, pixel_fraction=0.5):
+        data = np.asarray(data, dtype=np.float32)
+        levels = minmax_pyramid(data, min_length=min_length)
+        super().__init__(np.concatenate(levels))
+
+        # decimation keeps the order, so each level is
+        # monotonic if the series is.
+        x = data[:, 0]
+        self._levels_x = [l[:, 0] for l in levels] if np.all(x[1:] >= x[:-1]) else None
+
+        self.pixel_fraction = pixel_fraction
+        self.level = 0
+        self.level_lengths = np.array([len(l) for l in levels])
+        self.level_offsets = np.concatenate(([0], np.cumsum(self.level_lengths)[:-1]))
+
+        # widest bucket of a level along the x axis
+        self.level_extents = np.zeros(len(levels), dtype=np.float64)
+        for i, level in enumerate(levels[1:], 1):
+            x = level[:, 0].reshape((-1, 4))
+            self.level_extents[i] = np.max(x[:, 3] - x[:, 0])
+
+    def select_level(self, cs, resolution):
+        """ selects the coarsest level which is detailed enough
+            for configuration space **cs** rendered into 
+            **resolution** pixels """
+        pixel = abs(cs[1] - cs[0]) / max(1, resolution[0])
+        fine = np.nonzero(self.level_extents <= self.pixel_fraction * pixel)[0]
+        self.level = int(fine[-1])
+        return self.level
+
+    def draw_ranges(self, connected=False, cs=None, resolution=None, cull=True):
+        """ returns the range of the selected level. if **cull**, 
+            only the part of a monotonic series within cs is drawn. """
+        if cs is not None and resolution is not None:
+            self.select_level(cs, resolution)
+        offset, length = 0, int(self.level_lengths[self.level])
+
+        # only the visible part of a monotonic series
+        if cull and cs is not None and self._levels_x is not None:
+            offset, length = _visible_range(self._levels_x[self.level], cs[0], cs[1])
+        return [(int(self.level_offsets[self.level]) + offset, length)]
+
+    def __len__(self):
+        return int(self.level_lengths[0])
+
+    def data_ranges(self):
+        # the levels are decimations of the first level
+        return [(0, len(self))]
+
+    def visible_range(self, x0, x1):
+        # draw_ranges() culls within the selected level
+        return None
+
+
+class _Chunk():
+    """ uploaded chunk of a MemmapVertexDomain """
+    def __init__(self, buffer, x):
+        self.buffer = buffer
+        self.x = x
+
+class MemmapVertexDomain(VertexDomain):
+    """
+    out of core vertex domain of a (n, 2) series of (x, y) 
+    samples with ascending x. the series stays on disk (np.memmap
+    or a .npy file opened with mmap_mode='r'), it is uploaded in 
+    chunks of **chunk_rows** rows when the chunks become visible:
+
+        domain = VertexDomain.from_memmap('recording.npy', chunk_rows=2**20)
+        graph = GlPrimitivesGraph(domain, mode='lines')
+
+    each visible chunk is decimated like LodVertexDomain: the 
+    coarsest level (buckets of 4*factor**level samples, see 
+    nputil.minmax_decimate) whose buckets are not wider than 
+    **pixel_fraction** pixels is uploaded. at most **max_chunks**
+    chunks are kept on the gpu, the least recently drawn chunks 
+    are deleted first. if more than **max_chunks** chunks are 
+    visible, aligned groups of 2**k chunks are decimated into 
+    one buffer.
+
+    the min/max pyramid of a chunk (nputil.minmax_pyramid) is
+    built when the chunk is read from disk. the pyramids of the
+    **max_chunks** least recently read chunks stay on the host, 
+    so zooming uploads another level without reading the chunk 
+    again. the bounds of each chunk are recorded on the way, 
+    bounds() reads only chunks which were never read before.
+
+    each chunk buffer ends with the first sample of the next chunk
+    so line strips are continuous. graphs draw the domain by the 
+    (buffer, offset, length) batches of draw_batches(), other 
+    vertex domains of the same graph are not supported.
+
+    XXX
+    - decimate chunks in a background thread
+    """
+    def __init__(self, data, chunk_rows=2**20, max_chunks=64, factor=4, pixel_fraction=0.5):
+        if isinstance(data, str):
+            data = np.load(data, mmap_mode='r')
+        if len(data.shape) != 2 or data.shape[1] != 2:
+            raise ValueError('data must have shape (n, 2), {} given'.format(data.shape))
+        if chunk_rows < 4 * factor:
+            raise ValueError('chunk_rows must be at least {}'.format(4 * factor))
+        if max_chunks < 1:
+            raise ValueError('max_chunks must be positive')
+
+        # the format of the chunks, only one row is uploaded
+        super().__init__(np.asarray(data[:1], dtype=np.float32))
+
+        self.data = data
+        self.chunk_rows = int(chunk_rows)
+        self.max_chunks = max_chunks
+        self.factor = factor
+        self.pixel_fraction = pixel_fraction
+
+        # x range of the chunks, only the first and the last
+        # row of each chunk is read.
+        n = len(data)
+        starts = np.arange(0, n, self.chunk_rows)
+        self.chunk_x0 = np.asarray(data[starts, 0], dtype=np.float64)
+        self.chunk_x1 = np.asarray(data[np.minimum(starts + self.chunk_rows, n) - 1, 0], dtype=np.float64)
+
+        # (chunk, level, span) -> _Chunk
+        self._chunks = OrderedDict()
+
+        # chunk -> levels 1, 2, ... of the min/max pyramid
+        self._pyramids = OrderedDict()
+
+        # (lower, upper) of each chunk, nan if never read
+        self._chunk_bounds = np.full((len(starts), 2, 2), np.nan)
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def chunk_count(self):
+        return len(self.chunk_x0)
+
+    def visible_chunks(self, x0, x1):
+        """ returns the indices of the chunks within [x0, x1]. the
+            chunk before is included since its last line segment
+            might reach into the interval. """
+        i0 = max(0, np.searchsorted(self.chunk_x1, x0, 'left') - 1)
+        i1 = np.searchsorted(self.chunk_x0, x1, 'right')
+        return range(int(i0), int(max(i0, i1)))
+
+    def chunk_span(self, chunks):
+        """ returns the number of chunks 2**k per buffer such that
+            the aligned groups of **chunks** are at most max_chunks """
+        span = 1
+        while span < self.chunk_count \
+          and chunks[-1] // span - chunks[0] // span + 1 > self.max_chunks:
+            span *= 2
+        return span
+
+    def chunk_level(self, index, cs, resolution, span=1):
+        """ returns the decimation level of the **span** chunks at 
+            **index** for configuration space **cs** rendered into 
+            **resolution** pixels """
+        last = min(index + span, self.chunk_count) - 1
+        rows = min(span * self.chunk_rows, len(self.data) - index * self.chunk_rows)
+        spacing = (self.chunk_x1[last] - self.chunk_x0[index]) / max(1, rows - 1)
+        pixel = abs(cs[1] - cs[0]) / max(1, resolution[0])
+
+        level = 0
+        while 4 * self.factor ** (level + 1) <= rows \
+          and 4 * self.factor ** (level + 1) * spacing <= self.pixel_fraction * pixel:
+            level += 1
+        return level
+
+    def _chunk(self, index, level, span=1):
+        """ returns the uploaded **span** chunks at **index**, 
+            uploads them if required """
+        key = (index, level, span)
+        if key in self._chunks:
+            self._chunks.move_to_end(key)
+            return self._chunks[key]
+
+        # the chunks are read one by one, a group is never
+        # read at once.
+        parts = [self._decimated(i, level) for i in range(index, min(index + span, self.chunk_count))]
+        end = (index + span) * self.chunk_rows
+        if end < len(self.data):
+            parts.append(np.asarray(self.data[end:end + 1], dtype=np.float32))
+        rows = np.concatenate(parts)
+
+        buffer = BufferObject.to_device(rows)
+        buffer.host = None
+        chunk = self._chunks[key] = _Chunk(buffer, rows[:, 0].copy())
+        return chunk
+
+    def _read(self, index):
+        start = index * self.chunk_rows
+        return np.asarray(self.data[start:start + self.chunk_rows], dtype=np.float32)
+
+    def _decimated(self, index, level):
+        """ returns **level** of the min/max pyramid of chunk 
+            **index**. the chunk is read from disk for level 0 
+            or if its pyramid is not cached. """
+        levels = self._pyramids.get(index)
+        if levels is not None:
+            self._pyramids.move_to_end(index)
+            level = min(level, len(levels))
+            if level:
+                return levels[level - 1]
+
+        rows = self._read(index)
+        if levels is None:
+            levels = self._build_pyramid(index, rows)
+            level = min(level, len(levels))
+        return levels[level - 1] if level else rows
+
+    def _build_pyramid(self, index, rows):
+        """ decimates the **rows** of chunk **index** until a single 
+            bucket is left and records the bounds of the chunk """
+        self._chunk_bounds[index] = rows.min(axis=0), rows.max(axis=0)
+        levels = minmax_pyramid(rows, min_length=4, factor=self.factor)[1:]
+
+        self._pyramids[index] = levels
+        while len(self._pyramids) > self.max_chunks:
+            self._pyramids.popitem(last=False)
+        return levels
+
+    def _evict(self, keep):
+        """ deletes least recently drawn chunks which are not in 
+            **keep** until at most max_chunks chunks are left """
+        for key in list(self._chunks):
+            if len(self._chunks) <= self.max_chunks:
+                break
+            if not key in keep:
+                self._chunks.pop(key).buffer.delete()
+
+    def draw_batches(self, connected=False, cs=None, resolution=None, cull=True):
+        """
+        returns (buffer, offset, length) batches of the visible 
+        chunks, of all chunks if not **cull**. the chunks are 
+        uploaded on demand.
+        """
+        if cs is None:
+            cs = (self.chunk_x0[0], self.chunk_x1[-1]) if self.chunk_count else (0, 0)
+        if resolution is None:
+            resolution = (1, 1)
+
+        chunks = self.visible_chunks(cs[0], cs[1]) if cull else range(self.chunk_count)
+        if not len(chunks):
+            return []
+        span = self.chunk_span(chunks)
+
+        batches, keys = [], set()
+        for index in range(chunks[0] // span * span, chunks[-1] + 1, span):
+            level = self.chunk_level(index, cs, resolution, span)
+            chunk = self._chunk(index, level, span)
+            keys.add((index, level, span))
+            offset, length = _visible_range(chunk.x, cs[0], cs[1]) if cull else (0, len(chunk.x))
+            if length > (1 if connected else 0):
+                batches.append((chunk.buffer, offset, length))
+        self._evict(keys)
+        return batches
+
+    def visible_range(self, x0, x1):
+        # draw_batches() culls the chunks
+        return None
+
+    def bounds(self):
+        """ returns (lower, upper) of the series. chunks which 
+            were never read are read once. """
+        for index in np.nonzero(np.isnan(self._chunk_bounds[:, 0, 0]))[0]:
+            self._build_pyramid(index, self._read(index))
+        return (np.min(self._chunk_bounds[:, 0], axis=0, initial=np.inf), 
+                np.max(self._chunk_bounds[:, 1], axis=0, initial=-np.inf))
+
+    def delete(self):
+        """ deletes all uploaded chunks """
+        for chunk in self._chunks.values():
+            chunk.buffer.delete()
+        self._chunks.clear()
+        self._pyramids.clear()
 
 class TextureDomain(_GlslDeclarationDomain):
     """
@@ -385,6 +842,11 @@ class TextureDomain(_GlslDeclarationDomain):
         if cs is not None:
             self.cs = cs
 
+    @property
+    def version(self):
+        """ changes with each upload into the texture """
+        return self.texture.version
+
     def periodic(self, periodic=False):
         if periodic:
             self.texture.tex_parameterf(GL_TEXTURE_WRAP_S, GL_REPEAT)
@@ -428,6 +890,125 @@ class TextureDomain(_GlslDeclarationDomain):
         header = self.__class__._GLSL_TEMPLATE_DECRL.format(d=t.dimension, upref=upref)
         return header + '\n\n' + declr
 
+class GridDomain(_GlslDeclarationDomain):
+    """
+    maps the normalized coordinates [0, 1]^2 of a fragment kernel
+    to the configuration space **cs**. the coordinates are computed
+    within the shader, nothing is uploaded. a complex plane is
+
+        FragmentGraph(domain={'z': GridDomain(cs)}, 
+                      fragment_kernel='''vec4 fragment_kernel(vec2 x) {
+                          vec2 z = $D.z(x);
+                          ...
+                      }''')
+
+    if **steps** (int or (nx, ny)) is given, the coordinates
+    are snapped to a grid like np.linspace(cs[0], cs[1], nx)
+    so the result is the one of nputil.cplane(*cs, steps).
+    without steps each fragment has its own coordinate, so
+    changing the resolution does not cost anything.
+    """
+    GLSL_TEMPLATE = """
+        uniform vec4 gd_cs_${FNAME};
+        uniform vec2 gd_steps_${FNAME};
+        vec2 ${FNAME}(vec2 x) {
+            vec2 n = gd_steps_${FNAME} - 1;
+            x = mix(x, round(x * n) / n, greaterThan(n, vec2(0)));
+            return gd_cs_${FNAME}.xz + x * (gd_cs_${FNAME}.yw - gd_cs_${FNAME}.xz);
+        }
+    """
+
+    cs = attributes.VectorAttribute(4, (0, 1, 0, 1))
+    steps = attributes.VectorAttribute(2, (0, 0))
+
+    def __init__(self, cs=(0, 1, 0, 1), steps=None):
+        self.cs = cs
+        if steps is not None:
+            self.steps = (steps, steps) if np.isscalar(steps) else steps
+
+    @cs.on_change
+    @steps.on_change
+    def _changed(self, *e):
+        self.version += 1
+
+    # -- domain API 
+
+    def glsl_identifier(self, pref):
+        return [(None, pref, 1, 'vec2')]
+
+    def enable(self, program, upref, texunit=0):
+        program.uniform('gd_cs_{}'.format(upref), self.cs.values)
+        program.uniform('gd_steps_{}'.format(upref), self.steps.values)
+        return texunit
+
+    # -- function domain API
+
+    def glsl_declr(self, upref, **kwargs):
+        return self.__class__.GLSL_TEMPLATE.replace('${FNAME}', upref)
+
+class LinspaceDomain(_GlslDeclarationDomain):
+    """
+    **num** evenly spaced samples of [**start**, **stop**] like
+    np.linspace(). the sample of a vertex is computed from 
+    gl_VertexID, no vertex buffer is required:
+
+        GlPrimitivesGraph(LinspaceDomain(0, 10, 100000), kernel='''
+            vec2 kernel() {
+                return vec2(${D.domain}, sin(${D.domain}));
+            }''', mode='lines')
+
+    the domain has a length, so graphs detect the number of
+    vertices to draw. linspace() changes the samples without
+    relinking the program.
+    """
+    GLSL_TEMPLATE = """
+        uniform vec2 ls_${FNAME};
+        float ${FNAME}(int i) {
+            return ls_${FNAME}.x + float(i) * ls_${FNAME}.y;
+        }
+    """
+
+    def __init__(self, start, stop, num):
+        self.linspace(start, stop, num)
+
+    def linspace(self, start, stop, num):
+        if num < 1:
+            raise ValueError('num must be positive')
+        self.start = start
+        self.stop = stop
+        self.num = int(num)
+        self.version += 1
+
+    @property
+    def step(self):
+        return (self.stop - self.start) / max(1, self.num - 1)
+
+    def __len__(self):
+        return self.num
+
+    def visible_range(self, x0, x1):
+        """ (offset, length) of the samples within [x0, x1] 
+            if the samples are used as x coordinates. """
+        if self.step <= 0:
+            return None
+        i0 = max(0, int(np.floor((x0 - self.start) / self.step)))
+        i1 = min(self.num, int(np.ceil((x1 - self.start) / self.step)) + 1)
+        return i0, max(0, i1 - i0)
+
+    # -- domain API 
+
+    def glsl_identifier(self, pref):
+        return [(None, '{}(gl_VertexID)'.format(pref), 0, 'float')]
+
+    def enable(self, program, upref, texunit=0):
+        program.uniform('ls_{}'.format(upref), (self.start, self.step))
+        return texunit
+
+    # -- function domain API
+
+    def glsl_declr(self, upref, **kwargs):
+        return self.__class__.GLSL_TEMPLATE.replace('${FNAME}', upref)
+
 class RandomDomain(_GlslDeclarationDomain):
     GLSL_TIMESEED = """
         uniform float rd_${FNAME};
@@ -458,6 +1039,10 @@ class RandomDomain(_GlslDeclarationDomain):
     def __init__(self, timeseed=True):
         self.timeseed = timeseed
 
+    @property
+    def volatile(self):
+        return self.timeseed
+
     def glsl_identifier(self, pref):
         return [(None, pref, 1, None)]
 
@@ -0,0 +1,72 @@
+#-*- coding: utf-8 -*-
+"""
+benchmarks the frame time of a line graph against the series
+length, with and without levels of detail.
+
+    python -m gpupy.plot.examples.bench_lod
+
+the plot is 1000 pixels wide and shows the whole series.
+without levels of detail the frame time grows linear with
+the series length, the LodVertexDomain draws a few thousand
+vertices independent of the length.
+
+:author: keksnicoh
+"""
+
+from gpupy.gl.glfw import bootstrap_gl, GLFW_Window
+from gpupy.gl.components.camera import Camera2D
+from gpupy.plot.plotter2d import Plotter2d
+from gpupy.plot.domain import VertexDomain, LodVertexDomain
+from gpupy.plot.graph.glprimitives import GlPrimitivesGraph
+from OpenGL.GL import glFinish
+
+import numpy as np
+from time import time
+
+SIZE = (1000, 500)
+FRAMES = 20
+
+def series(n):
+    x = np.linspace(0, 1, n, dtype=np.float32)
+    y = np.cumsum(np.random.randn(n)).astype(np.float32)
+    y /= np.max(np.abs(y))
+    return np.dstack((x, y))[0]
+
+def frame_time(domain):
+    plotter = Plotter2d(SIZE, cs=(0, 1, -1, 1))
+    plotter += GlPrimitivesGraph(domain, mode='lines')
+
+    # first frame compiles and links
+    plotter.tick()
+    glFinish()
+
+    # ticks of an unchanged plot do not render, each frame
+    # is damaged explicitly.
+    t = time()
+    for i in range(FRAMES):
+        plotter.damage()
+        plotter.tick()
+    glFinish()
+    return (time() - t) / FRAMES
+
+def main():
+    bootstrap_gl()
+    window = GLFW_Window(size=SIZE)
+    window.make_context()
+    camera = Camera2D(screensize=SIZE)
+
+    print('{:>10} {:>12} {:>12} {:>12} {:>10}'.format('n', 'full [ms]', 'lod [ms]', 'build [ms]', 'vertices'))
+    for n in (10**5, 10**6, 10**7, 5*10**7):
+        data = series(n)
+        full = frame_time(VertexDomain(data))
+
+        t = time()
+        lod = LodVertexDomain(data)
+        build = time() - t
+        lod_time = frame_time(lod)
+
+        print('{:>10} {:>12.2f} {:>12.2f} {:>12.2f} {:>10}'.format(
+            n, full*1000, lod_time*1000, build*1000, lod.level_lengths[lod.level]))
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,19 @@
-from gpupy.plot import plot2d, domain, nputil
+from gpupy.plot import plot2d, domain
 from gpupy.plot.graph.fragmentgraph import FragmentGraph
 
 import numpy as np 
 
-Z = nputil.cplane(-7, 7, -3, 3, steps=300)
-FZ = np.sin(Z)
+CS = (-7, 7, -3, 3)
 
 @plot2d 
 def plot(plotter):
-    plotter.cs = (np.min(np.real(Z)), 
-                  np.min(np.max(Z)), 
-                  np.min(np.imag(Z)), 
-                  np.max(np.imag(Z)))
-    maxf = np.max(plotter.cs)
+    plotter.cs = CS
+    maxf = np.max(np.abs(CS))
     plotter += FragmentGraph(
         domain={
-            'zs': domain.sarray(FZ),
+            # the complex plane is computed within the shader,
+            # it is not uploaded as a texture.
+            'z':  domain.GridDomain(CS),
             'c':  domain.colorwheel('homer')
         },
         # note that tuple conversion is required since
@@ -24,12 +22,15 @@ def plot(plotter):
         # change).
         cs=tuple(plotter.cs),
 
-        # use c domain as colorwheel
-        fragment_kernel="""vec4 fragment_kernel(vec2 z) {
+        # sin(z) = sin(x)cosh(y) + i cos(x)sinh(y), the c domain 
+        # is used as colorwheel
+        fragment_kernel="""vec4 fragment_kernel(vec2 x) {
             float L = """+str(maxf)+""";
-            vec2 n = $D.zs(z) / (2*L) + vec2(0.5);
+            vec2 z = $D.z(x);
+            vec2 fz = vec2(sin(z.x)*cosh(z.y), cos(z.x)*sinh(z.y));
+            vec2 n = fz / (2*L) + vec2(0.5);
             return vec4($D.c(n), 1);
         }""")
 
 if __name__ == '__main__':
-    plot()
\ No newline at end of file
+    plot()
@@ -0,0 +1,44 @@
+#-*- coding: utf-8 -*-
+"""
+example appends 1000 samples per second to a ring buffer
+domain. only the new samples are uploaded each tick. the 
+x axis sweeps like an oscilloscope, the newest samples 
+overwrite the oldest ones.
+
+:author: keksnicoh
+"""
+
+from gpupy.plot import plot2d
+from gpupy.plot.domain import StreamingVertexDomain
+from gpupy.plot.graph.glprimitives import GlPrimitivesGraph
+
+import numpy as np
+from time import time
+
+RATE = 1000
+CAPACITY = 10 * RATE
+
+@plot2d
+def plot(plotter):
+    stream = StreamingVertexDomain(CAPACITY, np.dtype((np.float32, 2)))
+    plotter += GlPrimitivesGraph(stream, mode='points', kernel="""vec2 kernel() {
+        $size = 2;
+        $color = vec4(0, 0, 1, 1);
+        return $D.domain;
+    }""")
+
+    t0 = time()
+    state = {'n': 0}
+    def tick():
+        n = int((time() - t0) * RATE)
+        t = np.arange(state['n'], n, dtype=np.float32) / RATE
+        state['n'] = n
+
+        # sweep over the window of the last 10 seconds
+        x = np.mod(t, CAPACITY / RATE) / (CAPACITY / RATE) * 2 - 1
+        y = np.sin(2 * np.pi * t) + 0.1 * np.random.randn(len(t))
+        stream.append(np.dstack((x, y))[0])
+    plotter.on_tick.append(tick)
+
+if __name__ == '__main__':
+    plot()
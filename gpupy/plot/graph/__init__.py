@@ -12,6 +12,7 @@ not defined yet. still in experiment.
 
 from gpupy.gl.lib import attributes
 from gpupy.gl import components, Program, Shader, GPUPY_GL as G_
+from gpupy.gl.watcher import default_watcher
 from gpupy.plot.domain import safe_name
 from OpenGL.GL import * 
 
@@ -30,6 +31,9 @@ class DomainGraph(components.widgets.Widget):
     resolution = attributes.VectorAttribute(2, (1, 1))
     viewport = attributes.VectorAttribute(2, (1, 1))
 
+    # configuration space of the plot, bound by the plotter
+    plot_cs = attributes.VectorAttribute(4, (0, 1, 0, 1))
+
     def __init__(self, domain=None):
         """
         initializes the graph with one or many domains. 
@@ -38,6 +42,7 @@ class DomainGraph(components.widgets.Widget):
         """
         super().__init__()
         self.domains = OrderedDict()
+        self._version = 0
 
         if isinstance(domain, dict):
             for k, v in domain.items():
@@ -48,11 +53,35 @@ class DomainGraph(components.widgets.Widget):
 
     def __setitem__(self, key, domain):
         """
-        adds a domain to the graph
+        adds a domain to the graph. domains might be
+        added or replaced after the graph was initialized.
         """
         safe_name(key)
         domain.requires(list(self.domains.keys()))
         self.domains[key] = _DomainInfo(domain, 'd_{}'.format(key))
+        self.damage()
+        self._domains_changed()
+
+    def _domains_changed(self):
+        """ invoked after the domain composition changed. 
+            initialized graphs switch to the program of the
+            new composition. """
+        pass
+
+    def domain_signature(self):
+        """
+        hashable signature of the glsl code the domains contribute
+        to the programs of the graph. graphs link one program for 
+        each kernel and signature.
+        """
+        signature = []
+        for name, _d in self.domains.items():
+            domain = _d.domain
+            signature.append((name, 
+                tuple(tuple(i) for i in _d.glsl_identifier),
+                domain.glsl_declr(upref=_d.prefix) if hasattr(domain, 'glsl_declr') else None,
+                domain.glsl_attributes(_d.prefix) if hasattr(domain, 'glsl_attributes') else None))
+        return tuple(signature)
 
 
     def __getitem__(self, key):
@@ -61,6 +90,32 @@ class DomainGraph(components.widgets.Widget):
         """
         return self.domains[key].domain
 
+    def damage(self):
+        """
+        forces the plot to redraw the graph, e.g. after
+        state was changed which the graph cannot observe.
+        """
+        self._version += 1
+
+    @property
+    def program_version(self):
+        """ version of the uniforms of the current program """
+        program = getattr(self, 'program', None)
+        return program.version if program is not None else None
+
+    @property
+    def state_version(self):
+        """
+        version vector of the graph inputs. the plotter redraws 
+        the graph if the vector changes. None means that the graph
+        must be redrawn within each frame. program uniforms set 
+        e.g. by on_tick listeners are part of the version.
+        """
+        if any(d.domain.volatile for d in self.domains.values()):
+            return None
+        return (self._version, self.program_version) \
+             + tuple(d.domain.version for d in self.domains.values())
+
 
     def get_domain_glsl_substitutions(self):
         """
@@ -80,15 +135,16 @@ class DomainGraph(components.widgets.Widget):
         return domain_sfnames
 
 
-    def _enable_domain_attrib_pointers(self):
+    def _enable_domain_attrib_pointers(self, program=None):
         """
         enable all vertex attribute pointers
         from domains
         """
+        program = program or self.program
         for domain_info in self.domains.values():
             domain = domain_info.domain
             if hasattr(domain, 'attrib_pointers'):
-                domain.attrib_pointers(domain_info.prefix, self.program.attributes)
+                domain.attrib_pointers(domain_info.prefix, program.attributes)
 
 class _DomainInfo():
     def __init__(self, domain, prefix):
@@ -105,13 +161,19 @@ class DomainProgram(Program):
     def __init__(self, vrt_file=None, frg_file=None):
         super().__init__()
         if vrt_file is not None:
-            vert_path = os.path.join(os.path.dirname(__file__), vrt_file)
-            vert_shader = Shader(GL_VERTEX_SHADER, open(vert_path).read())
-            self.shaders.append(vert_shader)
+            self._append_file_shader(GL_VERTEX_SHADER, vrt_file)
         if frg_file is not None:
-            frag_path = os.path.join(os.path.dirname(__file__), frg_file)
-            frag_shader = Shader(GL_FRAGMENT_SHADER, open(frag_path).read())
-            self.shaders.append(frag_shader)
+            self._append_file_shader(GL_FRAGMENT_SHADER, frg_file)
+
+    def _append_file_shader(self, gl_type, file):
+        path = os.path.join(os.path.dirname(__file__), file)
+        with open(path) as f:
+            shader = Shader(gl_type, f.read())
+        self.shaders.append(shader)
+
+        # relinks the program if the file changes
+        if G_.WATCH_SHADERS:
+            default_watcher().watch(path, shader, self)
 
     def prepare_domains(self, domains):
         
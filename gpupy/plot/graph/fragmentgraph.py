@@ -14,13 +14,32 @@ from gpupy.plot import domain, plotter2d
 
 from gpupy.gl.mesh import StridedVertexMesh, mesh3d_rectangle
 from gpupy.gl.lib import attributes
-from gpupy.gl import GPUPY_GL as G_, Shader, components
+from gpupy.gl import GPUPY_GL as G_, Shader, Texture2D, Framebuffer, create_program, components
 from gpupy.gl.glsl import Template
 
 from OpenGL.GL import *
 import numpy as np
 
 class FragmentGraph(DomainGraph):
+    """
+    evaluates a fragment kernel for each pixel of the 
+    configuration space **cs**. 
+
+    the result is cached in an offscreen texture which is 
+    composited as long as the cs, the plot cs, the resolution,
+    the kernel and the versions of the domains did not change.
+    graphs with volatile domains (e.g. RandomDomain(timeseed=True))
+    are not cached unless **cache** is True, then the texture 
+    is refreshed by invalidate() only. **cache** False disables
+    the cache.
+
+    cached graphs are refined progressively. after a change the
+    kernel is evaluated at the first scale of **refinement** 
+    (relative to the plot resolution) and upscaled. once the view 
+    was idle for **idle_frames** frames, the next scales are 
+    rendered in tiles of **tile_size** pixels, **tiles_per_frame**
+    tiles per frame. scales > 1 supersample the kernel. 
+    """
 
     DEFAULT_FRAGMENT_KERNEL = """
         vec4 fragment_kernel(vec2 txcoord) {
@@ -39,7 +58,19 @@ class FragmentGraph(DomainGraph):
 
     def __init__(self, domain=None, 
                        cs=None, 
-                       fragment_kernel=None):
+                       fragment_kernel=None,
+                       cache=None,
+                       refinement=(0.25, 1, 2),
+                       idle_frames=4,
+                       tile_size=256,
+                       tiles_per_frame=4):
+
+        # one program and mesh for each kernel and domain
+        # composition, see _use_program().
+        self.mesh = None
+        self.program = None 
+        self._programs = None
+        self._meshes = {}
 
         super().__init__(domain)
 
@@ -52,18 +83,190 @@ class FragmentGraph(DomainGraph):
         else:
             self.fragment_kernel = fragment_kernel
 
-        self.mesh = None
-        self.program = None 
         self._fkernel_template = None
 
+        self.cache = cache
+        self.refinement = tuple(refinement)
+        if not len(self.refinement):
+            raise ValueError('at least one refinement scale required')
+        self.idle_frames = idle_frames
+        self.tile_size = tile_size
+        self.tiles_per_frame = tiles_per_frame
+
+        # (framebuffer, texture) for each refinement scale
+        self._levels = [None] * len(self.refinement)
+        self._composite = None
+        self._cache_key = None
+
+        # the scale which is composited, the scale which is 
+        # rendered and its remaining tiles.
+        self._level = None
+        self._refining = None
+        self._tiles = []
+        self._idle = 0
+
     def init(self):
-        self._build_kernel()
-        self.program = self._build_shader()
-        self.mesh = StridedVertexMesh(mesh3d_rectangle(), 
-                                      GL_TRIANGLES, 
-                                      attribute_locations=self.program.attributes)
+        self._programs = {}
+        self._use_program()
+
+    def _use_program(self):
+        """ switches to the program of the current fragment kernel
+            and domain composition. each program is linked once, 
+            switching back to a known kernel is a lookup. """
+        key = (self.fragment_kernel, self.domain_signature())
+        if key not in self._programs:
+            self._build_kernel()
+            program = self._build_shader()
+            program.on_relink.append(self._init_mesh)
+            self._programs[key] = program
+            self._init_mesh(program)
+        self.program = self._programs[key]
+        self.mesh = self._meshes[self.program]
+        self.invalidate()
         self.on_tick.once(self.sync_gpu)
 
+    def _domains_changed(self):
+        if self._programs is not None:
+            self._use_program()
+
+    @fragment_kernel.on_change
+    def _fragment_kernel_changed(self, *e):
+        if self._programs is not None:
+            self._use_program()
+
+    def _init_mesh(self, program):
+        # attribute locations might have changed
+        if program in self._meshes:
+            self._meshes[program].delete()
+        self._meshes[program] = StridedVertexMesh(mesh3d_rectangle(), 
+                                                  GL_TRIANGLES, 
+                                                  attribute_locations=program.attributes)
+        if program is self.program:
+            self.mesh = self._meshes[program]
+        self.invalidate()
+
+    # -- render cache
+
+    @property
+    def cached(self):
+        """ whether the output of the graph is cached """
+        if self.cache is None:
+            return not any(d.domain.volatile for d in self.domains.values())
+        return bool(self.cache)
+
+    def invalidate(self):
+        """ forces the kernel to be evaluated within the next render """
+        self._cache_key = None
+        self.damage()
+
+    @property
+    def state_version(self):
+        if not self.cached:
+            return super().state_version
+
+        # keep redrawing until the finest level was rendered
+        if self._level is None or self._level < len(self.refinement) - 1:
+            return None
+        return (self._version, self._cache_version())
+
+    def _cache_version(self):
+        """ version vector of all inputs of the kernel """
+        return (tuple(self.cs.values), 
+                tuple(self.plot_cs.values), 
+                self._cache_resolution(),
+                self.fragment_kernel,
+                self.program_version,
+                tuple(d.domain.version for d in self.domains.values()))
+
+    def _cache_resolution(self, scale=1):
+        return tuple(max(1, int(np.ceil(v * scale))) for v in self.resolution.values)
+
+    def _level_target(self, level):
+        """ returns the framebuffer and the texture of a
+            refinement level sized to the current resolution """
+        resolution = self._cache_resolution(self.refinement[level])
+        if self._levels[level] is None:
+            texture = Texture2D.empty((*resolution, 4), np.float32)
+            texture.interpolation_linear()
+            framebuffer = Framebuffer()
+            framebuffer.color_attachment(texture)
+            self._levels[level] = (framebuffer, texture)
+        framebuffer, texture = self._levels[level]
+        if tuple(texture.size) != resolution:
+            texture.resize(resolution)
+        return framebuffer, texture
+
+    def _level_tiles(self, level):
+        w, h = self._cache_resolution(self.refinement[level])
+        t = self.tile_size
+        return [(x, y, min(t, w - x), min(t, h - y)) 
+                for y in range(0, h, t) for x in range(0, w, t)]
+
+    def _render_level(self, level, tiles=None):
+        """ renders premultiplied into the texture of **level**. 
+            if **tiles** is given, only those rectangles are 
+            rendered. """
+        # creating the target binds its framebuffer, the
+        # current state must be read before.
+        draw_fbo = glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING)
+        viewport = glGetIntegerv(GL_VIEWPORT)
+        clear_color = glGetFloatv(GL_COLOR_CLEAR_VALUE)
+
+        framebuffer, texture = self._level_target(level)
+
+        framebuffer.use()
+        glViewport(0, 0, *texture.size[0:2])
+        glClearColor(0, 0, 0, 0)
+        glBlendFuncSeparate(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+        if tiles is None:
+            glClear(GL_COLOR_BUFFER_BIT)
+            self._draw()
+        else:
+            glEnable(GL_SCISSOR_TEST)
+            for tile in tiles:
+                glScissor(*tile)
+                glClear(GL_COLOR_BUFFER_BIT)
+                self._draw()
+            glDisable(GL_SCISSOR_TEST)
+
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, draw_fbo)
+        glViewport(*viewport)
+        glClearColor(*clear_color)
+
+    def _refine(self):
+        """ renders the next tiles of the next refinement level """
+        if self._refining is None:
+            self._refining = self._level + 1
+            self._tiles = self._level_tiles(self._refining)
+
+        tiles = self._tiles[:self.tiles_per_frame]
+        self._tiles = self._tiles[self.tiles_per_frame:]
+        self._render_level(self._refining, tiles)
+
+        if not self._tiles:
+            self._level = self._refining
+            self._refining = None
+
+    def _composite_cache(self):
+        """ draws the texture of the current level scaled to
+            the viewport """
+        if self._composite is None:
+            program = create_program(vertex=_GLSL_CACHE_VRT, fragment=_GLSL_CACHE_FRG)
+            mesh = StridedVertexMesh(mesh3d_rectangle(), GL_TRIANGLES, 
+                                     attribute_locations=program.attributes)
+            self._composite = (program, mesh)
+        program, mesh = self._composite
+        framebuffer, texture = self._levels[self._level]
+
+        texture.bind(unit=0)
+        program.uniform('cache', texture)
+        program.uniform('resolution', self._cache_resolution())
+        glBlendFunc(GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+        program.use()
+        mesh.draw()
+        program.unuse()
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
     @cs.on_change
     def _properties_changed(self, *e):
         self.on_tick.once(self.sync_gpu)
@@ -100,12 +303,32 @@ class FragmentGraph(DomainGraph):
         self.program.uniform('cs_size', (np.abs(cs[1]-cs[0]), np.abs(cs[3]-cs[2])))
 
     def render(self):
+        if not self.cached:
+            glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+            self._draw()
+            return
+
+        glEnable(GL_BLEND)
+        key = self._cache_version()
+        if key != self._cache_key:
+            # the view changed, start again at the coarsest level
+            self._render_level(0)
+            # rendering assigns the domain uniforms of the program
+            # for the first time, the key is taken afterwards.
+            self._cache_key = self._cache_version()
+            self._level = 0
+            self._refining = None
+            self._idle = 0
+        elif self._level < len(self.refinement) - 1:
+            self._idle += 1
+            if self._idle >= self.idle_frames:
+                self._refine()
+        self._composite_cache()
+
+    def _draw(self):
         # enable all domains
         domain.enable_domains(self.program, self.domains.items())
 
-        # blending 
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-
         # draw mesh
         self.program.use()
         self.mesh.draw()
@@ -153,6 +376,25 @@ class FragmentGraph(DomainGraph):
             raise RuntimeError(msg.format(ckrn, ckrn_args, ckrn_kwargs))
         return ckrn
 
+# composites the cache texture scaled to the current viewport
+_GLSL_CACHE_VRT = """
+{% version %}
+in vec4 vertex;
+void main() {
+    gl_Position = vec4(2*vertex.xy - 1, 0, 1);
+}
+"""
+
+_GLSL_CACHE_FRG = """
+{% version %}
+uniform sampler2D cache;
+uniform vec2 resolution;
+out vec4 frag_color;
+void main() {
+    frag_color = texture(cache, gl_FragCoord.xy / resolution);
+}
+"""
+
 #XXX rescue some old stufff
 #
 #    'greyscale_avg': """
@@ -8,11 +8,11 @@ from . import DomainGraph, DomainProgram
 from gpupy.plot import domain, plotter2d
 
 from gpupy.gl.lib import attributes
-from gpupy.gl import GPUPY_GL as G_, Shader, components
+from gpupy.gl import GPUPY_GL as G_, Shader, ProgramVariants, components
 from OpenGL.GL import (
     GL_VERTEX_SHADER, GL_FRAGMENT_SHADER, glEnable, glBindVertexArray,
     GL_PROGRAM_POINT_SIZE, glBindVertexArray, glDrawArrays,
-    glGenVertexArrays, GL_POINTS, GL_LINES, GL_LINE_STRIP)
+    glGenVertexArrays, glDeleteVertexArrays, GL_POINTS, GL_LINES, GL_LINE_STRIP)
 from gpupy.gl.glsl import Template
 
 import os 
@@ -25,9 +25,30 @@ class GlPrimitivesGraph(DomainGraph):
         }
     """
 
-    def __init__(self, domain=None, kernel=None, mode="points", offset=0, length=None):
+    MODES = {'points':   GL_POINTS,
+             'lines':    GL_LINE_STRIP,
+             'segments': GL_LINES}
+
+    def __init__(self, domain=None, kernel=None, mode="points", offset=0, length=None, cull=None):
+        """
+        **cull** restricts the drawn range to the visible part of
+        the plot if the x column of the domain is monotonic. by
+        default only graphs using the default kernel are culled 
+        since a custom kernel might transform x.
+        """
+        # one program variants cache for each kernel and domain 
+        # composition, one vao per linked program
+        self.program = None
+        self._variants = None
+        self._variants_key = None
+        self._vaos = {}
+        self._vao_buffers = {}
+
         super().__init__(domain)
         self.kernel = kernel or self.DEFAULT_KERNEL
+        self.cull = (self.kernel == self.DEFAULT_KERNEL and length is None) if cull is None else cull
+        self._cull_required = self.cull
+        self.plot_cs.on_change.append(self._plot_cs_changed)
 
         self.resolution.on_change.append(self._properties_changed)
         self.viewport.on_change.append(self._properties_changed)
@@ -39,22 +60,68 @@ class GlPrimitivesGraph(DomainGraph):
         self.offset = offset
         self.length = length
 
-        valid_modes = {'points': GL_POINTS,
-                       'lines': GL_LINE_STRIP,
-                       'segments': GL_LINES}
-        if not mode in valid_modes:
+        self._mode = None
+        self.mode = mode
+
+    @property
+    def kernel(self):
+        return self._kernel
+
+    @kernel.setter
+    def kernel(self, kernel):
+        """ switches the kernel. the programs of a kernel are 
+            linked once and reused if the kernel is assigned again. """
+        self._kernel = kernel
+        if self._variants is not None:
+            self._use_variant()
+
+    @property
+    def mode(self):
+        return self._mode
+
+    @mode.setter
+    def mode(self, mode):
+        """ switches the render mode. each mode is a program 
+            variant which is linked once on first use. """
+        if not mode in self.MODES:
             raise ValueError('invalid mode "{}". Must be "points", "lines" or "segments"'.format(mode))
-        self.gl_mode = valid_modes[mode]
+        self._mode = mode
+        self.gl_mode = self.MODES[mode]
+        if self._variants is not None:
+            self._use_variant()
 
 
     def _properties_changed(self, *e):
         self.on_tick.once(self.sync_gpu)
 
+    @property
+    def state_version(self):
+        version = super().state_version
+        if version is None:
+            return None
+        return version + (self.mode, self.offset, self.length)
+
+
+    def _plot_cs_changed(self, *e):
+        self._cull_required = self.cull
+
+
+    def cull_range(self):
+        """ restricts offset and length to the samples within
+            the x interval of the plot configuration space. """
+        self._cull_required = False
+        cs = self.plot_cs
+        for _d in self.domains.values():
+            if hasattr(_d.domain, 'visible_range'):
+                visible = _d.domain.visible_range(cs[0], cs[1])
+                if visible is not None:
+                    self.set_range(*visible)
+                    return
+
 
     def init(self): 
-        self._build_kernel()
-        self.program = self._create_program()
-        self._init_vao()
+        self._variants = {}
+        self._use_variant()
 
         # if no custom length detect the length
         # once on the first tick.
@@ -65,12 +132,37 @@ class GlPrimitivesGraph(DomainGraph):
     def set_range(self, offset=0, length=None):
         if length is None:
             for dname, _d in self.domains.items():
-                if hasattr(_d.domain, 'attrib_pointers'):
+                # vertex buffers and procedural domains (e.g. 
+                # LinspaceDomain) know their length
+                if hasattr(_d.domain, '__len__'):
                     length = len(_d.domain)
+            self._cull_required = self.cull
         self.offset = offset
         self.length = length
 
 
+    def _draw_ranges(self):
+        """ returns the (offset, length) ranges to draw. streaming 
+            domains define their own ranges, e.g. a wrapped ring 
+            buffer is drawn by two ranges. """
+        for _d in self.domains.values():
+            if hasattr(_d.domain, 'draw_ranges'):
+                return _d.domain.draw_ranges(connected=self.gl_mode == GL_LINE_STRIP, 
+                                             cs=self.plot_cs.values, 
+                                             resolution=self.resolution.values,
+                                             cull=self.cull)
+        return [(self.offset, self.length)]
+
+
+    def _batched_domain(self):
+        """ returns the domain info of an out of core domain which
+            draws by batches of buffers (e.g. MemmapVertexDomain) """
+        for _d in self.domains.values():
+            if hasattr(_d.domain, 'draw_batches'):
+                return _d
+        return None
+
+
     def _build_kernel(self):
         context = self.get_domain_glsl_substitutions()
         kernel = Template(self.kernel, context)
@@ -80,6 +172,32 @@ class GlPrimitivesGraph(DomainGraph):
         self._kernel_template = kernel
 
 
+    def _variant_defines(self):
+        return {'POINT_MODE': self.gl_mode == GL_POINTS}
+
+
+    def _domains_changed(self):
+        if self._variants is not None:
+            self._use_variant()
+
+    def _use_variant(self):
+        """ switches to the program of the current kernel, domain
+            composition and mode. each program is linked on first use. """
+        key = (self.kernel, self.domain_signature())
+        if key != self._variants_key:
+            self._build_kernel()
+            self._variants_key = key
+        if key not in self._variants:
+            self._variants[key] = ProgramVariants(self._create_program, 
+                                                  on_link=self._program_linked)
+        self.program = self._variants[key].get(self._variant_defines())
+        if self._vao_outdated(self.program):
+            self._program_relinked(self.program)
+        self.vao = self._vaos[self.program]
+        self._properties_changed()
+        self.damage()
+
+
     def _create_program(self):
         prg = DomainProgram(vrt_file='glprimitives.vrt.glsl', 
                             frg_file='glprimitives.frg.glsl') 
@@ -90,32 +208,79 @@ class GlPrimitivesGraph(DomainGraph):
         prg.get_shader(GL_VERTEX_SHADER).substitutions.update({
             'vrt_kernl': self._kernel_template.render()})
         prg.prepare_domains(self.domains)
-        prg.link()
-        
+
+        return prg 
+
+
+    def _program_linked(self, prg):
         prg.uniform_block_binding('plot',   G_.CONTEXT.buffer_base('gpupy.plot.plotter2d'))
         prg.uniform_block_binding('camera', G_.CONTEXT.buffer_base('gpupy.gl.camera'))
+        prg.on_relink.append(self._program_relinked)
 
-        return prg 
 
+    def _program_relinked(self, prg):
+        # attribute locations might have changed 
+        if prg in self._vaos:
+            glDeleteVertexArrays(1, [self._vaos[prg]])
+        self._vaos[prg] = self._init_vao(prg)
+        if prg is self.program:
+            self.vao = self._vaos[prg]
 
-    def _init_vao(self):
-        self.vao = glGenVertexArrays(1)
-        glBindVertexArray(self.vao)
-        self._enable_domain_attrib_pointers()
+
+    def _init_vao(self, program):
+        vao = glGenVertexArrays(1)
+        glBindVertexArray(vao)
+        self._enable_domain_attrib_pointers(program)
         glBindVertexArray(0)
+        self._vao_buffers[program] = self._vertex_buffers()
+        return vao
+
+
+    def _vao_outdated(self, program):
+        """ whether the vao of **program** points to other buffers
+            than the vertex domains hold """
+        buffers = self._vao_buffers.get(program)
+        current = self._vertex_buffers()
+        return buffers is None \
+            or len(buffers) != len(current) \
+            or any(a is not b for a, b in zip(current, buffers))
+
+
+    def _vertex_buffers(self):
+        """ the buffers the vaos point to """
+        return tuple(_d.domain.buffer for _d in self.domains.values() 
+                     if isinstance(_d.domain, domain.VertexDomain))
 
 
     def sync_gpu(self):
-        self.program.uniform('u_resolution', self.resolution.xy)
-        self.program.uniform('u_viewport',   self.viewport.xy)
+        # only the POINT_MODE variant scales the point size
+        if self.gl_mode == GL_POINTS:
+            self.program.uniform('u_resolution', self.resolution.xy)
+            self.program.uniform('u_viewport',   self.viewport.xy)
 
 
     def render(self):
+        if self._vao_outdated(self.program):
+            # another buffer was assigned to a vertex domain
+            self._program_relinked(self.program)
+        if self._cull_required:
+            self.cull_range()
         domain.enable_domains(self.program, self.domains.items())
 
         glEnable(GL_PROGRAM_POINT_SIZE)
         self.program.use()
         glBindVertexArray(self.vao)
-        glDrawArrays(self.gl_mode, self.offset, self.length)
+        batched = self._batched_domain()
+        if batched is None:
+            for offset, length in self._draw_ranges():
+                glDrawArrays(self.gl_mode, offset, length)
+        else:
+            batches = batched.domain.draw_batches(connected=self.gl_mode == GL_LINE_STRIP, 
+                                                  cs=self.plot_cs.values, 
+                                                  resolution=self.resolution.values,
+                                                  cull=self.cull)
+            for buffer, offset, length in batches:
+                batched.domain.attrib_pointers(batched.prefix, self.program.attributes, buffer)
+                glDrawArrays(self.gl_mode, offset, length)
         glBindVertexArray(0)
         self.program.unuse()
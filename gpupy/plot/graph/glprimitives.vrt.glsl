@@ -2,8 +2,10 @@
 {% uniform_block camera %}
 {% uniform_block plot %}
 
+#ifdef POINT_MODE
 uniform vec2 u_resolution;
 uniform vec2 u_viewport;
+#endif
 uniform vec4 u_col = vec4(1, 0, 0, 1);
 uniform float ticker_test = 0;
 ${glsl_attr}
@@ -28,9 +30,11 @@ void main() {
     gl_PointSize = 1;
     gl_Position = cs(kernel());
 
+#ifdef POINT_MODE
     // adjust pointsize to resolution
     float f = u_resolution.x/u_viewport.x;
     if (gl_PointSize*f > 1) {
         gl_PointSize *= f;
     }
+#endif
 }
\ No newline at end of file
@@ -15,4 +15,50 @@ def cplane(x0=-1, x1=1, i0=-1, i1=1, steps=500):
     axis_r = np.linspace(x0, x1, steps)
     axis_i = np.linspace(i0, i1, steps)
     r, i = np.meshgrid(axis_r, axis_i)
-    return r + i*1j
\ No newline at end of file
+    return r + i*1j
+
+def minmax_decimate(data, bucket=16):
+    """
+    decimates a (n, 2) series of (x, y) samples. each bucket of 
+    **bucket** samples is reduced to its first, minimum, maximum
+    and last sample in the original order, so a line strip of the
+    result has the same extrema as the full series (M4 aggregation).
+
+    returns an array of shape (4*ceil(n/bucket), 2). the last bucket
+    is padded by repeating its last sample.
+    """
+    data = np.asarray(data)
+    if len(data.shape) != 2 or data.shape[1] != 2:
+        raise ValueError('data must have shape (n, 2), {} given'.format(data.shape))
+    if bucket < 4:
+        raise ValueError('bucket must be at least 4')
+
+    n = len(data)
+    nbuckets = -(-n // bucket)
+    index = np.arange(nbuckets * bucket).reshape((nbuckets, bucket))
+    index = np.minimum(index, n - 1)
+
+    y = data[index, 1]
+    m4 = np.empty((nbuckets, 4), dtype=np.intp)
+    m4[:, 0] = index[:, 0]
+    m4[:, 1] = index[np.arange(nbuckets), np.argmin(y, axis=1)]
+    m4[:, 2] = index[np.arange(nbuckets), np.argmax(y, axis=1)]
+    m4[:, 3] = index[:, -1]
+    m4.sort(axis=1)
+    return data[m4.reshape(-1)]
+
+def minmax_pyramid(data, min_length=4096, factor=4):
+    """
+    creates levels of detail of a (n, 2) series. level 0 is the 
+    series itself, each further level has about **factor** times 
+    less samples than the previous one. levels are created until 
+    a level has less than **min_length** samples. 
+
+    since the first, min, max and last samples of a bucket are 
+    kept, the decimation of a level is the decimation of the 
+    original series with a bucket factor times larger.
+    """
+    levels = [np.asarray(data)]
+    while len(levels[-1]) >= max(min_length, 4 * factor):
+        levels.append(minmax_decimate(levels[-1], 4 * factor))
+    return levels
@@ -12,6 +12,8 @@ from gpupy.gl.lib import Event, attributes, observables
 from gpupy.gl.lib.vector import *
 from gpupy.gl import *
 from gpupy.gl import GPUPY_GL as _G
+from gpupy.gl.watcher import default_watcher
+from gpupy.gl.reduction import default_reduction, ReductionResult
 
 from OpenGL.GL import * 
 
@@ -162,10 +164,22 @@ class Plotter2d(Widget):
         self._graphs = []
         self._graphs_initialized = False
 
+        # pending autoscale reduction, see autoscale()
+        self._autoscale = None
+
+        # damage tracking. the graphs are only rendered into the
+        # plotframe if the plot was damaged or the state version
+        # of a graph changed, see tick().
+        self._damaged = True
+        self._graph_versions = None
+
         self._init()
+        self.cs.on_change.append(self.damage)
+        self.axes_unit.on_change.append(self.damage)
+        self.layer.content_size.on_change.append(self.damage)
+        self.plotframe.resulution.on_change.append(self.damage)
         self.a = False
         self.last_fr = False
-        self.on_plot.once(self.init_graphs)
 
         self.cmc = [
             [1, 0, 0, 1],
@@ -181,19 +195,82 @@ class Plotter2d(Widget):
     def init_graphs(self):
         for graph in self._graphs:
             graph.init()
+            graph.resolution = self.plotframe.resulution
+            graph.viewport = self.plotframe.resulution
         self._graphs_initialized = True
 
     def append(self, graph):
         self._graphs.append(graph)
+        self._bind_graph(graph)
+        self.damage()
         if self._graphs_initialized:
             graph.init()
             graph.resolution = self.plotframe.resulution
             graph.viewport = self.plotframe.resulution
+
+    @property
+    def graphs(self):
+        return tuple(self._graphs)
+
+    def _bind_graph(self, graph):
+        """ graphs observe the configuration space of the plot """
+        if hasattr(graph, 'plot_cs'):
+            graph.plot_cs = self.cs
         
     def __iadd__(self, graph):
         self.append(graph)
         return self
 
+    # -- damage tracking
+
+    def damage(self, *e):
+        """ forces the graphs to be rendered within the next tick """
+        self._damaged = True
+
+    def _redraw_required(self, versions):
+        # on_plot listeners might draw into the plotframe
+        return self._damaged \
+            or len(self.on_plot) \
+            or None in versions \
+            or versions != self._graph_versions
+
+    # -- autoscale
+
+    def autoscale(self, domain, margin=0.05, wait=False):
+        """ fits the configuration space to the bounds of a
+            vertex domain (or BufferObject) with (x, y) data.
+            the bounds of the valid rows (see data_ranges() of 
+            the domain) are reduced on the gpu. by default the
+            cs is updated within the first tick after the result
+            is available, so the render loop never stalls. 
+            out of core domains compute their bounds() on the 
+            host. """
+        if hasattr(domain, 'bounds'):
+            result = domain.bounds()
+        else:
+            buffer = getattr(domain, 'buffer', domain)
+            ranges = domain.data_ranges() if hasattr(domain, 'data_ranges') else None
+            result = default_reduction().bounds(buffer, ranges=ranges)
+        self._autoscale = (result, margin)
+        if wait:
+            self._apply_autoscale(block=True)
+
+    def _apply_autoscale(self, block=False):
+        result, margin = self._autoscale
+        if isinstance(result, ReductionResult):
+            if not block and not result.ready():
+                return
+            result = result.get()
+        self._autoscale = None
+
+        lower, upper = result
+        if len(lower) < 2:
+            raise ValueError('autoscale requires (x, y) data')
+        size = np.maximum(upper[:2] - lower[:2], 1e-6)
+        lower = lower[:2] - margin * size
+        upper = upper[:2] + margin * size
+        self.cs = (lower[0], upper[0], lower[1], upper[1])
+
     # -- init
 
     def _init(self):  
@@ -229,6 +306,10 @@ class Plotter2d(Widget):
             transformation=grid, 
             observables=(self.axes_unit, self.cs))
 
+        # the observable is kept such that the grid can be 
+        # reattached after it was overridden (see gpupy.plot.tiled)
+        self.major_grid = major_grid
+
         self.grid = CartesianGrid(
             size                = self.layer.content_size,
             position            = self.layer.content_position,
@@ -276,6 +357,10 @@ class Plotter2d(Widget):
         self.layer.content_size.on_change.append(self.update_ubo)
 
     def tick(self):
+        if _G.WATCH_SHADERS:
+            default_watcher().poll()
+        if self._autoscale is not None:
+            self._apply_autoscale()
         self.on_tick()
 
         # -- tick the components
@@ -284,16 +369,34 @@ class Plotter2d(Widget):
         self.grid.tick()
         self.plotframe.tick()
 
+        # on_tick listeners of the graphs might change their
+        # state, e.g. animated uniforms. graphs must be initialized
+        # before their listeners run.
+        if not self._graphs_initialized:
+            self.init_graphs()
+        for graph in self._graphs:
+            graph.tick()
+
         # -- graph rendering
+        #
+        # nothing changed, the plotframe texture is composited
+        # by draw() as it is.
+        versions = tuple(graph.state_version for graph in self._graphs)
+        if not self._redraw_required(versions):
+            return
+
         self.plotframe.use()
         self.plotcam.enable()
         self.on_plot()
         self.ubo.bind_buffer_base(GPUPY_GL.CONTEXT.buffer_base('gpupy.plot.plotter2d'))
         for graph in self._graphs:
-            graph.tick()
             graph.render()
         self.plotframe.unuse()
 
+        self._damaged = False
+        self._graph_versions = tuple(graph.state_version for graph in self._graphs)
+        GPUPY_GL.CONTEXT.damage()
+
     def draw(self):
         self.grid.render()
         self.layer.render() 
@@ -0,0 +1,52 @@
+#-*- coding: utf-8 -*-
+"""
+helpers for tests rendering plots into a headless context,
+see gpupy.gl.test.
+
+:author: keksnicoh
+"""
+
+from gpupy.gl.test import HeadlessTestCase
+from gpupy.gl.components.camera import Camera2D
+from gpupy.plot.plotter2d import Plotter2d
+
+from OpenGL.GL import *
+import numpy as np
+
+__all__ = ['PlotTestCase', 'colored']
+
+def colored(image, background):
+    """ returns a mask of the pixels of **image** which differ
+        from the **background** rgba color (floats in [0, 1]) """
+    background = np.round(np.asarray(background) * 255)
+    return np.any(np.abs(image.astype(np.int32) - background) > 2, axis=2)
+
+class PlotTestCase(HeadlessTestCase):
+    """ test case rendering a Plotter2d of the context size """
+
+    def setUp(self):
+        super().setUp()
+        w, h = self.size
+        self.camera = Camera2D(screensize=self.size, position=(w/2, h/2, 0))
+
+    def create_plotter(self, cs=(0, 1, 0, 1)):
+        return Plotter2d(self.size, cs=cs)
+
+    def plot_widget(self, plotter):
+        def widget():
+            plotter.tick()
+            glClearColor(*plotter.background_color.values)
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            self.camera.enable()
+            plotter.draw()
+            return True
+        return widget
+
+    def render_plot(self, plotter, frames=1):
+        """ renders **frames** frames of **plotter** and returns
+            the pixels of the last frame """
+        return self.render(self.plot_widget(plotter), frames)
+
+    def plot_pixels(self, plotter, image):
+        """ mask of the pixels which differ from the background """
+        return colored(image, plotter.background_color.values)
@@ -0,0 +1,114 @@
+#-*- coding: utf-8 -*-
+"""
+tests of gpupy.plot.domain.
+
+:author: keksnicoh
+"""
+
+from gpupy.gl.test import HeadlessTestCase
+from gpupy.plot.test import PlotTestCase
+from gpupy.plot.domain import VertexDomain, MemmapVertexDomain
+from gpupy.plot.graph.glprimitives import GlPrimitivesGraph
+
+from unittest import mock
+import numpy as np
+import unittest
+
+def series(n):
+    x = np.linspace(0, 1, n)
+    return np.dstack((x, np.sin(50 * x)))[0]
+
+class VertexDomainTest(HeadlessTestCase):
+
+    def test_visible_range(self):
+        domain = VertexDomain(series(100).astype(np.float32))
+        offset, length = domain.visible_range(0.25, 0.5)
+        self.assertEqual(domain.visible_range(0.5, 0.25), (offset, length))
+        self.assertLessEqual(domain.buffer.host[offset, 0], 0.25)
+        self.assertGreaterEqual(domain.buffer.host[offset + length - 1, 0], 0.5)
+
+    def test_x_index_follows_uploads(self):
+        domain = VertexDomain(series(100).astype(np.float32))
+        self.assertIsNotNone(domain.x_index())
+
+        # in place upload, the host array stays the same object
+        domain.buffer.set_subdata(np.float32([[2, 0]]), 10)
+        self.assertIsNone(domain.x_index())
+        domain.buffer.set_subdata(np.float32([[0.1, 0]]), 10)
+        self.assertIsNotNone(domain.x_index())
+
+class MemmapVertexDomainTest(HeadlessTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.domain = MemmapVertexDomain(series(64 * 256), chunk_rows=256, max_chunks=4)
+
+    def tearDown(self):
+        self.domain.delete()
+
+    def batch_x(self, batches):
+        """ x range of the samples of **batches** """
+        x = [b.get()[o:o+l, 0] for b, o, l in batches]
+        return np.min([v[0] for v in x]), np.max([v[-1] for v in x])
+
+    def test_max_chunks(self):
+        for cs in ((0, 1), (0.2, 0.7), (0.5, 0.52), (-1, 2), (0.99, 1.5)):
+            with self.subTest(cs=cs):
+                batches = self.domain.draw_batches(True, cs, (1000, 500))
+                self.assertLessEqual(len(batches), 4)
+                self.assertLessEqual(len(self.domain._chunks), 4)
+                x0, x1 = self.batch_x(batches)
+                self.assertLessEqual(x0, max(0, cs[0]))
+                self.assertGreaterEqual(x1, min(1, cs[1]))
+
+    def test_cull(self):
+        cs = (0.5, 0.52)
+        x0, x1 = self.batch_x(self.domain.draw_batches(True, cs, (1000, 500)))
+        self.assertGreater(x0, 0.45)
+        self.assertLess(x1, 0.55)
+
+        full = self.domain.draw_batches(True, cs, (1000, 500), cull=False)
+        self.assertLessEqual(len(full), 4)
+        self.assertEqual(self.batch_x(full), (0, 1))
+
+    def test_zoom_reuses_pyramids(self):
+        cs = (0.5, 0.52)
+        self.domain.draw_batches(True, cs, (100, 50))
+        self.assertEqual({k[1] for k in self.domain._chunks}, {0})
+
+        # coarser levels are cut from the pyramids of the chunks
+        with mock.patch.object(self.domain, '_read', wraps=self.domain._read) as read:
+            for resolution, level in (((10, 10), 1), ((2, 2), 2)):
+                self.domain.draw_batches(True, cs, resolution)
+                self.assertEqual(list(self.domain._chunks)[-1][1], level)
+            self.assertEqual(read.call_count, 0)
+
+    def test_bounds(self):
+        data = series(64 * 256)
+        self.domain.draw_batches(True, (0.5, 0.52), (1000, 500))
+        read_chunks = len(self.domain._pyramids)
+        with mock.patch.object(self.domain, '_read', wraps=self.domain._read) as read:
+            lower, upper = self.domain.bounds()
+            self.assertEqual(read.call_count, 64 - read_chunks)
+            self.domain.bounds()
+            self.assertEqual(read.call_count, 64 - read_chunks)
+        np.testing.assert_allclose(lower, data.min(axis=0), rtol=1e-6)
+        np.testing.assert_allclose(upper, data.max(axis=0), rtol=1e-6)
+
+class MemmapGraphTest(PlotTestCase):
+
+    def test_render(self):
+        domain = MemmapVertexDomain(series(64 * 256), chunk_rows=256, max_chunks=2)
+        plotter = self.create_plotter(cs=(0, 1, -1.5, 1.5))
+        plotter += GlPrimitivesGraph(domain, mode='lines')
+        image = self.render_plot(plotter, frames=2)
+        self.assertLessEqual(len(domain._chunks), 2)
+
+        # the line reaches from the left to the right
+        columns = np.nonzero(np.any(image[:, :, 0] > 200, axis=0))[0]
+        self.assertLess(columns[0], 0.1 * self.size[0])
+        self.assertGreater(columns[-1], 0.9 * self.size[0])
+        domain.delete()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+#-*- coding: utf-8 -*-
+"""
+smoke tests which render the examples of gpupy.plot.examples
+into a headless context.
+
+:author: keksnicoh
+"""
+
+from gpupy.plot.test import PlotTestCase
+
+from unittest import mock
+import importlib
+import numpy as np
+import sys
+import unittest
+
+# examples defining a plot by the plot2d decorator
+EXAMPLES = ('glprimitives', 'random', 'streaming', 'texture', 'complex_plane')
+
+def load_plot(name):
+    """ imports an example and returns its plot function
+        instead of running it within a glfw window """
+    plots = []
+    module = 'gpupy.plot.examples.{}'.format(name)
+    sys.modules.pop(module, None)
+    with mock.patch('gpupy.plot.plot2d', plots.append):
+        importlib.import_module(module)
+    return plots[0]
+
+class ExamplesTest(PlotTestCase):
+    size = (200, 200)
+
+    def test_examples(self):
+        empty = self.render_plot(self.create_plotter(cs=(-4, 4, -4, 4)))
+        for name in EXAMPLES:
+            with self.subTest(example=name):
+                plotter = self.create_plotter(cs=(-4, 4, -4, 4))
+                load_plot(name)(plotter)
+                image = self.render_plot(plotter, frames=3)
+                changed = np.any(image != empty, axis=2)
+                self.assertGreater(np.count_nonzero(changed), 0)
+
+if __name__ == '__main__':
+    unittest.main()
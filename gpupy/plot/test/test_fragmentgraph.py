@@ -0,0 +1,121 @@
+#-*- coding: utf-8 -*-
+"""
+rendering tests of gpupy.plot.graph.fragmentgraph.
+
+:author: keksnicoh
+"""
+
+from gpupy.plot.test import PlotTestCase
+from gpupy.plot.graph.fragmentgraph import FragmentGraph
+from gpupy.plot.domain import TextureDomain
+
+import numpy as np
+import unittest
+
+RED_KERNEL = """
+    vec4 fragment_kernel(vec2 c) {
+        return vec4(1, 0, 0, 1);
+    }"""
+
+GRADIENT_KERNEL = """
+    vec4 fragment_kernel(vec2 c) {
+        return vec4(c.x, c.y, 0.5 + 0.5 * sin(40 * c.x * c.y), 1);
+    }"""
+
+class FragmentGraphTest(PlotTestCase):
+
+    def create_graph(self, **kwargs):
+        plotter = self.create_plotter()
+        graph = FragmentGraph(cs=(0, 1, 0, 1), **kwargs)
+        plotter += graph
+        return plotter, graph
+
+    def render_graph(self, frames=1, **kwargs):
+        plotter, graph = self.create_graph(**kwargs)
+        return graph, self.render_plot(plotter, frames=frames)
+
+    def test_cached_first_frame(self):
+        for refinement in ((0.25, 1, 2), (1,)):
+            with self.subTest(refinement=refinement):
+                graph, image = self.render_graph(fragment_kernel=RED_KERNEL, refinement=refinement)
+                self.assertTrue(graph.cached)
+                red = (image[:, :, 0] > 200) & (image[:, :, 1] < 50)
+                self.assertGreater(np.count_nonzero(red), image.shape[0] * image.shape[1] // 2)
+
+    def test_refinement(self):
+        plotter, graph = self.create_graph(fragment_kernel=GRADIENT_KERNEL, 
+                                           refinement=(0.25, 1, 2), 
+                                           idle_frames=1, 
+                                           tile_size=64)
+        coarse = self.render_plot(plotter)
+        for i in range(100):
+            if graph.state_version is not None:
+                break
+            image = self.render_plot(plotter)
+            # frames which start a level are not blank
+            self.assertEqual(np.count_nonzero(self.plot_pixels(plotter, image)), 
+                             np.count_nonzero(self.plot_pixels(plotter, coarse)))
+        self.assertEqual(graph._level, 2)
+
+        finest, finest_image = self.render_graph(fragment_kernel=GRADIENT_KERNEL, refinement=(2,))
+        self.assertLessEqual(np.max(np.abs(image.astype(np.int32) - finest_image)), 1)
+        self.assertGreater(np.max(np.abs(coarse.astype(np.int32) - finest_image)), 1)
+
+    def test_cached_uniform(self):
+        plotter, graph = self.create_graph(fragment_kernel="""
+            uniform float red = 0;
+            vec4 fragment_kernel(vec2 c) {
+                return vec4(red, 0, 0, 1);
+            }""", refinement=(1,))
+        black = self.render_plot(plotter, frames=2)
+        self.assertTrue(graph.cached)
+
+        graph.program.uniform('red', 1)
+        red = self.render_plot(plotter)
+        self.assertGreater(np.mean(red[:, :, 0]), np.mean(black[:, :, 0]) + 100)
+
+    def test_switch_kernel(self):
+        plotter, graph = self.create_graph(fragment_kernel=RED_KERNEL, refinement=(1,))
+        red = self.render_plot(plotter, frames=2)
+        program = graph.program
+
+        graph.fragment_kernel = RED_KERNEL.replace('vec4(1, 0, 0, 1)', 'vec4(0, 1, 0, 1)')
+        green = self.render_plot(plotter)
+        self.assertGreater(np.mean(green[:, :, 1]), np.mean(red[:, :, 1]) + 100)
+
+        # known kernels are not linked again
+        graph.fragment_kernel = RED_KERNEL
+        self.assertIs(graph.program, program)
+        np.testing.assert_array_equal(self.render_plot(plotter), red)
+
+    def test_relink_replaces_mesh(self):
+        plotter, graph = self.create_graph(fragment_kernel=RED_KERNEL, refinement=(1,))
+        red = self.render_plot(plotter, frames=2)
+        mesh = graph.mesh
+
+        graph.program.relink()
+        self.assertIsNot(graph.mesh, mesh)
+        self.assertIsNone(mesh.vao)
+        self.assertIsNone(mesh.buffer)
+        np.testing.assert_array_equal(self.render_plot(plotter), red)
+
+    def test_switch_domains(self):
+        plotter = self.create_plotter()
+        rgb = TextureDomain.to_device_2d(np.tile(np.float32((1, 0, 0)), (8, 8, 1)))
+        graph = FragmentGraph(rgb, cs=(0, 1, 0, 1), refinement=(1,))
+        plotter += graph
+        red = self.render_plot(plotter, frames=2)
+        program = graph.program
+
+        # a single channel texture is another composition
+        graph['domain'] = TextureDomain.to_device_2d(np.full((8, 8, 1), 0.5, dtype=np.float32))
+        gray = self.render_plot(plotter)
+        self.assertIsNot(graph.program, program)
+        self.assertFalse(np.array_equal(gray, red))
+
+        graph['domain'] = rgb
+        self.assertIs(graph.program, program)
+        np.testing.assert_array_equal(self.render_plot(plotter), red)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+#-*- coding: utf-8 -*-
+"""
+rendering tests of gpupy.plot.graph.glprimitives.
+
+:author: keksnicoh
+"""
+
+from gpupy.plot.test import PlotTestCase
+from gpupy.plot.domain import VertexDomain, LodVertexDomain
+from gpupy.plot.graph.glprimitives import GlPrimitivesGraph
+
+import numpy as np
+import unittest
+
+def series(n=10000):
+    x = np.linspace(0, 10, n, dtype=np.float32)
+    return np.dstack((x, np.sin(3 * x)))[0]
+
+class GlPrimitivesGraphTest(PlotTestCase):
+
+    def render_graph(self, cs, domain=None, **kwargs):
+        plotter = self.create_plotter(cs=cs)
+        graph = GlPrimitivesGraph(domain or VertexDomain(series()), **kwargs)
+        plotter += graph
+        return graph, self.render_plot(plotter, frames=2)
+
+    def test_modes(self):
+        for mode in ('points', 'lines', 'segments'):
+            with self.subTest(mode=mode):
+                graph, image = self.render_graph((0, 10, -2, 2), mode=mode)
+                self.assertGreater(np.count_nonzero(image[:, :, 0] > 200), 10)
+
+    def test_custom_kernel_length(self):
+        graph, image = self.render_graph((0, 10, -2, 2), mode='lines', kernel="""
+            vec2 kernel() { 
+                return ${D.domain}; 
+            }""")
+        self.assertEqual(graph.length, 10000)
+
+    def test_cull(self):
+        cs = (4, 5, -2, 2)
+        culled, culled_image = self.render_graph(cs, mode='lines')
+        full, full_image = self.render_graph(cs, mode='lines', cull=False)
+
+        self.assertLess(culled.length, 1100)
+        self.assertEqual(full.length, 10000)
+        np.testing.assert_array_equal(culled_image, full_image)
+
+    def test_lod_cull(self):
+        cs = (4, 5, -2, 2)
+        culled_domain = LodVertexDomain(series(), min_length=64)
+        full_domain = LodVertexDomain(series(), min_length=64)
+        culled, culled_image = self.render_graph(cs, culled_domain, mode='lines')
+        full, full_image = self.render_graph(cs, full_domain, mode='lines', cull=False)
+
+        level = full_domain.level
+        self.assertEqual(culled_domain.level, level)
+        (_, culled_length), = culled._draw_ranges()
+        (offset, length), = full._draw_ranges()
+        self.assertLess(culled_length, length)
+        self.assertEqual(offset, full_domain.level_offsets[level])
+        self.assertEqual(length, full_domain.level_lengths[level])
+        np.testing.assert_array_equal(culled_image, full_image)
+
+    def test_switch_kernel(self):
+        plotter = self.create_plotter(cs=(0, 10, -2, 2))
+        graph = GlPrimitivesGraph(VertexDomain(series()), mode='lines')
+        plotter += graph
+        default = self.render_plot(plotter, frames=2)
+        program = graph.program
+
+        graph.kernel = SHIFT_KERNEL.replace('${D.shift}', 'vec2(0, 1)')
+        shifted = self.render_plot(plotter)
+        self.assertIsNot(graph.program, program)
+        self.assertFalse(np.array_equal(default, shifted))
+
+        # known kernels are not linked again
+        graph.kernel = graph.DEFAULT_KERNEL
+        self.assertIs(graph.program, program)
+        np.testing.assert_array_equal(self.render_plot(plotter), default)
+
+    def test_switch_domains(self):
+        plotter = self.create_plotter(cs=(0, 10, -2, 2))
+        graph = GlPrimitivesGraph(VertexDomain(series()), mode='lines')
+        plotter += graph
+        default = self.render_plot(plotter, frames=2)
+        program = graph.program
+
+        # the composition changed, the kernel does not use the domain yet
+        graph['shift'] = VertexDomain(np.tile(np.float32((0, 1)), (10000, 1)))
+        self.assertIsNot(graph.program, program)
+        np.testing.assert_array_equal(self.render_plot(plotter), default)
+
+        graph.kernel = SHIFT_KERNEL
+        shifted = self.render_plot(plotter)
+        self.assertFalse(np.array_equal(default, shifted))
+
+        # same composition, other buffer
+        graph['shift'] = VertexDomain(np.zeros((10000, 2), dtype=np.float32))
+        np.testing.assert_array_equal(self.render_plot(plotter), default)
+
+SHIFT_KERNEL = """
+    vec2 kernel() { 
+        return ${D.domain} + ${D.shift}; 
+    }"""
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+#-*- coding: utf-8 -*-
+"""
+rendering tests of gpupy.plot.plotter2d.
+
+:author: keksnicoh
+"""
+
+from gpupy.plot.test import PlotTestCase
+from gpupy.plot.domain import VertexDomain, TextureDomain, StreamingVertexDomain, LodVertexDomain, MemmapVertexDomain
+from gpupy.plot.graph.glprimitives import GlPrimitivesGraph
+from gpupy.plot.graph.fragmentgraph import FragmentGraph
+from gpupy.gl import BufferObject
+
+import numpy as np
+import unittest
+
+def line(y, n=100):
+    x = np.linspace(0, 1, n, dtype=np.float32)
+    return np.dstack((x, np.full(n, y, dtype=np.float32)))[0]
+
+def image(color, n=8):
+    return np.tile(np.array(color, dtype=np.float32), (n, n, 1))
+
+class DamageTest(PlotTestCase):
+
+    def test_clean_tick(self):
+        plotter = self.create_plotter()
+        plotter += GlPrimitivesGraph(VertexDomain(line(0.5)), mode='lines')
+        self.render_plot(plotter, frames=2)
+        versions = tuple(graph.state_version for graph in plotter._graphs)
+        self.assertFalse(plotter._redraw_required(versions))
+
+    def test_vertex_domain(self):
+        plotter = self.create_plotter()
+        domain = VertexDomain(line(0.25))
+        plotter += GlPrimitivesGraph(domain, mode='lines')
+        lower = self.render_plot(plotter, frames=2)
+
+        domain.buffer.set(line(0.75))
+        upper = self.render_plot(plotter)
+        self.assertFalse(np.array_equal(lower, upper))
+
+        domain.buffer = BufferObject.to_device(line(0.25))
+        np.testing.assert_array_equal(self.render_plot(plotter), lower)
+
+    def test_texture_domain(self):
+        plotter = self.create_plotter()
+        domain = TextureDomain.to_device_2d(image((1, 0, 0)))
+        plotter += FragmentGraph(domain, cs=(0, 1, 0, 1))
+        red = self.render_plot(plotter, frames=2)
+        self.assertGreater(np.mean(red[:, :, 0]), 128)
+
+        domain.texture.set(image((0, 0, 1)))
+        blue = self.render_plot(plotter)
+        self.assertLess(np.mean(blue[:, :, 0]), np.mean(red[:, :, 0]))
+        self.assertGreater(np.mean(blue[:, :, 2]), 128)
+
+    def test_uniform_animation(self):
+        plotter = self.create_plotter()
+        graph = GlPrimitivesGraph(VertexDomain(line(0.25)), kernel="""
+        uniform float offset;
+        vec2 kernel() {
+            return $D.domain + vec2(0, offset);
+        }""", mode='lines')
+        offsets = iter((0, 0.5))
+        def tick():
+            graph.program.uniform('offset', next(offsets, 0.5))
+        graph.on_tick.append(tick)
+        plotter += graph
+
+        lower = self.render_plot(plotter)
+        upper = self.render_plot(plotter)
+        self.assertFalse(np.array_equal(lower, upper))
+
+        # the uniform does not change anymore
+        versions = tuple(graph.state_version for graph in plotter._graphs)
+        self.assertFalse(plotter._redraw_required(versions))
+
+class AutoscaleTest(PlotTestCase):
+
+    def assert_autoscale(self, domain, data):
+        plotter = self.create_plotter()
+        plotter.autoscale(domain, margin=0, wait=True)
+        lower, upper = data.min(axis=0), data.max(axis=0)
+        np.testing.assert_allclose(plotter.cs.values, (lower[0], upper[0], lower[1], upper[1]), rtol=1e-6)
+
+    def test_vertex_domain(self):
+        data = np.random.RandomState(0).randn(1000, 2).astype(np.float32)
+        self.assert_autoscale(VertexDomain(data), data)
+
+    def test_streaming_vertex_domain(self):
+        data = np.random.RandomState(0).rand(150, 2).astype(np.float32) + 5
+        domain = StreamingVertexDomain(100, np.dtype((np.float32, 2)))
+
+        # the unused rows are zero
+        domain.append(data[:10])
+        self.assert_autoscale(domain, data[:10])
+
+        # the ring wrapped around
+        domain.append(data[10:])
+        self.assert_autoscale(domain, data[50:])
+
+    def test_lod_vertex_domain(self):
+        data = np.dstack((np.linspace(0, 1, 10000), np.sin(np.linspace(0, 20, 10000))))[0].astype(np.float32)
+        self.assert_autoscale(LodVertexDomain(data, min_length=64), data)
+
+    def test_memmap_vertex_domain(self):
+        data = np.dstack((np.linspace(0, 1, 10000), np.sin(np.linspace(0, 20, 10000))))[0]
+        domain = MemmapVertexDomain(data, chunk_rows=256)
+        self.assert_autoscale(domain, data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#-*- coding: utf-8 -*-
+"""
+tests of gpupy.plot.tiled.
+
+:author: keksnicoh
+"""
+
+from gpupy.plot.test import PlotTestCase
+from gpupy.plot.tiled import render_tiled, tile_cs
+from gpupy.plot.domain import VertexDomain
+from gpupy.plot.graph.glprimitives import GlPrimitivesGraph
+from gpupy.plot.graph.fragmentgraph import FragmentGraph
+
+import numpy as np
+import unittest
+
+OUTPUT_SIZE = (200, 100)
+
+# grid lines are centered at pixels
+CS = (-0.5/200, 1-0.5/200, -0.5/100, 1-0.5/100)
+
+def series(n=1000):
+    x = np.linspace(0, 1, n, dtype=np.float32)
+    return np.dstack((x, 0.5 + 0.4 * np.sin(20 * x)))[0]
+
+class TileCsTest(unittest.TestCase):
+
+    def test_tile_cs(self):
+        cs = (0, 4, 0, 2)
+        self.assertEqual(tile_cs(cs, (400, 200), (0, 0, 400, 200)), cs)
+        self.assertEqual(tile_cs(cs, (400, 200), (0, 0, 100, 100)), (0, 1, 1, 2))
+        self.assertEqual(tile_cs(cs, (400, 200), (300, 100, 100, 100)), (3, 4, 0, 1))
+
+class RenderTiledTest(PlotTestCase):
+
+    def assert_tiles_equal(self, plotter):
+        single = render_tiled(plotter, OUTPUT_SIZE, tile_size=max(OUTPUT_SIZE))
+        tiled = render_tiled(plotter, OUTPUT_SIZE, tile_size=64)
+        self.assertGreater(np.count_nonzero(self.plot_pixels(plotter, single)), 0)
+
+        # the limits of the cs are drawn half a pixel off the 
+        # pixel centers at the image border, their antialiasing
+        # is not stable. kernels evaluated at other tile offsets 
+        # might round differently.
+        diff = np.abs(tiled.astype(np.int32) - single)[1:-1, 1:-1]
+        self.assertLessEqual(np.max(diff), 1)
+
+    def test_lines(self):
+        plotter = self.create_plotter(cs=CS)
+        plotter += GlPrimitivesGraph(VertexDomain(series()), mode='lines')
+        self.assert_tiles_equal(plotter)
+
+    def test_cached_fragment_graph(self):
+        plotter = self.create_plotter(cs=CS)
+        graph = FragmentGraph(cs=(0, 1, 0, 1), fragment_kernel="""
+            vec4 fragment_kernel(vec2 c) {
+                return vec4(c.x, c.y, 0, 1);
+            }""")
+        plotter += graph
+        self.assert_tiles_equal(plotter)
+        self.assertTrue(graph.cached)
+
+    def test_restore(self):
+        plotter = self.create_plotter(cs=CS)
+        plotter += GlPrimitivesGraph(VertexDomain(series()), mode='lines')
+        self.render_plot(plotter)
+        major_grid = tuple(plotter.grid.major_grid.values)
+        cs = tuple(plotter.cs.values)
+
+        render_tiled(plotter, OUTPUT_SIZE, tile_size=64)
+        self.assertEqual(tuple(plotter.cs.values), cs)
+        self.assertEqual(tuple(plotter.grid.major_grid.values), major_grid)
+
+        # the grid follows the cs again
+        plotter.cs = (0, 100, 0, 100)
+        self.assertNotEqual(tuple(plotter.grid.major_grid.values), major_grid)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+#-*- coding: utf-8 -*-
+"""
+tiled rendering of plots which are larger than the maximum
+framebuffer size.
+
+the plot is rendered tile by tile into a framebuffer of the
+tile size. for each tile the cs of the plotter is set to the
+part of the configuration space which is covered by the tile.
+the tiles are streamed into a preallocated array, if a path is
+given, a .npy memmap. so the size of the image is bound by the
+disk only.
+
+    image = render_tiled(plotter, (30000, 20000), path='poster.npy')
+
+only the plot area is rendered, borders, margins and paddings
+of the plotter are disabled during the rendering. the major
+grid of the whole plot is used within each tile, so grid lines
+are continuous at the tile borders, the limits of the cs are
+drawn at the borders of the image only.
+
+:author: keksnicoh
+"""
+
+from gpupy.gl import GPUPY_GL, Texture2D, Framebuffer
+from gpupy.gl.components.camera import Camera2D
+from gpupy.gl.lib.vector import vec2
+from gpupy.plot.plotter2d import grid
+
+from OpenGL.GL import *
+import numpy as np
+
+__all__ = ['render_tiled', 'tile_cs']
+
+# maximum number of ticks until all graphs are refined
+MAX_REFINEMENT_TICKS = 16
+
+def tile_cs(cs, output_size, tile):
+    """ returns the configuration space of a **tile** (x, y, w, h)
+        of an image of **output_size**. (x, y) is the top left
+        corner of the tile. """
+    x0, x1, y0, y1 = cs
+    width, height = output_size
+    x, y, w, h = tile
+    return (x0 + (x1 - x0) * x / width,
+            x0 + (x1 - x0) * (x + w) / width,
+            y1 - (y1 - y0) * (y + h) / height,
+            y1 - (y1 - y0) * y / height)
+
+def render_tiled(plotter, output_size, tile_size=2048, path=None):
+    """
+    renders **plotter** into an (height, width, 4) uint8 image of
+    **output_size** (width, height) by tiles of **tile_size**.
+    if **path** is given, the image is a .npy memmap at **path**.
+    """
+    width, height = (int(v) for v in output_size)
+    tw, th = (int(tile_size), int(tile_size)) if np.isscalar(tile_size) else (int(v) for v in tile_size)
+
+    max_size = glGetIntegerv(GL_MAX_RENDERBUFFER_SIZE)
+    if tw > max_size or th > max_size:
+        raise ValueError('tile size ({}, {}) exceeds GL_MAX_RENDERBUFFER_SIZE {}'.format(tw, th, max_size))
+
+    if path is not None:
+        image = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=(height, width, 4))
+    else:
+        image = np.empty((height, width, 4), dtype=np.uint8)
+
+    # -- state which is changed during the rendering
+    layer = plotter.layer
+    state = {
+        'cs':       tuple(plotter.cs.values),
+        'size':     tuple(plotter.size.values),
+        'position': tuple(plotter.position.values),
+        'margin':   tuple(layer.margin.values),
+        'padding':  tuple(layer.padding.values),
+        'border':   tuple(layer.border.values),
+        'grid':     tuple(plotter.grid.major_grid.values),
+        'edges':    tuple(plotter.grid.edges.values),
+    }
+    refinement = [(g, g.idle_frames, g.tiles_per_frame) for g in plotter.graphs if hasattr(g, 'refinement')]
+
+    context = GPUPY_GL.CONTEXT
+    default_framebuffer = context.default_framebuffer
+    draw_fbo = glGetIntegerv(GL_DRAW_FRAMEBUFFER_BINDING)
+    viewport = glGetIntegerv(GL_VIEWPORT)
+
+    texture = Texture2D.empty((tw, th, 4), np.uint8)
+    framebuffer = Framebuffer()
+    framebuffer.color_attachment(texture)
+    camera = Camera2D(screensize=(tw, th), position=(tw/2, th/2, 0))
+
+    try:
+        layer.margin = (0, 0, 0, 0)
+        layer.padding = (0, 0, 0, 0)
+        layer.border = (0, 0, 0, 0)
+        plotter.position = (0, 0, 0, 1)
+        plotter.size = (tw, th)
+        plotter.grid.major_grid = vec2(grid(plotter.axes_unit, plotter.cs))
+
+        # graphs refine within one tick
+        for graph, idle_frames, tiles_per_frame in refinement:
+            graph.idle_frames = 0
+            graph.tiles_per_frame = np.iinfo(np.int32).max
+
+        context.default_framebuffer = framebuffer.gl_framebuffer_id
+        for y in range(0, height, th):
+            for x in range(0, width, tw):
+                plotter.cs = tile_cs(state['cs'], (width, height), (x, y, tw, th))
+
+                # grid lines at the limits only at the image borders
+                plotter.grid.edges = (x == 0, x + tw >= width, y + th >= height, y == 0)
+                _render_tile(plotter, camera, framebuffer, (tw, th))
+
+                # the tile might exceed the image at the right and
+                # bottom border.
+                w, h = min(tw, width - x), min(th, height - y)
+                pixels = _read_tile(framebuffer, (tw, th))
+                image[y:y+h, x:x+w] = pixels[:h, :w]
+    finally:
+        context.default_framebuffer = default_framebuffer
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, draw_fbo)
+        glViewport(*viewport)
+
+        for graph, idle_frames, tiles_per_frame in refinement:
+            graph.idle_frames = idle_frames
+            graph.tiles_per_frame = tiles_per_frame
+        for name in ('cs', 'size', 'position'):
+            setattr(plotter, name, state[name])
+
+        # the grid follows the cs of the plotter again
+        plotter.grid.major_grid = plotter.major_grid
+        plotter.grid.major_grid = state['grid']
+        plotter.grid.edges = state['edges']
+        for name in ('margin', 'padding', 'border'):
+            setattr(layer, name, state[name])
+        glDeleteFramebuffers(1, [framebuffer.gl_framebuffer_id])
+        glDeleteTextures([texture.gl_texture_id])
+
+    if path is not None:
+        image.flush()
+    return image
+
+def _render_tile(plotter, camera, framebuffer, size):
+    # progressive graphs need some ticks until the finest
+    # level was rendered.
+    for i in range(MAX_REFINEMENT_TICKS):
+        plotter.tick()
+        if not None in (g.state_version for g in plotter.graphs):
+            break
+
+    framebuffer.use()
+    glViewport(0, 0, *size)
+    glClearColor(*plotter.background_color.values)
+    glClear(GL_COLOR_BUFFER_BIT)
+    camera.enable()
+    plotter.draw()
+
+def _read_tile(framebuffer, size):
+    glBindFramebuffer(GL_READ_FRAMEBUFFER, framebuffer.gl_framebuffer_id)
+    glReadBuffer(GL_COLOR_ATTACHMENT0)
+    glPixelStorei(GL_PACK_ALIGNMENT, 1)
+    data = glReadPixels(0, 0, size[0], size[1], GL_RGBA, GL_UNSIGNED_BYTE)
+    return np.frombuffer(data, dtype=np.uint8).reshape((size[1], size[0], 4))[::-1]
@@ -1,2 +1,5 @@
 #!/bin/sh
-python3 -m unittest discover -s gpupy/gl/test
\ No newline at end of file
+# rendering tests use headless contexts, see gpupy.gl.test
+export PYOPENGL_PLATFORM=${PYOPENGL_PLATFORM:-egl}
+python3 -m unittest discover -s gpupy/gl/test -t . && \
+python3 -m unittest discover -s gpupy/plot/test -t .